@@ -0,0 +1,186 @@
+# configurations/accord.py
+# Accord inter-notateurs : alpha de Krippendorff, ICC et désaccord moyen
+from itertools import chain
+
+import numpy as np
+from django.db.models.functions import ExtractMonth, ExtractYear
+
+from . import archives
+
+PERIODES = {
+    'mois': lambda annee, mois: annee * 12 + mois - 1,
+    'trimestre': lambda annee, mois: annee * 4 + (mois - 1) // 3,
+    'annee': lambda annee, mois: annee,
+}
+
+
+def charger(periode='mois', depuis=None, jusqua=None):
+    """Notations valorisées, courantes et archivées, sous forme de tableaux
+    (conducteur, critère, période, notateur, valeur)"""
+    lignes = archives.notations(
+        'conducteur_id', 'critere_id', 'annee_notation', 'mois', 'notateur_id', 'valeur',
+        debut=depuis, fin=jusqua, valeur__isnull=False,
+        annotations={'annee_notation': ExtractYear('date_notation'), 'mois': ExtractMonth('date_notation')},
+    )
+
+    tableau = np.fromiter(chain.from_iterable(lignes.iterator(chunk_size=5000)), dtype=np.int64).reshape(-1, 6)
+    periodes = PERIODES[periode](tableau[:, 2], tableau[:, 3])
+    return tableau[:, 0], tableau[:, 1], periodes, tableau[:, 4], tableau[:, 5].astype(np.float64)
+
+
+def encoder(*colonnes):
+    """Code chaque combinaison de colonnes entières par un seul entier, dans l'ordre lexicographique.
+
+    Beaucoup plus rapide qu'un np.unique(axis=0) sur un tableau à plusieurs colonnes.
+    """
+    codes = []
+    tailles = []
+    for colonne in colonnes:
+        valeurs, code = np.unique(colonne, return_inverse=True)
+        codes.append(code.ravel())
+        tailles.append(len(valeurs))
+    return np.ravel_multi_index(codes, tailles)
+
+
+class IndexAppariement:
+    """Index des unités (conducteur, critère, période) notées par plusieurs notateurs.
+
+    Les notations sont triées par unité puis par notateur ; les notations
+    multiples d'un même notateur sur une unité sont moyennées. Seules les
+    unités d'au moins deux notateurs sont conservées.
+    """
+
+    def __init__(self, conducteurs, criteres, periodes, notateurs, valeurs):
+        _, premier, inverse = np.unique(
+            encoder(criteres, conducteurs, periodes, notateurs), return_index=True, return_inverse=True
+        )
+        valeurs = np.bincount(inverse, weights=valeurs) / np.bincount(inverse)
+        criteres, notateurs = criteres[premier], notateurs[premier]
+
+        # Bornes des unités dans le tableau trié
+        unites = encoder(criteres, conducteurs[premier], periodes[premier])
+        debut_unite = np.r_[True, unites[1:] != unites[:-1]]
+        unite = np.cumsum(debut_unite) - 1
+        taille = np.bincount(unite)
+
+        garder = taille[unite] >= 2
+        self.criteres = criteres[garder]
+        self.notateurs = notateurs[garder]
+        self.valeurs = valeurs[garder]
+        _, self.unites = np.unique(unite[garder], return_inverse=True)
+        self.tailles = np.bincount(self.unites) if len(self.unites) else np.empty(0, dtype=np.int64)
+
+    def __len__(self):
+        return len(self.tailles)
+
+    def paires(self):
+        """Indices (i, j), i < j, de toutes les paires de notations d'une même unité.
+
+        Les unités étant contiguës, on compare chaque ligne à ses voisines à
+        distance 1, 2, ... jusqu'à la taille de la plus grande unité.
+        """
+        gauche, droite = [], []
+        n = len(self.unites)
+        if n == 0:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        for decalage in range(1, int(self.tailles.max())):
+            i = np.arange(n - decalage)
+            meme_unite = self.unites[i] == self.unites[i + decalage]
+            gauche.append(i[meme_unite])
+            droite.append(i[meme_unite] + decalage)
+        return np.concatenate(gauche), np.concatenate(droite)
+
+
+def accord_par_critere(index):
+    """Alpha de Krippendorff (métrique d'intervalle), ICC(1) et désaccord absolu moyen par critère"""
+    if len(index) == 0:
+        return {}
+    i, j = index.paires()
+    x = index.valeurs
+    ids_criteres, critere = np.unique(index.criteres, return_inverse=True)
+    nb = len(ids_criteres)
+    taille_unite = index.tailles[index.unites]
+
+    # Alpha : désaccord observé / désaccord attendu
+    ecarts_carres = (x[i] - x[j]) ** 2
+    observe = np.bincount(critere[i], weights=2 * ecarts_carres / (taille_unite[i] - 1), minlength=nb)
+    n = np.bincount(critere, minlength=nb).astype(np.float64)
+    somme = np.bincount(critere, weights=x, minlength=nb)
+    somme_carres = np.bincount(critere, weights=x * x, minlength=nb)
+    observe = observe / n
+    attendu = (2 * n * somme_carres - 2 * somme ** 2) / (n * (n - 1))
+    alpha = 1 - np.divide(observe, attendu, out=np.full(nb, np.nan), where=attendu > 0)
+
+    # ICC(1) pour effectifs inégaux
+    critere_unite = np.zeros(len(index), dtype=np.int64)
+    critere_unite[index.unites] = critere
+    moyenne_unite = np.bincount(index.unites, weights=x) / index.tailles
+    k = np.bincount(critere_unite, minlength=nb).astype(np.float64)
+    moyenne_generale = somme / n
+    inter = np.bincount(
+        critere_unite, weights=index.tailles * (moyenne_unite - moyenne_generale[critere_unite]) ** 2, minlength=nb
+    )
+    intra = np.bincount(critere, weights=(x - moyenne_unite[index.unites]) ** 2, minlength=nb)
+    carre_moyen_inter = np.divide(inter, k - 1, out=np.full(nb, np.nan), where=k > 1)
+    carre_moyen_intra = np.divide(intra, n - k, out=np.full(nb, np.nan), where=n > k)
+    m0 = np.divide(
+        n - np.bincount(critere_unite, weights=index.tailles ** 2, minlength=nb) / n, k - 1,
+        out=np.full(nb, np.nan), where=k > 1,
+    )
+    denominateur = carre_moyen_inter + (m0 - 1) * carre_moyen_intra
+    icc = np.divide(
+        carre_moyen_inter - carre_moyen_intra, denominateur, out=np.full(nb, np.nan), where=denominateur > 0
+    )
+
+    nb_paires = np.bincount(critere[i], minlength=nb)
+    desaccord = np.divide(
+        np.bincount(critere[i], weights=np.abs(x[i] - x[j]), minlength=nb), nb_paires,
+        out=np.full(nb, np.nan), where=nb_paires > 0,
+    )
+
+    def ou_rien(v):
+        return None if np.isnan(v) else float(v)
+
+    return {
+        int(ids_criteres[c]): {
+            'unites': int(k[c]),
+            'paires': int(nb_paires[c]),
+            'alpha': ou_rien(alpha[c]),
+            'icc': ou_rien(icc[c]),
+            'desaccord_moyen': ou_rien(desaccord[c]),
+        }
+        for c in range(nb)
+    }
+
+
+def accord_par_paire(index):
+    """Désaccord absolu moyen pour chaque paire de notateurs ayant noté les mêmes unités"""
+    if len(index) == 0:
+        return {}
+    i, j = index.paires()
+    a = np.minimum(index.notateurs[i], index.notateurs[j])
+    b = np.maximum(index.notateurs[i], index.notateurs[j])
+    _, premier, inverse = np.unique(encoder(a, b), return_index=True, return_inverse=True)
+    paires = np.stack([a[premier], b[premier]], axis=1)
+    nombre = np.bincount(inverse)
+    ecarts = index.valeurs[i] - index.valeurs[j]
+    # Écart signé orienté du plus petit identifiant vers le plus grand
+    ecarts = np.where(index.notateurs[i] == a, ecarts, -ecarts)
+    absolu = np.bincount(inverse, weights=np.abs(ecarts)) / nombre
+    signe = np.bincount(inverse, weights=ecarts) / nombre
+    return {
+        (int(p[0]), int(p[1])): {
+            'comparaisons': int(nombre[c]),
+            'desaccord_moyen': float(absolu[c]),
+            'ecart_moyen': float(signe[c]),
+        }
+        for c, p in enumerate(paires)
+    }
+
+
+def accord_inter_notateurs(periode='mois', depuis=None, jusqua=None):
+    index = IndexAppariement(*charger(periode, depuis, jusqua))
+    return {
+        'criteres': accord_par_critere(index),
+        'paires': accord_par_paire(index),
+    }
@@ -5,9 +5,15 @@ from django.contrib.auth.admin import GroupAdmin, UserAdmin
 from django.urls import reverse
 from django.utils.html import format_html
 from django.db import models
+from django.db.models import Exists, OuterRef
 from .models import  GroupePage, Page, AssociationUtilisateurGroupe, PageConfig
 from .models import CustomGroup, GroupMembership
 from . models import  Societe, Service, Site, Conducteur, Notateur, CriteresNotation, Notation, HistoriqueNotation, HistoriqueSite
+from .models import AgregatNotation, BiaisNotateur, NotationArchivee
+from .models import HistoriqueService, HistoriqueSociete, TRANCHES_ANCIENNETE
+from .permissions import GROUPE_GESTIONNAIRES
+from .recherche import objets_trouves
+from .statuts import recalculer_statuts
 # Relations pages et groupes
 admin.site.register(GroupePage)
 admin.site.register(Page)
@@ -24,16 +30,23 @@ class CustomUserAdmin(UserAdmin):
         list_display.append('is_group_manager')
         return list_display
     
+    def get_queryset(self, request):
+        # Appartenance au groupe des gestionnaires calculée dans la requête de la liste
+        return super().get_queryset(request).annotate(
+            est_gestionnaire=Exists(User.groups.through.objects.filter(
+                user_id=OuterRef('pk'), group__name=GROUPE_GESTIONNAIRES
+            ))
+        )
+    
     def is_group_manager(self, obj):
         """Afficher si l'utilisateur est gestionnaire de groupes"""
-        is_manager = obj.groups.filter(name='gestionnaire_groupes').exists()
-        if is_manager:
+        if obj.est_gestionnaire:
             return format_html('<span style="color: green;">✅ Gestionnaire</span>')
         else:
             return format_html('<span style="color: red;">❌ Non gestionnaire</span>')
     
     is_group_manager.short_description = 'Gestionnaire de groupes'
-    is_group_manager.admin_order_field = 'groups'
+    is_group_manager.admin_order_field = 'est_gestionnaire'
 
 # Administration pour les groupes personnalisés
 class CustomGroupAdmin(admin.ModelAdmin):
@@ -198,11 +211,73 @@ class SiteAdmin(admin.ModelAdmin):
     nb_conducteurs.short_description = 'Nb conducteurs'
 
 
+class TrancheAgeFilter(admin.SimpleListFilter):
+    """Filtre par tranche d'âge, traduit en intervalle sur la date de naissance (indexable)"""
+    title = "tranche d'âge"
+    parameter_name = 'tranche_age'
+    TRANCHES = [
+        ('-25', 'Moins de 25 ans', None, 25),
+        ('25-34', '25 à 34 ans', 25, 35),
+        ('35-44', '35 à 44 ans', 35, 45),
+        ('45-54', '45 à 54 ans', 45, 55),
+        ('55-', '55 ans et plus', 55, None),
+    ]
+
+    def lookups(self, request, model_admin):
+        return [(code, libelle) for code, libelle, _, _ in self.TRANCHES]
+
+    def queryset(self, request, queryset):
+        for code, _, mini, maxi in self.TRANCHES:
+            if self.value() != code:
+                continue
+            if mini is not None:
+                # Au moins `mini` ans : né au plus tard il y a `mini` ans
+                queryset = queryset.filter(date_naissance__lte=self.il_y_a(mini))
+            if maxi is not None:
+                queryset = queryset.filter(date_naissance__gt=self.il_y_a(maxi))
+            return queryset
+        return queryset
+
+    @staticmethod
+    def il_y_a(annees):
+        aujourd_hui = date.today()
+        try:
+            return aujourd_hui.replace(year=aujourd_hui.year - annees)
+        except ValueError:
+            # 29 février
+            return aujourd_hui.replace(year=aujourd_hui.year - annees, day=28)
+
+class TrancheAncienneteFilter(admin.SimpleListFilter):
+    title = "ancienneté"
+    parameter_name = 'tranche_anciennete'
+
+    def lookups(self, request, model_admin):
+        return [(libelle, libelle) for _, libelle in TRANCHES_ANCIENNETE]
+
+    def queryset(self, request, queryset):
+        if self.value():
+            return queryset.filter(tranche_anciennete=self.value())
+        return queryset
+
+class RechercheIndexeeMixin:
+    """Recherche de l'admin (et de l'autocomplétion) servie par l'index de recherche, insensible aux accents.
+
+    Le filtre est une sous-requête sur l'index : tous les résultats sont
+    paginés par l'admin, sans limite.
+    """
+    type_recherche = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term.strip():
+            return queryset, False
+        return queryset.filter(pk__in=objets_trouves(search_term, self.type_recherche)), False
+
 @admin.register(Conducteur)
-class ConducteurAdmin(admin.ModelAdmin):
-    list_display = ('erp_id', 'nom', 'prenom', 'service', 'site', 'societe', 'actif_p', 'interim_p', 'age_display', 'anciennete_display')
-    list_filter = ('actif_p', 'interim_p', 'service', 'site', 'societe', 'date_entree')
+class ConducteurAdmin(RechercheIndexeeMixin, admin.ModelAdmin):
+    list_display = ('erp_id', 'nom', 'prenom', 'service', 'site', 'societe', 'actif_p', 'statut_actif', 'interim_p', 'age_display', 'anciennete_display')
+    list_filter = ('est_actif', 'actif_p', 'interim_p', 'service', 'site', 'societe', 'date_entree', TrancheAgeFilter, TrancheAncienneteFilter)
     search_fields = ('nom', 'prenom', 'erp_id')
+    type_recherche = 'conducteur'
     readonly_fields = ('erp_id', 'age_display', 'anciennete_display', 'nom_complet')
     list_editable = ('actif_p', 'interim_p')
     
@@ -222,42 +297,53 @@ class ConducteurAdmin(admin.ModelAdmin):
     )
     
     def statut_actif(self, obj):
-        if obj.actif_p and (not obj.date_sortie or obj.date_sortie > date.today()):
+        if obj.est_actif:
             return format_html('<span style="color: green;">✓ Actif</span>')
         return format_html('<span style="color: red;">✗ Inactif</span>')
     statut_actif.short_description = 'Statut'
     
+    def get_queryset(self, request):
+        # Âge et ancienneté calculés par la base : colonnes triables et filtrables
+        return super().get_queryset(request).select_related('service', 'site', 'societe').avec_age().avec_anciennete()
+
     def age_display(self, obj):
-        age = obj.age
+        age = getattr(obj, 'age_annote', obj.age)
         return f"{age} ans" if age else "Non renseigné"
     age_display.short_description = 'Âge'
+    age_display.admin_order_field = 'age_annote'
     
     def anciennete_display(self, obj):
-        jours = obj.anciennete_jours if obj.anciennete_jours > 0 else 0
+        anciennete = getattr(obj, 'anciennete_annotee', None)
+        jours = anciennete.days if anciennete is not None else obj.anciennete_jours
+        jours = jours if jours > 0 else 0
         if jours < 365:
             return f"{jours} jours"
         annees = jours // 365
         return f"{annees} an{'s' if annees > 1 else ''}"
     anciennete_display.short_description = 'Ancienneté'
+    anciennete_display.admin_order_field = 'anciennete_annotee'
     
     # Actions personnalisées
     actions = ['marquer_actif', 'marquer_inactif']
     
     def marquer_actif(self, request, queryset):
         updated = queryset.update(actif_p=True)
+        recalculer_statuts(queryset)
         self.message_user(request, f"{updated} conducteur{'s' if updated > 1 else ''} marqué{'s' if updated > 1 else ''} comme actif{'s' if updated > 1 else ''}.")
     marquer_actif.short_description = "Marquer comme actif"
     
     def marquer_inactif(self, request, queryset):
         updated = queryset.update(actif_p=False)
+        recalculer_statuts(queryset)
         self.message_user(request, f"{updated} conducteur{'s' if updated > 1 else ''} marqué{'s' if updated > 1 else ''} comme inactif{'s' if updated > 1 else ''}.")
     marquer_inactif.short_description = "Marquer comme inactif"
     
 @admin.register(Notateur)
-class NotateurAdmin(admin.ModelAdmin):
+class NotateurAdmin(RechercheIndexeeMixin, admin.ModelAdmin):
     list_display = ('nom_complet', 'service', 'statut_actif', 'nb_notations')
     list_filter = ('service', 'date_entree', 'date_sortie')
     search_fields = ('nom', 'prenom')
+    type_recherche = 'notateur'
     readonly_fields = ('nom_complet',)
     
     fieldsets = (
@@ -284,10 +370,10 @@ class NotateurAdmin(admin.ModelAdmin):
 
 @admin.register(CriteresNotation)
 class CriteresNotationAdmin(admin.ModelAdmin):
-    list_display = ('nom', 'plage_valeurs', 'actif', 'nb_notations', 'created_at')
+    list_display = ('nom', 'plage_valeurs', 'poids', 'actif', 'nb_notations', 'created_at')
     list_filter = ('actif', 'created_at')
     search_fields = ('nom', 'description')
-    list_editable = ('actif',)
+    list_editable = ('actif', 'poids')
     readonly_fields = ('created_at', 'plage_valeurs')
     
     fieldsets = (
@@ -295,7 +381,7 @@ class CriteresNotationAdmin(admin.ModelAdmin):
             'fields': ('nom', 'description', 'actif')
         }),
         ('Valeurs', {
-            'fields': ('valeur_mini', 'valeur_maxi', 'plage_valeurs')
+            'fields': ('valeur_mini', 'valeur_maxi', 'plage_valeurs', 'poids')
         }),
         ('Métadonnées', {
             'fields': ('created_at',),
@@ -314,6 +400,9 @@ class NotationAdmin(admin.ModelAdmin):
     search_fields = ('conducteur__nom', 'conducteur__prenom', 'critere__nom')
     date_hierarchy = 'date_notation'
     autocomplete_fields = ('conducteur', 'notateur', 'critere')
+    ordering = ('-date_notation', '-id')
+    # Évite un COUNT(*) sur toute la table à chaque page filtrée
+    show_full_result_count = False
     
     fieldsets = (
         ('Notation', {
@@ -329,12 +418,62 @@ class NotationAdmin(admin.ModelAdmin):
             'conducteur', 'notateur', 'critere'
         )
 
+    def save_model(self, request, obj, form, change):
+        # Auteur de la modification, repris dans l'historique
+        obj._utilisateur = request.user
+        super().save_model(request, obj, form, change)
+
+@admin.register(AgregatNotation)
+class AgregatNotationAdmin(admin.ModelAdmin):
+    list_display = ('conducteur', 'critere', 'mois', 'nombre', 'moyenne_display', 'mini', 'maxi', 'derniere_valeur')
+    list_filter = ('critere', 'mois')
+    search_fields = ('conducteur__nom', 'conducteur__prenom')
+    date_hierarchy = 'mois'
+    list_select_related = ('conducteur', 'critere')
+
+    def moyenne_display(self, obj):
+        return f"{obj.moyenne:.2f}" if obj.moyenne is not None else "-"
+    moyenne_display.short_description = 'Moyenne'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(BiaisNotateur)
+class BiaisNotateurAdmin(admin.ModelAdmin):
+    list_display = ('notateur', 'critere', 'nombre', 'moyenne', 'moyenne_pairs', 'biais', 'calcule_le')
+    list_filter = ('critere', 'notateur')
+    list_select_related = ('notateur', 'critere')
+    ordering = ('critere', '-biais')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+@admin.register(NotationArchivee)
+class NotationArchiveeAdmin(admin.ModelAdmin):
+    list_display = ('conducteur', 'critere', 'valeur', 'notateur', 'date_notation', 'annee')
+    list_filter = ('annee', 'critere')
+    search_fields = ('conducteur__nom', 'conducteur__prenom')
+    list_select_related = ('conducteur', 'critere', 'notateur')
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
 @admin.register(HistoriqueNotation)
 class HistoriqueNotationAdmin(admin.ModelAdmin):
-    list_display = ('notation', 'conducteur', 'critere', 'ancienne_valeur', 'nouvelle_valeur', 'date_changement')
+    list_display = ('notation', 'conducteur', 'critere', 'ancienne_valeur', 'nouvelle_valeur', 'utilisateur', 'date_changement')
     list_filter = ('critere', 'date_changement')
     search_fields = ('conducteur__nom', 'conducteur__prenom')
-    readonly_fields = ('notation', 'notateur', 'conducteur', 'critere', 'ancienne_valeur', 'nouvelle_valeur', 'date_changement')
+    readonly_fields = ('notation', 'notateur', 'conducteur', 'critere', 'ancienne_valeur', 'nouvelle_valeur', 'utilisateur', 'date_changement')
+    list_select_related = ('notation', 'conducteur', 'critere', 'utilisateur')
     date_hierarchy = 'date_changement'
     
     def has_add_permission(self, request):
@@ -364,6 +503,20 @@ class HistoriqueSiteAdmin(admin.ModelAdmin):
             return f"{annees} an{'s' if annees > 1 else ''}"
     duree_affectation.short_description = 'Durée'
 
+@admin.register(HistoriqueService)
+class HistoriqueServiceAdmin(HistoriqueSiteAdmin):
+    list_display = ('conducteur', 'service', 'date_entree', 'date_sortie', 'duree_affectation')
+    list_filter = ('service', 'date_entree', 'date_sortie')
+    search_fields = ('conducteur__nom', 'conducteur__prenom', 'service__nom')
+    autocomplete_fields = ('conducteur', 'service')
+
+@admin.register(HistoriqueSociete)
+class HistoriqueSocieteAdmin(HistoriqueSiteAdmin):
+    list_display = ('conducteur', 'societe', 'date_entree', 'date_sortie', 'duree_affectation')
+    list_filter = ('societe', 'date_entree', 'date_sortie')
+    search_fields = ('conducteur__nom', 'conducteur__prenom', 'societe__nom')
+    autocomplete_fields = ('conducteur', 'societe')
+
 # Personnalisation du site d'administration
 admin.site.site_header = "Administration - Gestion des Conducteurs"
 admin.site.site_title = "Admin Conducteurs"
@@ -0,0 +1,145 @@
+# configurations/affectations.py
+# Historique des affectations (site, service, société) et requêtes par période
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Avg, Count, F, FilteredRelation, Q
+
+from .models import Conducteur, HistoriqueService, HistoriqueSite, HistoriqueSociete, Notation
+
+HISTORIQUES = {
+    'site': HistoriqueSite,
+    'service': HistoriqueService,
+    'societe': HistoriqueSociete,
+}
+
+TAILLE_LOT = 500
+
+
+def ouvrir(conducteurs):
+    """Première période d'affectation de conducteurs nouvellement créés, depuis leur date d'entrée"""
+    for champ, modele in HISTORIQUES.items():
+        modele.objects.bulk_create(
+            [
+                modele(conducteur_id=c.pk, date_entree=c.date_entree, **{f"{champ}_id": getattr(c, f"{champ}_id")})
+                for c in conducteurs
+            ],
+            batch_size=TAILLE_LOT,
+        )
+
+
+def enregistrer_changements(changements, jour=None):
+    """Clôt les périodes en cours et ouvre les nouvelles, en masse.
+
+    `changements` est une liste de tuples (conducteur_id, champ, ancien_id,
+    nouvel_id). Une période ouverte le jour même est remplacée plutôt que
+    clôturée, pour ne pas créer d'intervalle vide ; un retour le jour même à
+    l'affectation précédente rouvre sa période. Un conducteur sans historique
+    reçoit d'abord sa période d'origine, depuis sa date d'entrée.
+    """
+    jour = jour or date.today()
+    par_champ = {}
+    for conducteur_id, champ, ancien_id, nouvel_id in changements:
+        if ancien_id != nouvel_id:
+            par_champ.setdefault(champ, {})[conducteur_id] = (ancien_id, nouvel_id)
+
+    with transaction.atomic():
+        for champ, conducteurs in par_champ.items():
+            modele = HISTORIQUES[champ]
+            ids = list(conducteurs)
+            for i in range(0, len(ids), TAILLE_LOT):
+                lot = ids[i:i + TAILLE_LOT]
+                en_cours = modele.objects.en_cours().filter(conducteur_id__in=lot)
+                suivis = set(modele.objects.filter(conducteur_id__in=lot).values_list('conducteur_id', flat=True))
+                en_cours.filter(date_entree__gte=jour).delete()
+
+                rouvertes = {}
+                for pk, conducteur_id, groupe_id in modele.objects.filter(
+                    conducteur_id__in=lot, date_sortie=jour
+                ).values_list('pk', 'conducteur_id', f"{champ}_id"):
+                    if conducteurs[conducteur_id][1] == groupe_id:
+                        rouvertes[conducteur_id] = pk
+                modele.objects.filter(pk__in=rouvertes.values()).update(date_sortie=None)
+
+                en_cours.filter(date_entree__lt=jour).exclude(conducteur_id__in=rouvertes).update(date_sortie=jour)
+                lot = [pk for pk in lot if pk not in rouvertes]
+
+                nouvelles = []
+                sans_historique = [pk for pk in lot if pk not in suivis]
+                for pk, date_entree in Conducteur.objects.filter(pk__in=sans_historique).values_list('pk', 'date_entree'):
+                    if date_entree < jour:
+                        nouvelles.append(modele(
+                            conducteur_id=pk, date_entree=date_entree, date_sortie=jour,
+                            **{f"{champ}_id": conducteurs[pk][0]},
+                        ))
+                nouvelles += [
+                    modele(conducteur_id=pk, date_entree=jour, **{f"{champ}_id": conducteurs[pk][1]})
+                    for pk in lot
+                ]
+                modele.objects.bulk_create(nouvelles, batch_size=TAILLE_LOT)
+
+
+def initialiser():
+    """Crée la période en cours des conducteurs sans historique, depuis leur date d'entrée"""
+    crees = {}
+    for champ, modele in HISTORIQUES.items():
+        manquants = Conducteur.objects.exclude(pk__in=modele.objects.values('conducteur_id'))
+        objets = [
+            modele(conducteur_id=pk, date_entree=date_entree, **{f"{champ}_id": groupe_id})
+            for pk, date_entree, groupe_id in manquants.values_list('pk', 'date_entree', f"{champ}_id").iterator()
+        ]
+        modele.objects.bulk_create(objets, batch_size=TAILLE_LOT)
+        crees[champ] = len(objets)
+    return crees
+
+
+def conducteurs_a_la_date(champ, groupe_id, jour):
+    """Conducteurs affectés à un site (service, société) donné le jour donné"""
+    periodes = HISTORIQUES[champ].objects.a_la_date(jour).filter(**{f"{champ}_id": groupe_id})
+    return Conducteur.objects.filter(
+        Q(pk__in=periodes.values('conducteur_id')),
+        Q(date_entree__lte=jour),
+        Q(date_sortie__isnull=True) | Q(date_sortie__gt=jour),
+    )
+
+
+def affectation_a_la_date(conducteur_id, jour):
+    """{'site': id, 'service': id, 'societe': id} d'un conducteur le jour donné (None si inconnu)"""
+    return {
+        champ: modele.objects.a_la_date(jour).filter(conducteur_id=conducteur_id)
+        .order_by('-date_entree').values_list(f"{champ}_id", flat=True).first()
+        for champ, modele in HISTORIQUES.items()
+    }
+
+
+def avec_affectation(requete, champ='site'):
+    """Annote des notations avec le site (service, société) du conducteur à la date de notation.
+
+    Une seule jointure sur l'historique, filtrée par l'intervalle de chaque
+    période, au lieu d'une sous-requête corrélée par ligne. L'annotation
+    s'appelle `<champ>_a_la_date`.
+    """
+    relation = f"conducteur__{HISTORIQUES[champ]._meta.model_name}"
+    return requete.annotate(
+        periode_affectation=FilteredRelation(
+            relation,
+            condition=Q(**{f"{relation}__date_entree__lte": F('date_notation')})
+            & (Q(**{f"{relation}__date_sortie__isnull": True}) | Q(**{f"{relation}__date_sortie__gt": F('date_notation')})),
+        ),
+    ).annotate(**{f"{champ}_a_la_date": F(f"periode_affectation__{champ}_id")})
+
+
+def moyennes_par_affectation(champ='site', debut=None, fin=None):
+    """Moyenne et nombre de notations par site (service, société) d'affectation au moment de la notation"""
+    requete = Notation.objects.filter(valeur__isnull=False)
+    if debut is not None:
+        requete = requete.filter(date_notation__gte=debut)
+    if fin is not None:
+        requete = requete.filter(date_notation__lte=fin)
+    cle = f"{champ}_a_la_date"
+    return {
+        ligne[cle]: {'moyenne': ligne['moyenne'], 'nombre': ligne['nombre']}
+        for ligne in avec_affectation(requete, champ).values(cle).annotate(
+            moyenne=Avg('valeur'), nombre=Count('id')
+        ).order_by(cle)
+    }
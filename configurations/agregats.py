@@ -0,0 +1,213 @@
+# configurations/agregats.py
+# Maintenance incrémentale des agrégats mensuels (AgregatNotation)
+from collections import defaultdict
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import AgregatNotation, Notation, NotationArchivee
+
+TAILLE_LOT = 500
+
+CHAMPS_AGREGAT = ['nombre', 'somme', 'somme_carres', 'mini', 'maxi', 'derniere_valeur', 'derniere_date']
+
+
+def debut_mois(jour):
+    return jour.replace(day=1)
+
+
+def cellule(conducteur_id, critere_id, jour):
+    return (conducteur_id, critere_id, debut_mois(jour))
+
+
+def agreger(agregat, valeur, jour):
+    """Ajoute une valeur à un agrégat en mémoire"""
+    agregat.nombre += 1
+    agregat.somme += valeur
+    agregat.somme_carres += valeur * valeur
+    agregat.mini = valeur if agregat.mini is None else min(agregat.mini, valeur)
+    agregat.maxi = valeur if agregat.maxi is None else max(agregat.maxi, valeur)
+    if agregat.derniere_date is None or jour >= agregat.derniere_date:
+        agregat.derniere_valeur = valeur
+        agregat.derniere_date = jour
+
+
+def nouvel_agregat(cle):
+    conducteur_id, critere_id, mois = cle
+    return AgregatNotation(conducteur_id=conducteur_id, critere_id=critere_id, mois=mois)
+
+
+def charger_agregats(cles):
+    """Agrégats existants pour un ensemble de cellules, en une requête"""
+    if not cles:
+        return {}
+    requete = AgregatNotation.objects.filter(
+        conducteur_id__in={c[0] for c in cles},
+        critere_id__in={c[1] for c in cles},
+        mois__in={c[2] for c in cles},
+    )
+    return {
+        (a.conducteur_id, a.critere_id, a.mois): a
+        for a in requete
+        if (a.conducteur_id, a.critere_id, a.mois) in cles
+    }
+
+
+def recalculer(cles):
+    """Recalcule entièrement quelques cellules à partir des notations courantes et archivées"""
+    resultats = {}
+    cles = list(cles)
+    for i in range(0, len(cles), TAILLE_LOT):
+        condition = Q()
+        for conducteur_id, critere_id, mois in cles[i:i + TAILLE_LOT]:
+            condition |= Q(
+                conducteur_id=conducteur_id,
+                critere_id=critere_id,
+                date_notation__year=mois.year,
+                date_notation__month=mois.month,
+            )
+        colonnes = ('conducteur_id', 'critere_id', 'date_notation', 'valeur', 'id')
+        lignes = Notation.objects.filter(condition, valeur__isnull=False).values_list(*colonnes).union(
+            NotationArchivee.objects.filter(condition, valeur__isnull=False).values_list(*colonnes), all=True
+        ).order_by('date_notation', 'id')
+        for conducteur_id, critere_id, jour, valeur, _ in lignes:
+            cle = cellule(conducteur_id, critere_id, jour)
+            if cle not in resultats:
+                resultats[cle] = nouvel_agregat(cle)
+            agreger(resultats[cle], valeur, jour)
+    return resultats
+
+
+def enregistrer(agregats, cles_vides):
+    with transaction.atomic():
+        if agregats:
+            AgregatNotation.objects.bulk_create(
+                agregats,
+                batch_size=TAILLE_LOT,
+                update_conflicts=True,
+                unique_fields=['conducteur', 'critere', 'mois'],
+                update_fields=CHAMPS_AGREGAT,
+            )
+        for conducteur_id, critere_id, mois in cles_vides:
+            AgregatNotation.objects.filter(
+                conducteur_id=conducteur_id, critere_id=critere_id, mois=mois
+            ).delete()
+
+
+def appliquer_changements(changements):
+    """Répercute une liste de ChangementNotation sur les agrégats.
+
+    Les ajouts sont appliqués par différence. Un retrait ne peut pas être
+    défait pour le minimum, le maximum ou la dernière valeur : la cellule
+    concernée est alors recalculée depuis ses seules notations du mois.
+    """
+    ajouts = defaultdict(list)
+    retraits = defaultdict(list)
+    for changement in changements:
+        cle = cellule(changement.conducteur_id, changement.critere_id, changement.date_notation)
+        if changement.action != 'creation' and changement.ancienne_valeur is not None:
+            retraits[cle].append((changement.ancienne_valeur, changement.date_notation))
+        if changement.action != 'suppression' and changement.nouvelle_valeur is not None:
+            ajouts[cle].append((changement.nouvelle_valeur, changement.date_notation))
+
+    cles = set(ajouts) | set(retraits)
+    if not cles:
+        return
+
+    existants = charger_agregats(cles)
+    a_recalculer = set()
+    modifies = {}
+
+    for cle in cles:
+        agregat = existants.get(cle)
+        if cle in retraits:
+            if agregat is None:
+                a_recalculer.add(cle)
+                continue
+            for valeur, jour in retraits[cle]:
+                agregat.nombre -= 1
+                agregat.somme -= valeur
+                agregat.somme_carres -= valeur * valeur
+                if valeur in (agregat.mini, agregat.maxi) or jour == agregat.derniere_date or agregat.nombre <= 0:
+                    a_recalculer.add(cle)
+        if cle in a_recalculer:
+            continue
+        if agregat is None:
+            agregat = nouvel_agregat(cle)
+        for valeur, jour in ajouts.get(cle, []):
+            agreger(agregat, valeur, jour)
+        modifies[cle] = agregat
+
+    recalcules = recalculer(a_recalculer)
+    modifies.update(recalcules)
+    enregistrer(list(modifies.values()), a_recalculer - set(recalcules))
+
+
+def reconstruire(taille_lot=5000):
+    """Reconstruit tous les agrégats en un seul parcours ordonné des notations.
+
+    Notations courantes et archivées sont parcourues ensemble dans l'ordre
+    (conducteur, critère, date) : seules les cellules en cours sont gardées
+    en mémoire.
+    """
+    colonnes = ('conducteur_id', 'critere_id', 'date_notation', 'valeur', 'id')
+    lignes = Notation.objects.filter(valeur__isnull=False).values_list(*colonnes).union(
+        NotationArchivee.objects.filter(valeur__isnull=False).values_list(*colonnes), all=True
+    ).order_by('conducteur_id', 'critere_id', 'date_notation', 'id')
+
+    total = 0
+    with transaction.atomic():
+        AgregatNotation.objects.all().delete()
+        tampon = []
+        courant = None
+        for conducteur_id, critere_id, jour, valeur, _ in lignes.iterator(chunk_size=taille_lot):
+            cle = cellule(conducteur_id, critere_id, jour)
+            if courant is None or cle != (courant.conducteur_id, courant.critere_id, courant.mois):
+                courant = nouvel_agregat(cle)
+                tampon.append(courant)
+                if len(tampon) > taille_lot:
+                    # Le dernier agrégat est peut-être incomplet : on le garde
+                    AgregatNotation.objects.bulk_create(tampon[:-1], batch_size=TAILLE_LOT)
+                    total += len(tampon) - 1
+                    tampon = tampon[-1:]
+            agreger(courant, valeur, jour)
+        AgregatNotation.objects.bulk_create(tampon, batch_size=TAILLE_LOT)
+        total += len(tampon)
+    return total
+
+
+def synthese_conducteur(conducteur_id, depuis=None):
+    """Synthèse par critère d'un conducteur, lue dans les agrégats.
+
+    Retourne {critere_id: {'nombre', 'moyenne', 'mini', 'maxi', 'ecart_type',
+    'derniere_valeur', 'derniere_date'}}.
+    """
+    agregats = AgregatNotation.objects.filter(conducteur_id=conducteur_id)
+    if depuis is not None:
+        agregats = agregats.filter(mois__gte=debut_mois(depuis))
+
+    cumuls = {}
+    for agregat in agregats.order_by('mois'):
+        if agregat.critere_id not in cumuls:
+            cumuls[agregat.critere_id] = nouvel_agregat((conducteur_id, agregat.critere_id, agregat.mois))
+        cumul = cumuls[agregat.critere_id]
+        cumul.nombre += agregat.nombre
+        cumul.somme += agregat.somme
+        cumul.somme_carres += agregat.somme_carres
+        cumul.mini = agregat.mini if cumul.mini is None else min(cumul.mini, agregat.mini)
+        cumul.maxi = agregat.maxi if cumul.maxi is None else max(cumul.maxi, agregat.maxi)
+        cumul.derniere_valeur = agregat.derniere_valeur
+        cumul.derniere_date = agregat.derniere_date
+
+    return {
+        critere_id: {
+            'nombre': cumul.nombre,
+            'moyenne': cumul.moyenne,
+            'mini': cumul.mini,
+            'maxi': cumul.maxi,
+            'ecart_type': cumul.variance ** 0.5 if cumul.variance is not None else None,
+            'derniere_valeur': cumul.derniere_valeur,
+            'derniere_date': cumul.derniere_date,
+        }
+        for critere_id, cumul in cumuls.items()
+    }
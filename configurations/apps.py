@@ -8,3 +8,4 @@ class ConfigurationsConfig(AppConfig):
 
     def ready(self):
         import configurations.admin
+        import configurations.signals
@@ -0,0 +1,118 @@
+# configurations/archives.py
+# Archivage des anciennes notations et accès unifié aux notations courantes et archivées
+from datetime import date, timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Max
+
+from .models import HistoriqueNotation, HistoriqueNotationArchivee, Notation, NotationArchivee
+from .signals import suivi_suspendu
+
+CHAMPS_HISTORIQUE = (
+    'id', 'notation_id', 'notateur_id', 'conducteur_id', 'critere_id',
+    'ancienne_valeur', 'nouvelle_valeur', 'date_changement', 'utilisateur_id',
+)
+
+
+def date_limite(jours=None):
+    """Date avant laquelle une notation est archivée"""
+    if jours is None:
+        jours = getattr(settings, 'NOTATIONS_ARCHIVE_HORIZON_JOURS', 730)
+    return date.today() - timedelta(days=jours)
+
+
+def archiver_lot(avant, taille_lot=5000):
+    """Déplace le plus ancien lot de notations antérieures à `avant` vers les archives.
+
+    Les notations et leur historique sont copiés puis supprimés dans la même
+    transaction. Les agrégats mensuels ne sont pas modifiés : ils continuent
+    de couvrir les mois archivés.
+    Retourne le nombre de notations archivées (0 quand il n'y a plus rien à faire).
+    """
+    ids = list(
+        Notation.objects.filter(date_notation__lt=avant).order_by('id').values_list('id', flat=True)[:taille_lot]
+    )
+    if not ids:
+        return 0
+    # Bornes plutôt qu'une liste d'identifiants : la requête reste courte
+    lot = Notation.objects.filter(id__gte=ids[0], id__lte=ids[-1], date_notation__lt=avant)
+    historiques = HistoriqueNotation.objects.filter(notation__in=lot)
+
+    with transaction.atomic(), suivi_suspendu():
+        NotationArchivee.objects.bulk_create(
+            [
+                NotationArchivee(annee=ligne['date_notation'].year, **ligne)
+                for ligne in lot.values(
+                    'id', 'date_notation', 'notateur_id', 'conducteur_id', 'critere_id', 'valeur', 'valeur_normalisee'
+                )
+            ],
+            batch_size=500,
+        )
+        HistoriqueNotationArchivee.objects.bulk_create(
+            [HistoriqueNotationArchivee(**ligne) for ligne in historiques.values(*CHAMPS_HISTORIQUE)],
+            batch_size=500,
+        )
+        historiques.delete()
+        return lot.delete()[1].get(Notation._meta.label, 0)
+
+
+def archiver(avant, taille_lot=5000, progression=None):
+    """Archive toutes les notations antérieures à `avant`, lot par lot"""
+    from .audit import ecrivain
+    # L'historique encore en attente doit être écrit avant d'être déplacé
+    ecrivain.vider()
+
+    total = 0
+    while True:
+        nombre = archiver_lot(avant, taille_lot)
+        if not nombre:
+            return total
+        total += nombre
+        if progression:
+            progression(total)
+
+
+def derniere_date_archivee():
+    return NotationArchivee.objects.aggregate(derniere=Max('date_notation'))['derniere']
+
+
+def modeles_notations(debut=None):
+    """Modèles à lire pour une période commençant à `debut` : les archives
+    seulement si elle commence avant la plus récente notation archivée"""
+    limite = derniere_date_archivee()
+    if limite is None or (debut is not None and debut > limite):
+        return (Notation,)
+    return (Notation, NotationArchivee)
+
+
+def notations(*champs, debut=None, fin=None, annotations=None, **filtres):
+    """values_list(*champs) sur les notations courantes et, si besoin, archivées.
+
+    Les archives ne sont interrogées que si la période demandée commence
+    avant la date de la plus récente notation archivée. `annotations`
+    ({nom: expression}) est appliqué aux deux tables avant le values_list.
+    """
+    courantes = Notation.objects.filter(**filtres)
+    archivees = NotationArchivee.objects.filter(**filtres)
+    if annotations:
+        courantes = courantes.annotate(**annotations)
+        archivees = archivees.annotate(**annotations)
+    if debut is not None:
+        courantes = courantes.filter(date_notation__gte=debut)
+        archivees = archivees.filter(date_notation__gte=debut)
+    if fin is not None:
+        courantes = courantes.filter(date_notation__lte=fin)
+        archivees = archivees.filter(date_notation__lte=fin)
+
+    courantes = courantes.order_by().values_list(*champs)
+    if NotationArchivee not in modeles_notations(debut):
+        return courantes
+    return courantes.union(archivees.order_by().values_list(*champs), all=True)
+
+
+def historique(notation_id):
+    """Historique d'une notation, qu'elle soit courante ou archivée, du plus ancien au plus récent"""
+    courant = HistoriqueNotation.objects.filter(notation_id=notation_id).values(*CHAMPS_HISTORIQUE)
+    archive = HistoriqueNotationArchivee.objects.filter(notation_id=notation_id).values(*CHAMPS_HISTORIQUE)
+    return courant.union(archive, all=True).order_by('date_changement', 'id')
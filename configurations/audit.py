@@ -0,0 +1,191 @@
+# configurations/audit.py
+# Historisation des notations par un écrivain en tâche de fond
+import atexit
+import logging
+import queue
+import threading
+import time
+
+from django.conf import settings
+from django.db import DatabaseError, IntegrityError, close_old_connections, connection, transaction
+from django.db.models import Min
+
+from .models import HistoriqueNotation, HistoriqueNotationArchivee, NotationArchivee
+
+logger = logging.getLogger(__name__)
+
+
+class EcrivainHistorique:
+    """Tampon d'entrées HistoriqueNotation vidé par lots dans un thread dédié.
+
+    Les entrées sont déposées après le commit de la transaction qui les a
+    produites ; le thread les écrit par bulk_create dès que le lot est plein
+    ou que le délai est écoulé. En mode synchrone (tests, commandes), chaque
+    dépôt est écrit immédiatement.
+    La file est bornée : quand elle est pleine, le dépôt attend le thread
+    (un import massif ralentit au lieu de remplir la mémoire). À l'arrêt du
+    processus, le thread écrit son lot en cours puis la file restante.
+    """
+
+    def __init__(self, taille_lot=500, delai=2.0, asynchrone=True, capacite=10000, tentatives=3):
+        self.taille_lot = taille_lot
+        self.delai = delai
+        self.asynchrone = asynchrone
+        self.tentatives = tentatives
+        self.file = queue.Queue(maxsize=capacite)
+        self.verrou = threading.Lock()
+        self.arret = threading.Event()
+        self.thread = None
+
+    def ajouter(self, entrees):
+        if not entrees:
+            return
+        if not self.asynchrone or self.arret.is_set():
+            self.ecrire(entrees)
+            return
+        self.demarrer()
+        for entree in entrees:
+            self.file.put(entree)
+
+    def demarrer(self):
+        with self.verrou:
+            if not self.arret.is_set() and (self.thread is None or not self.thread.is_alive()):
+                self.thread = threading.Thread(target=self.boucle, name='ecrivain-historique', daemon=True)
+                self.thread.start()
+
+    def boucle(self):
+        try:
+            while True:
+                # Après la demande d'arrêt, la file est vidée sans attendre
+                arret = self.arret.is_set()
+                lot = self.prelever(bloquant=not arret)
+                if lot:
+                    self.ecrire(lot)
+                elif arret:
+                    break
+        finally:
+            connection.close()
+
+    def prelever(self, bloquant=False):
+        """Retire de la file au plus un lot d'entrées.
+
+        En mode bloquant, attend que le lot soit plein ou que le délai soit écoulé.
+        """
+        lot = []
+        echeance = time.monotonic() + self.delai
+        try:
+            while len(lot) < self.taille_lot:
+                if not bloquant:
+                    lot.append(self.file.get_nowait())
+                    continue
+                reste = echeance - time.monotonic()
+                if reste <= 0:
+                    break
+                lot.append(self.file.get(timeout=reste))
+        except queue.Empty:
+            pass
+        return lot
+
+    def ecrire(self, lot):
+        """Écrit un lot ; en cas d'échec, le réessaie puis l'écrit entrée par entrée"""
+        for tentative in range(self.tentatives):
+            close_old_connections()
+            try:
+                HistoriqueNotation.objects.bulk_create(lot, batch_size=self.taille_lot)
+                return
+            except IntegrityError:
+                # Au moins une notation a été archivée ou supprimée entre-temps
+                break
+            except DatabaseError:
+                logger.warning("Écriture de %d entrées d'historique, tentative %d échouée", len(lot), tentative + 1)
+                time.sleep(0.5 * 2 ** tentative)
+        self.ecrire_une_a_une(lot)
+
+    def ecrire_une_a_une(self, lot):
+        """Écrit chaque entrée séparément ; celles d'une notation archivée vont dans l'historique archivé"""
+        archivees = set(
+            NotationArchivee.objects.filter(pk__in={entree.notation_id for entree in lot}).values_list('pk', flat=True)
+        )
+        for entree in lot:
+            try:
+                with transaction.atomic():
+                    if entree.notation_id in archivees:
+                        archiver_entree(entree)
+                    else:
+                        entree.pk = None
+                        entree.save(force_insert=True)
+            except IntegrityError:
+                # Comme pour une suppression : l'historique disparaît avec la notation
+                logger.warning("Notation %s supprimée, entrée d'historique ignorée", entree.notation_id)
+            except DatabaseError:
+                logger.exception(
+                    "Entrée d'historique perdue : notation %s, %s -> %s",
+                    entree.notation_id, entree.ancienne_valeur, entree.nouvelle_valeur,
+                )
+
+    def vider(self):
+        """Écrit immédiatement tout ce qui est en attente (archivage, tests)"""
+        while True:
+            lot = self.prelever()
+            if not lot:
+                break
+            self.ecrire(lot)
+
+    def arreter(self, attente=30.0):
+        """Fin de processus : le thread termine son lot en cours et la file, le reste est écrit ici"""
+        self.arret.set()
+        if self.thread is not None and self.thread.is_alive():
+            self.thread.join(attente)
+        self.vider()
+
+
+def archiver_entree(entree):
+    """Range dans l'historique archivé une entrée arrivée après l'archivage de sa notation.
+
+    Les identifiants d'origine sont ceux de HistoriqueNotation ; ces entrées,
+    qui n'en ont pas, reçoivent des identifiants négatifs pour ne jamais les
+    rencontrer.
+    """
+    minimum = HistoriqueNotationArchivee.objects.aggregate(minimum=Min('id'))['minimum'] or 0
+    HistoriqueNotationArchivee.objects.create(
+        id=min(minimum, 0) - 1,
+        notation_id=entree.notation_id,
+        notateur_id=entree.notateur_id,
+        conducteur_id=entree.conducteur_id,
+        critere_id=entree.critere_id,
+        ancienne_valeur=entree.ancienne_valeur,
+        nouvelle_valeur=entree.nouvelle_valeur,
+        date_changement=entree.date_changement,
+        utilisateur_id=entree.utilisateur_id,
+    )
+
+
+ecrivain = EcrivainHistorique(
+    taille_lot=getattr(settings, 'NOTATIONS_AUDIT_TAILLE_LOT', 500),
+    delai=getattr(settings, 'NOTATIONS_AUDIT_DELAI', 2.0),
+    asynchrone=getattr(settings, 'NOTATIONS_AUDIT_ASYNCHRONE', True),
+    capacite=getattr(settings, 'NOTATIONS_AUDIT_CAPACITE', 10000),
+)
+atexit.register(ecrivain.arreter)
+
+
+def entrees_historique(changements, utilisateur=None):
+    """Construit les entrées d'historique d'une liste de ChangementNotation.
+
+    Les suppressions ne sont pas historisées : l'historique d'une notation
+    supprimée disparaît avec elle.
+    """
+    utilisateur_id = utilisateur.pk if utilisateur is not None and utilisateur.is_authenticated else None
+    return [
+        HistoriqueNotation(
+            notation_id=changement.notation_id,
+            notateur_id=changement.notateur_id,
+            conducteur_id=changement.conducteur_id,
+            critere_id=changement.critere_id,
+            ancienne_valeur=changement.ancienne_valeur,
+            nouvelle_valeur=changement.nouvelle_valeur,
+            utilisateur_id=utilisateur_id,
+        )
+        for changement in changements
+        if changement.action != 'suppression'
+    ]
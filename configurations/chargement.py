@@ -0,0 +1,211 @@
+# configurations/chargement.py
+# Chargement en masse de fixtures et de données de référence, sans save() par ligne
+import json
+
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .empreintes import empreinte_conducteur
+from .models import Conducteur, Notateur, normaliser_nom_prenom
+
+TAILLE_LOT = 1000
+
+TAILLE_LECTURE = 64 * 1024
+
+
+def lire_objets(flux):
+    """Objets JSON lus un à un depuis un tableau JSON ou un flux NDJSON.
+
+    Le flux est lu par blocs : seul l'objet en cours de décodage est gardé
+    en mémoire, quelle que soit la taille du fichier.
+    """
+    decodeur = json.JSONDecoder()
+    tampon = ''
+    position = 0
+    fin = False
+    while True:
+        # Séparateurs entre objets : blancs, crochets du tableau, virgules
+        while position < len(tampon) and tampon[position] in ' \t\r\n,[]':
+            position += 1
+        if position == len(tampon):
+            if fin:
+                return
+            tampon, position = flux.read(TAILLE_LECTURE), 0
+            fin = not tampon
+            continue
+        try:
+            objet, suivant = decodeur.raw_decode(tampon, position)
+        except json.JSONDecodeError:
+            if fin:
+                raise
+            bloc = flux.read(TAILLE_LECTURE)
+            fin = not bloc
+            tampon, position = tampon[position:] + bloc, 0
+            continue
+        yield objet
+        position = suivant
+
+
+class Correspondances:
+    """Identifiants et noms des objets d'un modèle de référence, pour résoudre les clés étrangères.
+
+    Une valeur entière est prise comme clé primaire, une chaîne comme valeur
+    du champ `nom` (sans tenir compte de la casse).
+    """
+
+    def __init__(self, modele):
+        self.avec_nom = any(champ.name == 'nom' for champ in modele._meta.fields)
+        colonnes = ('pk', 'nom') if self.avec_nom else ('pk',)
+        self.ids = set()
+        self.noms = {}
+        for ligne in modele.objects.values_list(*colonnes).iterator():
+            self.ajouter(*ligne)
+
+    def ajouter(self, pk, nom=None):
+        self.ids.add(pk)
+        if nom:
+            self.noms[nom.strip().lower()] = pk
+
+    def resoudre(self, valeur):
+        if valeur is None:
+            return None
+        if isinstance(valeur, int) or (isinstance(valeur, str) and valeur.strip().isdigit()):
+            return int(valeur) if int(valeur) in self.ids else None
+        return self.noms.get(str(valeur).strip().lower())
+
+
+class Chargeur:
+    """Construit les instances par lots et les insère par bulk_create.
+
+    Les noms de conducteurs et de notateurs sont normalisés comme dans save() ;
+    le statut d'activité et l'empreinte ERP des conducteurs sont calculés. Les
+    traitements faits d'ordinaire par signaux (historique d'affectation, index
+    de recherche) sont déclenchés une fois par lot.
+    À utiliser dans une transaction : les lots en attente d'un modèle de
+    référence sont insérés avant toute résolution de clé vers ce modèle.
+    """
+
+    def __init__(self, taille_lot=TAILLE_LOT, ignorer_existants=False):
+        self.taille_lot = taille_lot
+        self.ignorer_existants = ignorer_existants
+        self.en_attente = {}
+        self.correspondances = {}
+        self.existants = {}
+        self.compteurs = {}
+
+    def modele(self, libelle):
+        try:
+            return apps.get_model(libelle)
+        except (LookupError, ValueError):
+            raise ValidationError(f"Modèle inconnu : {libelle}")
+
+    def correspondance(self, modele):
+        if modele not in self.correspondances:
+            self.correspondances[modele] = Correspondances(modele)
+        return self.correspondances[modele]
+
+    def deja_present(self, modele, objet):
+        if modele not in self.existants:
+            cles = set(modele.objects.values_list('pk', flat=True))
+            if modele is Conducteur:
+                cles |= {('erp_id', erp_id) for erp_id in Conducteur.objects.values_list('erp_id', flat=True)}
+            self.existants[modele] = cles
+        cles = self.existants[modele]
+        if objet.pk is not None and objet.pk in cles:
+            return True
+        return modele is Conducteur and ('erp_id', objet.erp_id) in cles
+
+    def construire(self, modele, pk, champs):
+        """Instance non sauvegardée à partir des champs d'une fixture ou d'un objet JSON"""
+        valeurs = {}
+        for nom, valeur in champs.items():
+            champ = modele._meta.get_field(nom)
+            if champ.many_to_one:
+                cible = champ.related_model
+                if self.en_attente.get(cible):
+                    self.vider(cible)
+                identifiant = self.correspondance(cible).resoudre(valeur)
+                if identifiant is None and valeur is not None:
+                    raise ValidationError(f"{cible._meta.verbose_name} « {valeur} » introuvable")
+                valeurs[champ.attname] = identifiant
+            else:
+                valeurs[champ.attname] = champ.to_python(valeur)
+        objet = modele(pk=pk, **valeurs)
+
+        if modele in (Conducteur, Notateur):
+            normaliser_nom_prenom(objet)
+        if modele is Conducteur:
+            objet.est_actif = Conducteur.statut_actif(objet.actif_p, objet.date_sortie)
+            objet.empreinte_erp = empreinte_conducteur({
+                'erp_id': objet.erp_id, 'nom': objet.nom_slug, 'prenom': objet.prenom_slug,
+                'date_naissance': objet.date_naissance, 'date_entree': objet.date_entree,
+                'date_sortie': objet.date_sortie, 'service_id': objet.service_id, 'site_id': objet.site_id,
+                'societe_id': objet.societe_id, 'interim_p': objet.interim_p,
+            })
+        return objet
+
+    def ajouter(self, donnees, modele_defaut=None):
+        """Ajoute un objet de fixture ({model, pk, fields}) ou un objet JSON simple du modèle par défaut"""
+        if 'model' in donnees:
+            modele = self.modele(donnees['model'])
+            objet = self.construire(modele, donnees.get('pk'), donnees.get('fields', {}))
+        elif modele_defaut is not None:
+            champs = dict(donnees)
+            pk = champs.pop('pk', champs.pop('id', None))
+            modele = modele_defaut
+            objet = self.construire(modele, pk, champs)
+        else:
+            raise ValidationError("Objet sans modèle : précisez le modèle par défaut.")
+
+        if self.ignorer_existants and self.deja_present(modele, objet):
+            self.compteurs.setdefault(modele._meta.label, {'crees': 0, 'ignores': 0})['ignores'] += 1
+            return
+        lot = self.en_attente.setdefault(modele, [])
+        lot.append(objet)
+        if len(lot) >= self.taille_lot:
+            self.vider(modele)
+
+    def vider(self, modele):
+        """Insère le lot en attente d'un modèle"""
+        lot = self.en_attente.pop(modele, [])
+        if not lot:
+            return
+        modele.objects.bulk_create(lot, batch_size=self.taille_lot)
+        self.compteurs.setdefault(modele._meta.label, {'crees': 0, 'ignores': 0})['crees'] += len(lot)
+
+        if modele in self.correspondances:
+            correspondance = self.correspondances[modele]
+            for objet in lot:
+                correspondance.ajouter(objet.pk, getattr(objet, 'nom', None) if correspondance.avec_nom else None)
+        if modele in self.existants:
+            self.existants[modele].update(objet.pk for objet in lot)
+        self.apres_insertion(modele, lot)
+
+    def apres_insertion(self, modele, lot):
+        # Objets nouveaux : aucun cache à invalider, seuls l'historique et l'index sont à créer
+        from .recherche import indexer
+        if modele is Conducteur:
+            from .affectations import ouvrir
+            ouvrir(lot)
+            indexer('conducteur', [objet.pk for objet in lot])
+        elif modele is Notateur:
+            indexer('notateur', [objet.pk for objet in lot])
+
+    def terminer(self):
+        for modele in list(self.en_attente):
+            self.vider(modele)
+        return self.compteurs
+
+
+def charger(objets, modele_defaut=None, taille_lot=TAILLE_LOT, ignorer_existants=False):
+    """Charge une suite d'objets dans une seule transaction ; retourne les compteurs par modèle"""
+    chargeur = Chargeur(taille_lot=taille_lot, ignorer_existants=ignorer_existants)
+    with transaction.atomic():
+        for numero, donnees in enumerate(objets, start=1):
+            try:
+                chargeur.ajouter(donnees, modele_defaut)
+            except (ValidationError, ValueError, TypeError, LookupError) as e:
+                message = e.messages[0] if isinstance(e, ValidationError) else str(e)
+                raise ValidationError(f"Objet {numero} : {message}")
+        return chargeur.terminer()
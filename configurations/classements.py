@@ -0,0 +1,219 @@
+# configurations/classements.py
+# Classements des conducteurs par service, site et société
+import time
+
+import numpy as np
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count, F, Q, Window
+from django.db.models.functions import DenseRank, PercentRank
+
+from .models import Conducteur, ScoreConducteur
+from .versions import cache_versions
+
+REGROUPEMENTS = {
+    'service': 'conducteur__service_id',
+    'site': 'conducteur__site_id',
+    'societe': 'conducteur__societe_id',
+}
+
+DUREE_CACHE = 60 * 60
+
+
+def scores_actifs():
+    """Scores des conducteurs actuellement actifs"""
+    return ScoreConducteur.objects.filter(conducteur__est_actif=True)
+
+
+def classer(regroupement):
+    """Rang dense et percentile de chaque conducteur au sein de son groupe.
+
+    Le calcul est fait par fonctions de fenêtrage SQL quand la base les
+    supporte, sinon sur tableaux NumPy. Le percentile vaut 1 pour le meilleur
+    score du groupe et 0 pour le moins bon.
+    Retourne une liste de dictionnaires {conducteur_id, groupe_id, score, rang, percentile}.
+    """
+    champ = REGROUPEMENTS[regroupement]
+    if connection.features.supports_over_clause:
+        lignes = scores_actifs().annotate(
+            groupe_id=F(champ),
+            rang=Window(DenseRank(), partition_by=[F(champ)], order_by=F('score').desc()),
+            percentile=Window(PercentRank(), partition_by=[F(champ)], order_by=F('score').asc()),
+        ).order_by('groupe_id', 'rang', 'conducteur_id').values(
+            'conducteur_id', 'groupe_id', 'score', 'rang', 'percentile'
+        )
+        return list(lignes)
+    return classer_numpy(scores_actifs().values_list('conducteur_id', champ, 'score'))
+
+
+def classer_numpy(lignes):
+    """Équivalent NumPy des fonctions DenseRank et PercentRank partitionnées"""
+    lignes = list(lignes)
+    if not lignes:
+        return []
+    tableau = np.array(lignes, dtype=np.float64)
+    conducteurs = tableau[:, 0].astype(np.int64)
+    groupes = tableau[:, 1].astype(np.int64)
+    scores = tableau[:, 2]
+
+    # Tri par groupe puis score décroissant
+    ordre = np.lexsort((conducteurs, -scores, groupes))
+    groupes, scores, conducteurs = groupes[ordre], scores[ordre], conducteurs[ordre]
+
+    n = len(scores)
+    debut_groupe = np.r_[True, groupes[1:] != groupes[:-1]]
+    nouveau_score = np.r_[True, scores[1:] != scores[:-1]] | debut_groupe
+
+    # Index du groupe et du bloc d'ex aequo de chaque ligne
+    groupe = np.cumsum(debut_groupe) - 1
+    bloc = np.cumsum(nouveau_score) - 1
+    debuts_groupes = np.flatnonzero(debut_groupe)
+    debuts_blocs = np.flatnonzero(nouveau_score)
+    fin_groupe = (np.r_[debuts_groupes[1:], n] - 1)[groupe]
+    fin_bloc = (np.r_[debuts_blocs[1:], n] - 1)[bloc]
+    tailles = np.bincount(groupe)[groupe]
+
+    rangs = bloc - bloc[debuts_groupes][groupe] + 1
+    # PercentRank : scores strictement inférieurs / (taille du groupe - 1)
+    percentiles = np.divide(
+        fin_groupe - fin_bloc, tailles - 1, out=np.zeros(n), where=tailles > 1
+    )
+
+    return [
+        {
+            'conducteur_id': int(c), 'groupe_id': int(g), 'score': float(s),
+            'rang': int(r), 'percentile': float(p),
+        }
+        for c, g, s, r, p in zip(conducteurs, groupes, scores, rangs, percentiles)
+    ]
+
+
+def rang_conducteur(conducteur_id):
+    """Position d'un conducteur actif dans son service, son site et sa société.
+
+    Les mêmes fenêtres que classer() sont calculées sur les seuls groupes du
+    conducteur (chaque partition y est complète), puis sa ligne est extraite
+    de cette requête utilisée comme sous-requête.
+    """
+    try:
+        score = ScoreConducteur.objects.select_related('conducteur').get(
+            conducteur_id=conducteur_id, conducteur__est_actif=True
+        )
+    except ScoreConducteur.DoesNotExist:
+        return None
+    if not connection.features.supports_over_clause:
+        lignes = scores_actifs().filter(
+            groupes_du_conducteur(score.conducteur)
+        ).values_list('conducteur_id', *REGROUPEMENTS.values(), 'score')
+        return position_numpy(conducteur_id, score.score, lignes)
+
+    fenetres = {}
+    for regroupement, champ in REGROUPEMENTS.items():
+        fenetres[f"rang_{regroupement}"] = Window(DenseRank(), partition_by=[F(champ)], order_by=F('score').desc())
+        fenetres[f"percentile_{regroupement}"] = Window(PercentRank(), partition_by=[F(champ)], order_by=F('score').asc())
+        fenetres[f"taille_{regroupement}"] = Window(Count('pk'), partition_by=[F(champ)])
+    requete = scores_actifs().filter(groupes_du_conducteur(score.conducteur)).annotate(**fenetres).values(
+        'conducteur_id', *fenetres
+    )
+    sql, params = requete.query.sql_with_params()
+    with connection.cursor() as curseur:
+        curseur.execute(
+            f"SELECT {', '.join(fenetres)} FROM ({sql}) classement WHERE classement.conducteur_id = %s",
+            (*params, conducteur_id),
+        )
+        valeurs = dict(zip(fenetres, curseur.fetchone()))
+
+    return {
+        'score': score.score,
+        **{
+            regroupement: {
+                'rang': valeurs[f"rang_{regroupement}"],
+                'taille': valeurs[f"taille_{regroupement}"],
+                'percentile': valeurs[f"percentile_{regroupement}"],
+            }
+            for regroupement in REGROUPEMENTS
+        },
+    }
+
+
+def groupes_du_conducteur(conducteur):
+    """Scores du service, du site ou de la société du conducteur"""
+    condition = Q()
+    for regroupement, champ in REGROUPEMENTS.items():
+        condition |= Q(**{champ: getattr(conducteur, f"{regroupement}_id")})
+    return condition
+
+
+def position_numpy(conducteur_id, score, lignes):
+    """Équivalent de rang_conducteur sans fonctions de fenêtrage, via classer_numpy"""
+    lignes = list(lignes)
+    positions = {}
+    for i, regroupement in enumerate(REGROUPEMENTS):
+        ligne = next(
+            ligne for ligne in classer_numpy((c, valeurs[i], valeurs[-1]) for c, *valeurs in lignes)
+            if ligne['conducteur_id'] == conducteur_id
+        )
+        taille = sum(1 for _, *valeurs in lignes if valeurs[i] == ligne['groupe_id'])
+        positions[regroupement] = {'rang': ligne['rang'], 'taille': taille, 'percentile': ligne['percentile']}
+    return {'score': score, **positions}
+
+
+def cle_version(regroupement, groupe_id):
+    return f"classement:version:{regroupement}:{groupe_id}"
+
+
+def nouvelle_version():
+    # Une version évincée du cache repart d'une valeur jamais servie, pas de 1
+    return time.time_ns()
+
+
+def tableau(regroupement, groupe_id, k=10):
+    """Meilleurs et derniers conducteurs d'un groupe, mis en cache.
+
+    L'entrée est invalidée par changement de version du groupe, sans toucher
+    aux autres groupes.
+    """
+    version = cache_versions.get_or_set(cle_version(regroupement, groupe_id), nouvelle_version, None)
+    cle = f"classement:{regroupement}:{groupe_id}:{k}:v{version}"
+    resultat = cache.get(cle)
+    if resultat is None:
+        groupe = scores_actifs().filter(**{REGROUPEMENTS[regroupement]: groupe_id})
+        colonnes = (
+            'conducteur_id', 'conducteur__nom', 'conducteur__nom_slug',
+            'conducteur__prenom', 'conducteur__prenom_slug', 'score',
+        )
+
+        def lignes(requete):
+            return [
+                {'conducteur_id': c, 'nom': f"{prenom_slug or prenom} {nom_slug or nom}", 'score': round(s, 2)}
+                for c, nom, nom_slug, prenom, prenom_slug, s in requete.values_list(*colonnes)[:k]
+            ]
+
+        resultat = {
+            'meilleurs': lignes(groupe.order_by('-score', 'conducteur_id')),
+            'derniers': lignes(groupe.order_by('score', 'conducteur_id')),
+        }
+        cache.set(cle, resultat, DUREE_CACHE)
+    return resultat
+
+
+def invalider_groupes(conducteur_ids):
+    """Change la version des classements des groupes de ces conducteurs"""
+    affectations = Conducteur.objects.filter(pk__in=conducteur_ids).values_list('service_id', 'site_id', 'societe_id')
+    groupes = set()
+    for service_id, site_id, societe_id in affectations:
+        groupes.update({('service', service_id), ('site', site_id), ('societe', societe_id)})
+    for regroupement, groupe_id in groupes:
+        cle = cle_version(regroupement, groupe_id)
+        try:
+            cache_versions.incr(cle)
+        except ValueError:
+            cache_versions.set(cle, nouvelle_version(), None)
+
+
+def rafraichir(conducteur_ids):
+    """Recalcule les scores de quelques conducteurs et invalide leurs classements"""
+    from .scores import enregistrer_scores, scores_conducteurs
+    conducteur_ids = list(conducteur_ids)
+    enregistrer_scores(scores_conducteurs(conducteur_ids=conducteur_ids), conducteur_ids=conducteur_ids)
+    invalider_groupes(conducteur_ids)
@@ -0,0 +1,102 @@
+# configurations/consultation.py
+# Lecture des notations : filtres et pagination par curseur (date_notation, id)
+import heapq
+from datetime import date
+
+from django.db.models import Q
+
+from .models import Notation, NotationArchivee
+
+LIMITE_DEFAUT = 100
+LIMITE_MAXI = 1000
+
+# Paramètre de requête -> champ filtré
+FILTRES = {
+    'conducteur': 'conducteur_id',
+    'notateur': 'notateur_id',
+    'critere': 'critere_id',
+    'service': 'conducteur__service_id',
+}
+
+CHAMPS = (
+    'id', 'date_notation', 'conducteur_id', 'notateur_id', 'critere_id', 'valeur', 'valeur_normalisee',
+)
+
+
+def filtrer_notations(parametres, requete=None):
+    """Applique les filtres conducteur, notateur, critère, service, du et au.
+
+    Les identifiants peuvent être répétés (?critere=1&critere=2).
+    Lève ValueError si un paramètre est mal formé.
+    """
+    requete = Notation.objects.all() if requete is None else requete
+    for parametre, champ in FILTRES.items():
+        valeurs = [int(v) for v in parametres.getlist(parametre) if v != '']
+        if len(valeurs) == 1:
+            requete = requete.filter(**{champ: valeurs[0]})
+        elif valeurs:
+            requete = requete.filter(**{f"{champ}__in": valeurs})
+    if parametres.get('du'):
+        requete = requete.filter(date_notation__gte=date.fromisoformat(parametres['du']))
+    if parametres.get('au'):
+        requete = requete.filter(date_notation__lte=date.fromisoformat(parametres['au']))
+    return requete
+
+
+def filtrer_archivees(parametres):
+    """Notations archivées avec les mêmes filtres que filtrer_notations"""
+    return filtrer_notations(parametres, NotationArchivee.objects.all())
+
+
+def encoder_curseur(ligne):
+    return f"{ligne['date_notation'].isoformat()}_{ligne['id']}"
+
+
+def decoder_curseur(curseur):
+    """'AAAA-MM-JJ_id' -> (date, id) ; lève ValueError si le curseur est invalide"""
+    jour, _, identifiant = curseur.partition('_')
+    return date.fromisoformat(jour), int(identifiant)
+
+
+def page_notations(requete, curseur=None, limite=LIMITE_DEFAUT, decroissant=False, archivees=None):
+    """Page de notations après `curseur`, triée sur (date_notation, id).
+
+    La condition sur le curseur commence par une borne sur date_notation pour
+    que la base parcoure l'index à partir de la position du curseur : le coût
+    d'une page ne dépend pas de sa profondeur.
+    Avec `archivees` (queryset de NotationArchivee, mêmes filtres), la page
+    est prise dans les deux tables : chacune fournit sa propre page, les deux
+    sont fusionnées et chaque ligne porte un booléen 'archivee'.
+    Retourne (lignes, curseur_suivant) ; curseur_suivant vaut None en fin de liste.
+    """
+    lignes = lignes_apres(requete, curseur, limite, decroissant)
+    if archivees is not None:
+        for ligne in lignes:
+            ligne['archivee'] = False
+        anciennes = lignes_apres(archivees, curseur, limite, decroissant)
+        for ligne in anciennes:
+            ligne['archivee'] = True
+        lignes = list(heapq.merge(
+            lignes, anciennes, key=lambda ligne: (ligne['date_notation'], ligne['id']), reverse=decroissant
+        ))[:limite + 1]
+    if len(lignes) > limite:
+        lignes = lignes[:limite]
+        return lignes, encoder_curseur(lignes[-1])
+    return lignes, None
+
+
+def lignes_apres(requete, curseur, limite, decroissant):
+    """Au plus limite + 1 lignes de `requete` après le curseur"""
+    if curseur:
+        jour, identifiant = decoder_curseur(curseur)
+        if decroissant:
+            requete = requete.filter(
+                Q(date_notation__lte=jour), Q(date_notation__lt=jour) | Q(id__lt=identifiant)
+            )
+        else:
+            requete = requete.filter(
+                Q(date_notation__gte=jour), Q(date_notation__gt=jour) | Q(id__gt=identifiant)
+            )
+
+    ordre = ('-date_notation', '-id') if decroissant else ('date_notation', 'id')
+    return list(requete.order_by(*ordre).values(*CHAMPS)[:limite + 1])
@@ -0,0 +1,187 @@
+# configurations/dumps.py
+# Dump en flux des conducteurs (JSON, JSONL, XML), avec compression gzip ou xz, éventuellement fragmenté
+import gzip
+import hashlib
+import json
+import lzma
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import django
+from django.core import serializers
+from django.db import connections
+from django.utils import timezone
+
+from .models import Conducteur
+
+TAILLE_BLOC = 2000
+
+FORMATS = ('json', 'jsonl', 'xml', 'yaml')
+
+COMPRESSIONS = {
+    'gzip': (gzip.open, '.gz'),
+    'xz': (lzma.open, '.xz'),
+}
+
+# Relations sérialisées avec --include-related, dans l'ordre d'écriture ;
+# ce sont aussi les partitions possibles d'un dump fragmenté
+RELATIONS = ('service', 'site', 'societe')
+
+
+def compression_du_fichier(chemin):
+    """Compression déduite de l'extension (.gz, .xz), None sinon"""
+    suffixe = Path(chemin).suffix.lower()
+    for compression, (_, extension) in COMPRESSIONS.items():
+        if suffixe == extension:
+            return compression
+    return None
+
+
+def ouvrir_sortie(chemin, compression=None):
+    """Fichier texte UTF-8 en écriture, compressé au fil de l'eau si demandé"""
+    if compression:
+        ouvrir, _ = COMPRESSIONS[compression]
+        return ouvrir(chemin, 'wt', encoding='utf-8')
+    return open(chemin, 'w', encoding='utf-8')
+
+
+def lire_requete(requete, taille_bloc=TAILLE_BLOC):
+    """Conducteurs d'un queryset avec leurs relations, lus par blocs côté serveur"""
+    return requete.select_related(*RELATIONS).iterator(chunk_size=taille_bloc)
+
+
+def lire_ids(ids, taille_bloc=TAILLE_BLOC):
+    """Conducteurs d'une liste d'identifiants, par requêtes de `taille_bloc` identifiants"""
+    for i in range(0, len(ids), taille_bloc):
+        yield from Conducteur.objects.select_related(*RELATIONS).filter(pk__in=ids[i:i + taille_bloc]).order_by('pk')
+
+
+def objets_dump(conducteurs, liees=None):
+    """Conducteurs, suivis des services, sites et sociétés rencontrés.
+
+    Les objets liés viennent du select_related et sont collectés pendant
+    l'unique passage sur les conducteurs ; `liees` (dict relation -> {pk:
+    objet}) est rempli au passage. Sans `liees`, seuls les conducteurs sont
+    produits.
+    """
+    for conducteur in conducteurs:
+        if liees is not None:
+            for relation in RELATIONS:
+                objet = getattr(conducteur, relation)
+                if objet is not None:
+                    liees.setdefault(relation, {})[objet.pk] = objet
+        yield conducteur
+    if liees is not None:
+        for relation in RELATIONS:
+            yield from (objet for _, objet in sorted(liees.get(relation, {}).items()))
+
+
+def ecrire_dump(conducteurs, sortie, format_dump='json', avec_liees=False, cles_naturelles=False):
+    """Sérialise les conducteurs (lire_requete, lire_ids) dans le fichier ouvert `sortie`, objet par objet.
+
+    Retourne les compteurs {'conducteurs': n, 'service': n, 'site': n,
+    'societe': n}. Le sérialiseur YAML de Django accumule les objets avant
+    d'écrire : seuls JSON, JSONL et XML sont en mémoire constante.
+    """
+    compteurs = {'conducteurs': 0}
+    liees = {} if avec_liees else None
+
+    def compter(objets):
+        for objet in objets:
+            if objet._meta.model_name == 'conducteur':
+                compteurs['conducteurs'] += 1
+            yield objet
+
+    serializers.get_serializer(format_dump)().serialize(
+        compter(objets_dump(conducteurs, liees)),
+        stream=sortie,
+        indent=None if format_dump == 'jsonl' else 2,
+        use_natural_foreign_keys=cles_naturelles,
+        use_natural_primary_keys=cles_naturelles,
+    )
+    if liees is not None:
+        compteurs.update({relation: len(liees.get(relation, {})) for relation in RELATIONS})
+    return compteurs
+
+
+def empreinte_fichier(chemin):
+    """Somme SHA-256 du fichier écrit (après compression)"""
+    somme = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1024 * 1024), b''):
+            somme.update(bloc)
+    return somme.hexdigest()
+
+
+def partitionner(requete, champ):
+    """{groupe_id: [ids des conducteurs]} selon le service, le site ou la société, en une requête"""
+    fragments = {}
+    for pk, groupe_id in requete.order_by(f"{champ}_id", 'pk').values_list('pk', f"{champ}_id").iterator():
+        fragments.setdefault(groupe_id, []).append(pk)
+    return fragments
+
+
+def chemin_fragment(sortie, champ, groupe_id):
+    """« flotte.json.gz » -> « flotte_site_3.json.gz »"""
+    sortie = Path(sortie)
+    nom = sortie.name
+    base, _, extensions = nom.partition('.')
+    return sortie.with_name(f"{base}_{champ}_{groupe_id}{'.' + extensions if extensions else ''}")
+
+
+def chemin_manifeste(sortie):
+    sortie = Path(sortie)
+    return sortie.with_name(f"{sortie.name.partition('.')[0]}_manifeste.json")
+
+
+def ecrire_fragment(chemin, ids, format_dump, compression, avec_liees, cles_naturelles, taille_bloc):
+    """Écrit un fragment ; exécuté dans un processus du pool, avec sa propre connexion"""
+    with ouvrir_sortie(chemin, compression) as sortie:
+        compteurs = ecrire_dump(lire_ids(ids, taille_bloc), sortie, format_dump, avec_liees, cles_naturelles)
+    return {
+        'fichier': Path(chemin).name,
+        'conducteurs': compteurs['conducteurs'],
+        'octets': Path(chemin).stat().st_size,
+        'sha256': empreinte_fichier(chemin),
+    }
+
+
+def ecrire_fragments(requete, sortie, champ, format_dump='json', compression=None, avec_liees=False,
+                     cles_naturelles=False, taille_bloc=TAILLE_BLOC, processus=None):
+    """Un dump par service (site, société), écrits en parallèle, et leur manifeste.
+
+    Les conducteurs sont répartis en une seule requête ; chaque processus
+    relit ensuite les conducteurs de son fragment par identifiants. Le
+    manifeste (nombre de conducteurs, taille et SHA-256 de chaque fichier)
+    est écrit à côté des fragments. Retourne le manifeste.
+    """
+    fragments = partitionner(requete, champ)
+    modele = Conducteur._meta.get_field(champ).related_model
+    noms = dict(modele.objects.filter(pk__in=list(fragments)).values_list('pk', 'nom'))
+
+    # Les processus fils ouvrent leurs propres connexions
+    connections.close_all()
+    with ProcessPoolExecutor(max_workers=processus, initializer=django.setup) as pool:
+        taches = {
+            groupe_id: pool.submit(
+                ecrire_fragment, str(chemin_fragment(sortie, champ, groupe_id)), ids,
+                format_dump, compression, avec_liees, cles_naturelles, taille_bloc,
+            )
+            for groupe_id, ids in fragments.items()
+        }
+        fichiers = [
+            {champ: noms.get(groupe_id), f"{champ}_id": groupe_id, **tache.result()}
+            for groupe_id, tache in taches.items()
+        ]
+
+    manifeste = {
+        'cree_le': timezone.now().isoformat(),
+        'partition': champ,
+        'format': format_dump,
+        'compression': compression,
+        'conducteurs': sum(fichier['conducteurs'] for fichier in fichiers),
+        'fichiers': fichiers,
+    }
+    with open(chemin_manifeste(sortie), 'w', encoding='utf-8') as f:
+        json.dump(manifeste, f, ensure_ascii=False, indent=2)
+    return manifeste
@@ -0,0 +1,30 @@
+# configurations/empreintes.py
+# Empreintes (hachages) stables d'enregistrements, pour détecter les changements
+import hashlib
+import json
+from datetime import date
+
+# Champs ERP d'un conducteur pris en compte dans son empreinte, dans cet ordre
+CHAMPS_ERP_CONDUCTEUR = (
+    'erp_id', 'nom', 'prenom', 'date_naissance', 'date_entree', 'date_sortie',
+    'service_id', 'site_id', 'societe_id', 'interim_p',
+)
+
+
+def normaliser(valeur):
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    if isinstance(valeur, str):
+        return valeur.strip()
+    return valeur
+
+
+def empreinte(valeurs, octets=20):
+    """Hachage hexadécimal (2 × `octets` caractères, 40 par défaut) d'une suite de valeurs simples"""
+    texte = json.dumps([normaliser(valeur) for valeur in valeurs], separators=(',', ':'), ensure_ascii=False)
+    return hashlib.blake2b(texte.encode('utf-8'), digest_size=octets).hexdigest()
+
+
+def empreinte_conducteur(donnees):
+    """Empreinte des champs ERP d'un conducteur, donnés sous forme de dictionnaire"""
+    return empreinte(donnees.get(champ) for champ in CHAMPS_ERP_CONDUCTEUR)
@@ -0,0 +1,211 @@
+# configurations/erp.py
+# Synchronisation incrémentale des conducteurs à partir d'un extrait de l'ERP
+from datetime import date
+
+from django.db import transaction
+
+from .affectations import enregistrer_changements, ouvrir
+from .empreintes import empreinte_conducteur
+from .models import Conducteur, Service, Site, Societe, normaliser_nom_prenom
+from .signals import conducteurs_modifies
+
+TAILLE_LOT = 500
+
+# actif_p n'y figure pas : l'extrait ne le porte pas, et un conducteur mis
+# hors service dans l'application doit le rester après une modification ERP
+CHAMPS_MODIFIABLES = [
+    'nom', 'prenom', 'nom_slug', 'prenom_slug', 'date_naissance', 'date_entree', 'date_sortie',
+    'service', 'site', 'societe', 'est_actif', 'interim_p', 'empreinte_erp',
+]
+
+
+class Referentiels:
+    """Correspondances nom -> identifiant des services, sites et sociétés.
+
+    Une valeur entière est prise comme identifiant, une chaîne comme nom
+    (sans tenir compte de la casse).
+    """
+
+    def __init__(self):
+        self.tables = {}
+        for champ, modele in (('service', Service), ('site', Site), ('societe', Societe)):
+            lignes = list(modele.objects.values_list('pk', 'nom'))
+            self.tables[champ] = (
+                {pk for pk, _ in lignes},
+                {nom.strip().lower(): pk for pk, nom in lignes},
+            )
+
+    def resoudre(self, champ, valeur):
+        ids, noms = self.tables[champ]
+        if isinstance(valeur, int) or (isinstance(valeur, str) and valeur.strip().isdigit()):
+            pk = int(valeur)
+            return pk if pk in ids else None
+        return noms.get(str(valeur).strip().lower())
+
+
+def lire_date(valeur):
+    if valeur in (None, ''):
+        return None
+    return date.fromisoformat(str(valeur).strip()[:10])
+
+
+def lire_booleen(valeur):
+    if isinstance(valeur, str):
+        return valeur.strip().lower() in ('1', 'true', 'vrai', 'oui', 'o')
+    return bool(valeur)
+
+
+def preparer(enregistrement, referentiels):
+    """Enregistrement ERP brut -> dictionnaire des champs du conducteur.
+
+    Lève ValueError si l'enregistrement est incomplet ou incohérent.
+    """
+    try:
+        donnees = {
+            'erp_id': int(enregistrement['erp_id']),
+            'nom': str(enregistrement['nom']).strip(),
+            'prenom': str(enregistrement['prenom']).strip(),
+            'date_naissance': lire_date(enregistrement.get('date_naissance')),
+            'date_entree': lire_date(enregistrement['date_entree']),
+            'date_sortie': lire_date(enregistrement.get('date_sortie')),
+            'interim_p': lire_booleen(enregistrement.get('interim_p', False)),
+        }
+    except KeyError as e:
+        raise ValueError(f"champ {e} manquant")
+    except TypeError as e:
+        raise ValueError(str(e))
+
+    if not donnees['nom'] or not donnees['prenom'] or donnees['date_entree'] is None:
+        raise ValueError("nom, prénom et date d'entrée sont obligatoires")
+    for champ in ('service', 'site', 'societe'):
+        pk = referentiels.resoudre(champ, enregistrement.get(champ, ''))
+        if pk is None:
+            raise ValueError(f"{champ} « {enregistrement.get(champ)} » inconnu")
+        donnees[f"{champ}_id"] = pk
+    return donnees
+
+
+def vers_conducteur(donnees, pk=None, actif_p=None):
+    """Instance non sauvegardée, avec les mêmes transformations que Conducteur.save().
+
+    `actif_p` est la valeur enregistrée d'un conducteur existant ; sans elle
+    (création, retour d'un conducteur désactivé par la synchronisation), il
+    est déduit de la date de sortie.
+    """
+    date_sortie = donnees['date_sortie']
+    if actif_p is None:
+        actif_p = date_sortie is None or date_sortie > date.today()
+    conducteur = Conducteur(
+        pk=pk,
+        nom=donnees['nom'],
+        prenom=donnees['prenom'],
+        date_naissance=donnees['date_naissance'],
+        date_entree=donnees['date_entree'],
+        date_sortie=date_sortie,
+        service_id=donnees['service_id'],
+        site_id=donnees['site_id'],
+        societe_id=donnees['societe_id'],
+        actif_p=actif_p,
+        est_actif=Conducteur.statut_actif(actif_p, date_sortie),
+        interim_p=donnees['interim_p'],
+        erp_id=donnees['erp_id'],
+        empreinte_erp=empreinte_conducteur(donnees),
+    )
+    normaliser_nom_prenom(conducteur)
+    return conducteur
+
+
+def synchroniser(enregistrements, desactiver=True, appliquer=True):
+    """Compare un extrait ERP complet aux conducteurs enregistrés et n'écrit que les écarts.
+
+    Chaque enregistrement est haché puis comparé à l'empreinte stockée :
+    seuls les conducteurs nouveaux ou modifiés sont écrits, en masse. Avec
+    `desactiver`, les conducteurs actifs absents de l'extrait sont désactivés.
+    Retourne les compteurs et la liste des erreurs (numéro, message).
+    """
+    referentiels = Referentiels()
+    existants = {
+        erp_id: (pk, empreinte, actif_p)
+        for erp_id, pk, empreinte, actif_p in Conducteur.objects.values_list(
+            'erp_id', 'pk', 'empreinte_erp', 'actif_p'
+        ).iterator()
+    }
+
+    a_creer, a_modifier, reactives, erreurs = [], [], [], []
+    vus = set()
+    for numero, enregistrement in enumerate(enregistrements, start=1):
+        try:
+            donnees = preparer(enregistrement, referentiels)
+        except ValueError as e:
+            erreurs.append((numero, str(e)))
+            continue
+        if donnees['erp_id'] in vus:
+            erreurs.append((numero, f"erp_id {donnees['erp_id']} en double"))
+            continue
+        vus.add(donnees['erp_id'])
+
+        existant = existants.get(donnees['erp_id'])
+        if existant is None:
+            a_creer.append(vers_conducteur(donnees))
+        elif existant[1] != empreinte_conducteur(donnees):
+            pk, empreinte, actif_p = existant
+            if not empreinte:
+                # Désactivé par une synchronisation précédente (empreinte vidée) et de retour
+                conducteur = vers_conducteur(donnees, pk=pk)
+                if conducteur.actif_p:
+                    reactives.append(pk)
+            else:
+                conducteur = vers_conducteur(donnees, pk=pk, actif_p=actif_p)
+            a_modifier.append(conducteur)
+
+    a_desactiver = []
+    if desactiver:
+        absents = {pk for erp_id, (pk, _, _) in existants.items() if erp_id not in vus}
+        a_desactiver = sorted(
+            Conducteur.objects.filter(pk__in=absents, actif_p=True).values_list('pk', flat=True)
+        ) if absents else []
+
+    compteurs = {
+        'creees': len(a_creer),
+        'modifiees': len(a_modifier),
+        'desactivees': len(a_desactiver),
+        'inchangees': len(vus) - len(a_creer) - len(a_modifier),
+        'rejetees': len(erreurs),
+    }
+    if not appliquer:
+        return compteurs, erreurs
+
+    deplaces = [conducteur.pk for conducteur in a_modifier] + a_desactiver
+    anciennes = {
+        pk: {'site': site_id, 'service': service_id, 'societe': societe_id}
+        for pk, site_id, service_id, societe_id in Conducteur.objects.filter(
+            pk__in=[conducteur.pk for conducteur in a_modifier]
+        ).values_list('pk', 'site_id', 'service_id', 'societe_id')
+    } if a_modifier else {}
+    if deplaces:
+        # Classements des groupes d'origine, lus avant que les affectations ne changent
+        from .classements import invalider_groupes
+        invalider_groupes(deplaces)
+
+    with transaction.atomic():
+        Conducteur.objects.bulk_create(a_creer, batch_size=TAILLE_LOT)
+        Conducteur.objects.bulk_update(a_modifier, CHAMPS_MODIFIABLES, batch_size=TAILLE_LOT)
+        for i in range(0, len(reactives), TAILLE_LOT):
+            Conducteur.objects.filter(pk__in=reactives[i:i + TAILLE_LOT]).update(actif_p=True)
+        ouvrir(a_creer)
+        enregistrer_changements([
+            (conducteur.pk, champ, anciennes[conducteur.pk][champ], getattr(conducteur, f"{champ}_id"))
+            for conducteur in a_modifier
+            for champ in ('site', 'service', 'societe')
+        ])
+        aujourd_hui = date.today()
+        for i in range(0, len(a_desactiver), TAILLE_LOT):
+            lot = a_desactiver[i:i + TAILLE_LOT]
+            Conducteur.objects.filter(pk__in=lot, date_sortie__isnull=True).update(date_sortie=aujourd_hui)
+            # Empreinte vidée : un conducteur qui réapparaît sera réécrit
+            Conducteur.objects.filter(pk__in=lot).update(actif_p=False, est_actif=False, empreinte_erp='')
+
+        modifies = [conducteur.pk for conducteur in a_creer if conducteur.pk] + deplaces
+        if modifies:
+            conducteurs_modifies.send(sender=Conducteur, conducteur_ids=modifies)
+    return compteurs, erreurs
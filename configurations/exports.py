@@ -0,0 +1,116 @@
+# configurations/exports.py
+# Export en flux des notations (CSV ou NDJSON, compression gzip à la volée)
+import csv
+import json
+import zlib
+
+from .models import Notation, NotationArchivee, expression_age, expression_tranche_anciennete
+
+TAILLE_BLOC = 2000
+
+# En-tête CSV / clé NDJSON -> champ lu par values_list
+COLONNES = (
+    ('id', 'id'),
+    ('date_notation', 'date_notation'),
+    ('erp_id', 'conducteur__erp_id'),
+    ('conducteur_nom', 'conducteur__nom'),
+    ('conducteur_prenom', 'conducteur__prenom'),
+    ('notateur_nom', 'notateur__nom'),
+    ('notateur_prenom', 'notateur__prenom'),
+    ('critere', 'critere__nom'),
+    ('valeur', 'valeur'),
+    ('valeur_normalisee', 'valeur_normalisee'),
+    ('age', 'conducteur_age'),
+    ('anciennete', 'conducteur_anciennete'),
+    ('service', 'conducteur__service__nom'),
+    ('site', 'conducteur__site__nom'),
+    ('societe', 'conducteur__societe__nom'),
+)
+
+ENTETES = [entete for entete, _ in COLONNES]
+
+FORMATS = {
+    'csv': 'text/csv',
+    'ndjson': 'application/x-ndjson',
+}
+
+
+def lignes_export(filtrer=None, avec_archives=False, taille_bloc=TAILLE_BLOC):
+    """Tuples de valeurs dans l'ordre de COLONNES, lus par blocs côté serveur.
+
+    `filtrer` reçoit et renvoie un queryset (Notation, puis NotationArchivee
+    si les archives sont incluses) ; aucune instance de modèle n'est créée.
+    """
+    champs = [champ for _, champ in COLONNES]
+    # Âge et tranche d'ancienneté du conducteur, calculés par la base
+    calculs = {
+        'conducteur_age': expression_age(prefixe='conducteur__'),
+        'conducteur_anciennete': expression_tranche_anciennete(prefixe='conducteur__'),
+    }
+    requete = Notation.objects.all()
+    if filtrer is not None:
+        requete = filtrer(requete)
+    requete = requete.annotate(**calculs).order_by().values_list(*champs)
+    if avec_archives:
+        archives = NotationArchivee.objects.all()
+        if filtrer is not None:
+            archives = filtrer(archives)
+        requete = requete.union(archives.annotate(**calculs).order_by().values_list(*champs), all=True)
+    return requete.order_by('date_notation', 'id').iterator(chunk_size=taille_bloc)
+
+
+class Tampon:
+    """Pseudo-fichier pour csv.writer : renvoie la ligne écrite au lieu de la stocker"""
+
+    def write(self, valeur):
+        return valeur
+
+
+def flux_csv(lignes, delimiteur=';', taille_bloc=TAILLE_BLOC):
+    """Morceaux de texte CSV, en-tête compris, regroupés par `taille_bloc` lignes"""
+    ecrivain = csv.writer(Tampon(), delimiter=delimiteur)
+    morceau = [ecrivain.writerow(ENTETES)]
+    for ligne in lignes:
+        morceau.append(ecrivain.writerow(ligne))
+        if len(morceau) >= taille_bloc:
+            yield ''.join(morceau)
+            morceau = []
+    if morceau:
+        yield ''.join(morceau)
+
+
+def flux_ndjson(lignes, taille_bloc=TAILLE_BLOC):
+    """Morceaux de texte NDJSON, un objet par notation"""
+    morceau = []
+    for ligne in lignes:
+        morceau.append(json.dumps(dict(zip(ENTETES, ligne)), default=str, ensure_ascii=False) + '\n')
+        if len(morceau) >= taille_bloc:
+            yield ''.join(morceau)
+            morceau = []
+    if morceau:
+        yield ''.join(morceau)
+
+
+def encoder(morceaux, compresser=False):
+    """Encode en UTF-8 et, si demandé, compresse au format gzip au fil de l'eau"""
+    if not compresser:
+        for morceau in morceaux:
+            yield morceau.encode('utf-8')
+        return
+    # wbits=31 : flux zlib avec en-tête et somme de contrôle gzip
+    compresseur = zlib.compressobj(6, zlib.DEFLATED, 31)
+    for morceau in morceaux:
+        donnees = compresseur.compress(morceau.encode('utf-8'))
+        if donnees:
+            yield donnees
+    yield compresseur.flush()
+
+
+def flux_export(format_export='csv', compresser=False, delimiteur=';', **options):
+    """Octets de l'export complet, prêts pour une StreamingHttpResponse ou un fichier"""
+    lignes = lignes_export(**options)
+    if format_export == 'csv':
+        morceaux = flux_csv(lignes, delimiteur)
+    else:
+        morceaux = flux_ndjson(lignes)
+    return encoder(morceaux, compresser)
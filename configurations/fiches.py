@@ -0,0 +1,90 @@
+# configurations/fiches.py
+# Fiche conducteur (identité, affectations, synthèse par critère) mise en cache
+import time
+from datetime import date
+
+from django.core.cache import cache
+
+from .agregats import synthese_conducteur
+from .models import Conducteur, CriteresNotation, HistoriqueSite
+from .versions import cache_versions
+
+DUREE_CACHE = 24 * 60 * 60
+
+CLE_VERSION = "fiche:version"
+
+
+def cle_cache(conducteur_id, reference):
+    # La date fait partie de la clé : âge et ancienneté changent chaque jour.
+    # La version globale couvre les critères, communs à toutes les fiches ;
+    # évincée, elle repart d'une valeur jamais servie.
+    version = cache_versions.get_or_set(CLE_VERSION, time.time_ns, None)
+    return f"fiche:{conducteur_id}:{reference.isoformat()}:v{version}"
+
+
+def construire_fiche(conducteur_id):
+    """Fiche complète d'un conducteur, ou None s'il n'existe pas"""
+    conducteur = Conducteur.objects.select_related('service', 'site', 'societe').filter(pk=conducteur_id).first()
+    if conducteur is None:
+        return None
+
+    synthese = synthese_conducteur(conducteur_id)
+    criteres = CriteresNotation.objects.in_bulk(synthese)
+    sites = HistoriqueSite.objects.filter(conducteur_id=conducteur_id).select_related('site').order_by('date_entree')
+
+    return {
+        'conducteur': {
+            'id': conducteur.pk,
+            'erp_id': conducteur.erp_id,
+            'nom': conducteur.nom_affichage,
+            'prenom': conducteur.prenom_affichage,
+            'age': conducteur.age,
+            'date_entree': conducteur.date_entree,
+            'date_sortie': conducteur.date_sortie,
+            'anciennete_jours': conducteur.anciennete_jours,
+            'actif': conducteur.est_actif,
+            'interim': conducteur.interim_p,
+        },
+        'affectation': {
+            'service': {'id': conducteur.service_id, 'nom': conducteur.service.nom},
+            'site': {'id': conducteur.site_id, 'nom': conducteur.site.nom},
+            'societe': {'id': conducteur.societe_id, 'nom': conducteur.societe.nom},
+        },
+        'historique_sites': [
+            {'site': historique.site.nom, 'date_entree': historique.date_entree, 'date_sortie': historique.date_sortie}
+            for historique in sites
+        ],
+        'criteres': [
+            {
+                'critere_id': critere_id,
+                'nom': criteres[critere_id].nom if critere_id in criteres else None,
+                'plage': criteres[critere_id].plage_valeurs if critere_id in criteres else None,
+                **statistiques,
+            }
+            for critere_id, statistiques in sorted(synthese.items())
+        ],
+    }
+
+
+def fiche_conducteur(conducteur_id):
+    """Fiche d'un conducteur, servie depuis le cache quand elle y est"""
+    cle = cle_cache(conducteur_id, date.today())
+    fiche = cache.get(cle)
+    if fiche is None:
+        fiche = construire_fiche(conducteur_id)
+        if fiche is not None:
+            cache.set(cle, fiche, DUREE_CACHE)
+    return fiche
+
+
+def invalider(conducteur_ids):
+    reference = date.today()
+    cache.delete_many([cle_cache(conducteur_id, reference) for conducteur_id in conducteur_ids])
+
+
+def invalider_toutes():
+    """Invalide toutes les fiches d'un coup (changement d'un critère)"""
+    try:
+        cache_versions.incr(CLE_VERSION)
+    except ValueError:
+        cache_versions.set(CLE_VERSION, time.time_ns(), None)
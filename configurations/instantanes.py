@@ -0,0 +1,112 @@
+# configurations/instantanes.py
+# Instantanés des dumps de conducteurs (empreinte par erp_id) pour les dumps différentiels
+import json
+from pathlib import Path
+
+from django.utils import timezone
+
+from .dumps import COMPRESSIONS, compression_du_fichier
+from .empreintes import empreinte
+from .models import Conducteur
+
+# 8 octets par conducteur : une collision ne ferait que manquer une modification
+OCTETS_EMPREINTE = 8
+
+
+def champs_instantane():
+    """Colonnes sérialisées d'un conducteur, dont dépend son empreinte"""
+    return [champ.attname for champ in Conducteur._meta.concrete_fields]
+
+
+def empreintes_actuelles(requete):
+    """{erp_id: (pk, empreinte)} des conducteurs de la requête, en une requête sans instancier de modèle"""
+    champs = champs_instantane()
+    return {
+        valeurs[champs.index('erp_id')]: (valeurs[0], empreinte(valeurs, OCTETS_EMPREINTE))
+        for valeurs in requete.order_by().values_list(*champs).iterator(chunk_size=5000)
+    }
+
+
+def ouvrir_chaine(chemin, mode):
+    """Fichier NDJSON de la chaîne, compressé selon l'extension (.gz, .xz)"""
+    compression = compression_du_fichier(chemin)
+    if compression:
+        ouvrir, _ = COMPRESSIONS[compression]
+        return ouvrir(chemin, f"{mode}t", encoding='utf-8')
+    return open(chemin, mode, encoding='utf-8')
+
+
+def lire_chaine(chemin):
+    """Maillons de la chaîne d'instantanés, du plus ancien au plus récent ([] si le fichier n'existe pas).
+
+    Chaque maillon est {'numero', 'cree_le', 'complet', 'empreintes': {erp_id:
+    empreinte}, 'retires': [erp_id]} ; un maillon complet remplace l'état
+    précédent, les autres ne portent que les différences.
+    """
+    if not Path(chemin).exists():
+        return []
+    with ouvrir_chaine(chemin, 'r') as f:
+        return [json.loads(ligne) for ligne in f if ligne.strip()]
+
+
+def etat(chaine):
+    """{erp_id: empreinte} obtenu en rejouant les maillons"""
+    empreintes = {}
+    for maillon in chaine:
+        if maillon['complet']:
+            empreintes = {}
+        empreintes.update((int(erp_id), valeur) for erp_id, valeur in maillon['empreintes'].items())
+        for erp_id in maillon['retires']:
+            empreintes.pop(erp_id, None)
+    return empreintes
+
+
+def comparer(precedent, actuelles):
+    """(ajoutés, modifiés, retirés) : listes triées d'erp_id entre l'état précédent et les empreintes actuelles"""
+    ajoutes = sorted(erp_id for erp_id in actuelles if erp_id not in precedent)
+    modifies = sorted(
+        erp_id for erp_id, (_, valeur) in actuelles.items()
+        if erp_id in precedent and precedent[erp_id] != valeur
+    )
+    retires = sorted(erp_id for erp_id in precedent if erp_id not in actuelles)
+    return ajoutes, modifies, retires
+
+
+def maillon(numero, empreintes, retires=(), complet=False):
+    return {
+        'numero': numero,
+        'cree_le': timezone.now().isoformat(),
+        'complet': complet,
+        'empreintes': {str(erp_id): valeur for erp_id, valeur in empreintes.items()},
+        'retires': list(retires),
+    }
+
+
+def ajouter_maillon(chemin, chaine, actuelles, ajoutes=(), modifies=(), retires=()):
+    """Ajoute à la chaîne le maillon du dump qui vient d'être écrit et le retourne.
+
+    Sans chaîne existante, le maillon est complet ; sinon il ne contient que
+    les empreintes ajoutées ou modifiées et les erp_id retirés.
+    """
+    numero = chaine[-1]['numero'] + 1 if chaine else 1
+    if chaine:
+        nouveau = maillon(numero, {erp_id: actuelles[erp_id][1] for erp_id in (*ajoutes, *modifies)}, retires)
+    else:
+        nouveau = maillon(numero, {erp_id: valeur for erp_id, (_, valeur) in actuelles.items()}, complet=True)
+    with ouvrir_chaine(chemin, 'a') as f:
+        f.write(json.dumps(nouveau, separators=(',', ':')) + '\n')
+    return nouveau
+
+
+def compacter(chemin):
+    """Remplace la chaîne par un maillon complet portant le numéro du dernier maillon"""
+    chaine = lire_chaine(chemin)
+    if len(chaine) <= 1:
+        return len(chaine)
+    compact = maillon(chaine[-1]['numero'], etat(chaine), complet=True)
+    chemin = Path(chemin)
+    temporaire = chemin.with_name(f"{chemin.stem}.tmp{chemin.suffix}")
+    with ouvrir_chaine(temporaire, 'w') as f:
+        f.write(json.dumps(compact, separators=(',', ':')) + '\n')
+    temporaire.replace(chemin)
+    return len(chaine)
@@ -0,0 +1,49 @@
+# configurations/management/commands/archiver_notations.py
+from django.core.management.base import BaseCommand, CommandError
+from configurations.archives import archiver, date_limite
+from configurations.models import Notation
+import time
+
+
+class Command(BaseCommand):
+    help = "Déplace les notations plus anciennes que l'horizon configuré vers les archives annuelles"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--horizon-jours',
+            type=int,
+            help='Âge en jours au-delà duquel une notation est archivée (défaut: NOTATIONS_ARCHIVE_HORIZON_JOURS)'
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=5000,
+            help='Nombre de notations déplacées par transaction (défaut: 5000)'
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help="Afficher le nombre de notations concernées sans rien déplacer"
+        )
+
+    def handle(self, *args, **options):
+        if options['horizon_jours'] is not None and options['horizon_jours'] < 0:
+            raise CommandError("L'horizon doit être positif.")
+
+        avant = date_limite(options['horizon_jours'])
+        self.stdout.write(f"📅 Archivage des notations antérieures au {avant:%d/%m/%Y}")
+
+        if options['dry_run']:
+            nombre = Notation.objects.filter(date_notation__lt=avant).count()
+            self.stdout.write(f"📦 {nombre} notations seraient archivées")
+            return
+
+        debut = time.monotonic()
+        total = archiver(
+            avant,
+            taille_lot=options['taille_lot'],
+            progression=lambda n: self.stdout.write(f"⏳ {n} notations archivées"),
+        )
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {total} notations archivées en {time.monotonic() - debut:.1f} s")
+        )
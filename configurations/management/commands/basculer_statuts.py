@@ -0,0 +1,16 @@
+# configurations/management/commands/basculer_statuts.py
+from django.core.management.base import BaseCommand
+from configurations.statuts import recalculer_statuts
+import time
+
+
+class Command(BaseCommand):
+    help = "Recalcule le statut d'activité des conducteurs dont la date de sortie est atteinte (traitement quotidien)"
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        actives, desactives = recalculer_statuts()
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Statuts recalculés en {time.monotonic() - debut:.1f} s: "
+            f"{actives} conducteur(s) activé(s), {desactives} désactivé(s)"
+        ))
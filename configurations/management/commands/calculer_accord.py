@@ -0,0 +1,76 @@
+# configurations/management/commands/calculer_accord.py
+from django.core.management.base import BaseCommand
+from configurations.accord import accord_inter_notateurs, PERIODES
+from configurations.models import Notateur, CriteresNotation
+from datetime import date
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = "Statistiques d'accord entre notateurs ayant noté les mêmes conducteurs sur la même période"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--periode',
+            type=str,
+            default='mois',
+            choices=list(PERIODES),
+            help='Période regroupant les notations comparées (défaut: mois)'
+        )
+        parser.add_argument(
+            '--depuis',
+            type=date.fromisoformat,
+            help='Date de début (AAAA-MM-JJ)'
+        )
+        parser.add_argument(
+            '--jusqua',
+            type=date.fromisoformat,
+            help='Date de fin (AAAA-MM-JJ)'
+        )
+        parser.add_argument(
+            '--json',
+            type=str,
+            help='Écrire les résultats complets dans ce fichier JSON'
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        resultats = accord_inter_notateurs(options['periode'], options['depuis'], options['jusqua'])
+        self.stdout.write(self.style.SUCCESS(f"✅ Calcul terminé en {time.monotonic() - debut:.1f} s"))
+
+        if not resultats['criteres']:
+            self.stdout.write(self.style.WARNING("⚠️  Aucun conducteur noté par plusieurs notateurs sur une même période"))
+            return
+
+        def arrondi(valeur):
+            return '-' if valeur is None else f"{valeur:.3f}"
+
+        criteres = CriteresNotation.objects.in_bulk(list(resultats['criteres']))
+        self.stdout.write("\n📏 Accord par critère:")
+        for critere_id, stats in sorted(resultats['criteres'].items()):
+            self.stdout.write(
+                f"   • {criteres[critere_id].nom}: alpha {arrondi(stats['alpha'])}, ICC {arrondi(stats['icc'])}, "
+                f"désaccord moyen {arrondi(stats['desaccord_moyen'])} ({stats['unites']} unités, {stats['paires']} paires)"
+            )
+
+        notateurs = Notateur.objects.in_bulk({n for paire in resultats['paires'] for n in paire})
+        self.stdout.write("\n👥 Paires de notateurs les moins d'accord:")
+        paires = sorted(resultats['paires'].items(), key=lambda item: -item[1]['desaccord_moyen'])
+        for (a, b), stats in paires[:10]:
+            self.stdout.write(
+                f"   • {notateurs[a]} / {notateurs[b]}: désaccord moyen {stats['desaccord_moyen']:.2f} "
+                f"sur {stats['comparaisons']} comparaisons"
+            )
+
+        if options['json']:
+            with open(options['json'], 'w', encoding='utf-8') as f:
+                json.dump({
+                    'periode': options['periode'],
+                    'criteres': resultats['criteres'],
+                    'paires': [
+                        {'notateur_a': a, 'notateur_b': b, **stats}
+                        for (a, b), stats in resultats['paires'].items()
+                    ],
+                }, f, indent=2)
+            self.stdout.write(f"\n📁 Résultats écrits dans {options['json']}")
@@ -0,0 +1,36 @@
+# configurations/management/commands/calculer_scores.py
+from django.core.management.base import BaseCommand
+from configurations.scores import scores_conducteurs, enregistrer_scores
+from datetime import date
+import time
+
+
+class Command(BaseCommand):
+    help = 'Recalcule le score global pondéré de tous les conducteurs'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source',
+            type=str,
+            default='agregats',
+            choices=['agregats', 'notations'],
+            help='Données de départ : agrégats mensuels (défaut) ou notations brutes'
+        )
+        parser.add_argument(
+            '--depuis',
+            type=date.fromisoformat,
+            help='Ne prendre en compte que les notations à partir de cette date (AAAA-MM-JJ)'
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        scores = scores_conducteurs(source=options['source'], depuis=options['depuis'])
+        calcul = time.monotonic() - debut
+
+        total = enregistrer_scores(scores)
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {total} scores calculés en {calcul:.2f} s "
+                f"(enregistrement {time.monotonic() - debut - calcul:.2f} s)"
+            )
+        )
@@ -0,0 +1,82 @@
+# configurations/management/commands/charger_referentiel.py
+from django.apps import apps
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import IntegrityError
+from configurations.chargement import TAILLE_LOT, charger, lire_objets
+from itertools import chain
+from pathlib import Path
+import gzip
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        'Charge en masse des fixtures ou des fichiers JSON/NDJSON (conducteurs, notateurs, référentiels) '
+        'par bulk_create, dans une seule transaction'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fichiers',
+            nargs='+',
+            type=str,
+            help='Fichiers à charger, dans l\'ordre (.json, .ndjson, éventuellement compressés en .gz)'
+        )
+        parser.add_argument(
+            '--modele',
+            type=str,
+            help='Modèle des objets sans clé "model", par exemple configurations.Conducteur'
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=TAILLE_LOT,
+            help=f'Nombre d\'objets par bulk_create (défaut: {TAILLE_LOT})'
+        )
+        parser.add_argument(
+            '--ignorer-existants',
+            action='store_true',
+            help='Ignorer les objets dont la clé primaire (ou l\'erp_id) existe déjà'
+        )
+
+    def handle(self, *args, **options):
+        chemins = [Path(fichier) for fichier in options['fichiers']]
+        for chemin in chemins:
+            if not chemin.exists():
+                raise CommandError(f"Fichier introuvable: {chemin}")
+        if options['taille_lot'] < 1:
+            raise CommandError("La taille de lot doit être positive.")
+
+        modele_defaut = None
+        if options['modele']:
+            try:
+                modele_defaut = apps.get_model(options['modele'])
+            except (LookupError, ValueError):
+                raise CommandError(f"Modèle inconnu: {options['modele']}")
+
+        debut = time.monotonic()
+        flux = [self.ouvrir(chemin) for chemin in chemins]
+        try:
+            compteurs = charger(
+                chain.from_iterable(lire_objets(f) for f in flux),
+                modele_defaut=modele_defaut,
+                taille_lot=options['taille_lot'],
+                ignorer_existants=options['ignorer_existants'],
+            )
+        except ValidationError as e:
+            raise CommandError(f"Chargement annulé. {e.messages[0]}")
+        except IntegrityError as e:
+            raise CommandError(f"Chargement annulé, conflit avec des données existantes ({e}). Voir --ignorer-existants.")
+        finally:
+            for f in flux:
+                f.close()
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Chargement terminé en {time.monotonic() - debut:.1f} s"))
+        for libelle, compteur in compteurs.items():
+            self.stdout.write(f"   • {libelle}: {compteur['crees']} créé(s), {compteur['ignores']} ignoré(s)")
+
+    def ouvrir(self, chemin):
+        if chemin.suffix.lower() == '.gz':
+            return gzip.open(chemin, 'rt', encoding='utf-8')
+        return open(chemin, 'r', encoding='utf-8')
@@ -0,0 +1,50 @@
+# configurations/management/commands/classer_conducteurs.py
+from django.core.management.base import BaseCommand
+from configurations.classements import REGROUPEMENTS, classer
+import csv
+import time
+
+
+class Command(BaseCommand):
+    help = 'Rang dense et percentile de chaque conducteur actif dans son service, son site et sa société'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--par',
+            type=str,
+            choices=list(REGROUPEMENTS),
+            action='append',
+            help='Regroupement à classer, répétable (défaut: tous)'
+        )
+        parser.add_argument(
+            '--csv',
+            type=str,
+            help='Écrire le classement complet dans ce fichier CSV'
+        )
+
+    def handle(self, *args, **options):
+        regroupements = options['par'] or list(REGROUPEMENTS)
+        classements = {}
+        for regroupement in regroupements:
+            debut = time.monotonic()
+            lignes = classer(regroupement)
+            classements[regroupement] = lignes
+            groupes = len({ligne['groupe_id'] for ligne in lignes})
+            self.stdout.write(
+                f"🏆 {regroupement}: {len(lignes)} conducteurs classés dans {groupes} groupes "
+                f"({time.monotonic() - debut:.2f} s)"
+            )
+
+        if options['csv']:
+            with open(options['csv'], 'w', encoding='utf-8', newline='') as f:
+                ecrivain = csv.writer(f)
+                ecrivain.writerow(['regroupement', 'groupe_id', 'conducteur_id', 'score', 'rang', 'percentile'])
+                for regroupement, lignes in classements.items():
+                    for ligne in lignes:
+                        ecrivain.writerow([
+                            regroupement, ligne['groupe_id'], ligne['conducteur_id'],
+                            f"{ligne['score']:.2f}", ligne['rang'], f"{ligne['percentile']:.4f}",
+                        ])
+            self.stdout.write(f"\n📁 Classement écrit dans {options['csv']}")
+
+        self.stdout.write(self.style.SUCCESS("✅ Classement terminé"))
@@ -1,9 +1,15 @@
 # configurations/management/commands/dump_conducteurs_actifs.py
-from django.core.management.base import BaseCommand
-from django.core import serializers
+from django.core.management.base import BaseCommand, CommandError
+from configurations.dumps import (
+    COMPRESSIONS, FORMATS, RELATIONS, TAILLE_BLOC, chemin_manifeste, compression_du_fichier, ecrire_dump,
+    ecrire_fragments, lire_ids, lire_requete, ouvrir_sortie,
+)
+from configurations.instantanes import ajouter_maillon, comparer, compacter, empreintes_actuelles, etat, lire_chaine
 from configurations.models import Conducteur
+from configurations.statistiques import statistiques
+from pathlib import Path
 import json
-from datetime import date
+import time
 
 class Command(BaseCommand):
     help = 'Dump des conducteurs actifs uniquement avec options avancées'
@@ -13,14 +19,37 @@ class Command(BaseCommand):
             '--output',
             type=str,
             default='conducteurs_actifs.json',
-            help='Fichier de sortie (défaut: conducteurs_actifs.json)'
+            help='Fichier de sortie (défaut: conducteurs_actifs.json ; suffixe .gz ou .xz pour compresser)'
         )
         parser.add_argument(
             '--format',
             type=str,
             default='json',
-            choices=['json', 'xml', 'yaml'],
-            help='Format de sortie (défaut: json)'
+            choices=FORMATS,
+            help='Format de sortie (défaut: json ; jsonl = un objet par ligne)'
+        )
+        parser.add_argument(
+            '--compression',
+            type=str,
+            choices=list(COMPRESSIONS),
+            help="Compression à la volée (défaut: déduite de l'extension du fichier)"
+        )
+        parser.add_argument(
+            '--taille-bloc',
+            type=int,
+            default=TAILLE_BLOC,
+            help=f'Conducteurs lus par requête (défaut: {TAILLE_BLOC})'
+        )
+        parser.add_argument(
+            '--shard-by',
+            type=str,
+            choices=RELATIONS,
+            help='Un fichier par service, site ou société (nommés d\'après --output), avec un manifeste'
+        )
+        parser.add_argument(
+            '--processus',
+            type=int,
+            help='Nombre de processus écrivant les fragments en parallèle (défaut: nombre de cœurs)'
         )
         parser.add_argument(
             '--include-related',
@@ -52,8 +81,31 @@ class Command(BaseCommand):
             action='store_true',
             help='Afficher les statistiques détaillées'
         )
+        parser.add_argument(
+            '--stats-json',
+            type=str,
+            help='Écrire les statistiques détaillées en JSON dans ce fichier'
+        )
+        parser.add_argument(
+            '--since-snapshot',
+            type=str,
+            help=(
+                "Chaîne d'instantanés (créée au premier passage) : seuls les conducteurs ajoutés ou modifiés "
+                "depuis le dernier dump sont écrits, les retirés sont listés dans <output>_differentiel.json"
+            )
+        )
+        parser.add_argument(
+            '--compacter',
+            action='store_true',
+            help="Réduire la chaîne d'instantanés à un seul instantané complet après le dump"
+        )
     
     def handle(self, *args, **options):
+        if options['shard_by'] and options['since_snapshot']:
+            raise CommandError("--shard-by et --since-snapshot ne peuvent pas être combinés.")
+        if options['compacter'] and not options['since_snapshot']:
+            raise CommandError("--compacter s'utilise avec --since-snapshot.")
+        
         # Construction de la requête
         queryset = Conducteur.actifs.all()
         
@@ -70,13 +122,11 @@ class Command(BaseCommand):
             queryset = queryset.filter(interim_p=False)
             self.stdout.write("📍 Exclusion des intérimaires")
         
-        # Optimisation avec select_related
-        queryset = queryset.select_related('service', 'site', 'societe')
-        
         # Comptage
         total_conducteurs = queryset.count()
         
-        if total_conducteurs == 0:
+        # En différentiel, une flotte vide doit encore enregistrer les retraits
+        if total_conducteurs == 0 and not options['since_snapshot']:
             self.stdout.write(
                 self.style.WARNING('⚠️  Aucun conducteur trouvé avec ces critères')
             )
@@ -84,100 +134,198 @@ class Command(BaseCommand):
         
         self.stdout.write(f"📊 {total_conducteurs} conducteurs actifs trouvés")
         
-        # Affichage des statistiques si demandé
-        if options['stats']:
-            self.afficher_statistiques(queryset)
+        # Statistiques si demandées, calculées par la base
+        if options['stats'] or options['stats_json']:
+            stats = statistiques(queryset)
+            if options['stats']:
+                self.afficher_statistiques(stats)
+            if options['stats_json']:
+                self.ecrire_statistiques(stats, options['stats_json'])
+        
+        # Sérialisation en flux : les conducteurs sont lus par blocs et écrits
+        # un à un, les données liées collectées pendant le même passage
+        compression = options['compression'] or compression_du_fichier(options['output'])
+        debut = time.monotonic()
+        if options['shard_by']:
+            self.dump_fragmente(queryset, options, compression, debut)
+            return
+        if options['since_snapshot']:
+            self.dump_differentiel(queryset, options, compression, debut)
+            return
         
-        # Préparation des données pour sérialisation
-        donnees_a_serialiser = list(queryset)
+        compteurs = self.ecrire(lire_requete(queryset, options['taille_bloc']), options, compression)
+        if compteurs is None:
+            return
         
-        # Ajout des données liées si demandé
-        if options['include_related']:
-            # Récupérer tous les services, sites et sociétés liés
-            services = set(c.service for c in queryset if c.service)
-            sites = set(c.site for c in queryset if c.site)
-            societes = set(c.societe for c in queryset if c.societe)
-            
-            donnees_a_serialiser.extend(services)
-            donnees_a_serialiser.extend(sites)
-            donnees_a_serialiser.extend(societes)
-            
-            self.stdout.write(f"📎 Données liées incluses: {len(services)} services, {len(sites)} sites, {len(societes)} sociétés")
-        
-        # Sérialisation
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Dump créé avec succès: {options["output"]}'
+            )
+        )
+        self.stdout.write(f'📁 Format: {options["format"]}{f" ({compression})" if compression else ""}')
+        self.stdout.write(f'📦 {compteurs["conducteurs"]} conducteurs exportés en {time.monotonic() - debut:.1f} s')
+    
+    def ecrire(self, conducteurs, options, compression):
+        """Écrit le dump dans --output ; retourne les compteurs, ou None après avoir signalé l'erreur"""
         try:
-            data = serializers.serialize(
-                options['format'], 
-                donnees_a_serialiser,
-                indent=2,
-                use_natural_foreign_keys=options['natural_keys'],
-                use_natural_primary_keys=options['natural_keys']
+            with ouvrir_sortie(options['output'], compression) as sortie:
+                compteurs = ecrire_dump(
+                    conducteurs,
+                    sortie,
+                    options['format'],
+                    avec_liees=options['include_related'],
+                    cles_naturelles=options['natural_keys'],
+                )
+        except OSError as e:
+            self.stdout.write(
+                self.style.ERROR(f'❌ Erreur lors de l\'écriture: {e}')
             )
+            return None
         except Exception as e:
             self.stdout.write(
                 self.style.ERROR(f'❌ Erreur lors de la sérialisation: {e}')
             )
+            return None
+        
+        if options['include_related']:
+            self.stdout.write(
+                f"📎 Données liées incluses: {compteurs['service']} services, "
+                f"{compteurs['site']} sites, {compteurs['societe']} sociétés"
+            )
+        return compteurs
+    
+    def dump_differentiel(self, queryset, options, compression, debut):
+        """Écrit les conducteurs ajoutés ou modifiés depuis le dernier instantané, puis l'instantané"""
+        chemin = options['since_snapshot']
+        chaine = lire_chaine(chemin)
+        actuelles = empreintes_actuelles(queryset)
+        
+        if chaine:
+            ajoutes, modifies, retires = comparer(etat(chaine), actuelles)
+            ids = sorted(actuelles[erp_id][0] for erp_id in (*ajoutes, *modifies))
+            conducteurs = lire_ids(ids, options['taille_bloc'])
+            self.stdout.write(f"🔁 Depuis l'instantané n°{chaine[-1]['numero']}")
+        else:
+            # Premier passage : dump complet
+            ajoutes, modifies, retires = sorted(actuelles), [], []
+            conducteurs = lire_requete(queryset, options['taille_bloc'])
+            self.stdout.write("🆕 Aucun instantané précédent : dump complet")
+        
+        compteurs = self.ecrire(conducteurs, options, compression)
+        if compteurs is None:
             return
         
-        # Écriture du fichier
+        nouveau = ajouter_maillon(chemin, chaine, actuelles, ajoutes, modifies, retires)
+        sortie = Path(options['output'])
+        differentiel = sortie.with_name(f"{sortie.name.partition('.')[0]}_differentiel.json")
+        with open(differentiel, 'w', encoding='utf-8') as f:
+            json.dump({
+                'instantane': nouveau['numero'],
+                'depuis': chaine[-1]['numero'] if chaine else None,
+                'complet': nouveau['complet'],
+                'ajoutes': ajoutes,
+                'modifies': modifies,
+                'retires': retires,
+            }, f, ensure_ascii=False)
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✅ Dump différentiel créé avec succès: {options["output"]}'
+            )
+        )
+        self.stdout.write(f"   • Ajoutés: {len(ajoutes)}")
+        self.stdout.write(f"   • Modifiés: {len(modifies)}")
+        self.stdout.write(f"   • Retirés: {len(retires)} (listés dans {differentiel})")
+        self.stdout.write(f"📸 Instantané n°{nouveau['numero']} ajouté à {chemin}")
+        if options['compacter']:
+            maillons = compacter(chemin)
+            self.stdout.write(f"🗜️ Chaîne compactée: {maillons} instantané(s) réduits à un seul")
+        self.stdout.write(f'📦 {compteurs["conducteurs"]} conducteurs exportés en {time.monotonic() - debut:.1f} s')
+    
+    def dump_fragmente(self, queryset, options, compression, debut):
+        """Écrit un fichier par service (site, société) en parallèle, puis le manifeste"""
         try:
-            with open(options['output'], 'w', encoding='utf-8') as f:
-                f.write(data)
-            
-            self.stdout.write(
-                self.style.SUCCESS(
-                    f'✅ Dump créé avec succès: {options["output"]}'
-                )
+            manifeste = ecrire_fragments(
+                queryset,
+                options['output'],
+                options['shard_by'],
+                options['format'],
+                compression=compression,
+                avec_liees=options['include_related'],
+                cles_naturelles=options['natural_keys'],
+                taille_bloc=options['taille_bloc'],
+                processus=options['processus'],
             )
-            self.stdout.write(f'📁 Format: {options["format"]}')
-            self.stdout.write(f'📦 {total_conducteurs} conducteurs exportés')
-            
         except Exception as e:
             self.stdout.write(
-                self.style.ERROR(f'❌ Erreur lors de l\'écriture: {e}')
+                self.style.ERROR(f'❌ Erreur lors du dump fragmenté: {e}')
+            )
+            return
+        
+        self.stdout.write(
+            self.style.SUCCESS(
+                f"✅ {len(manifeste['fichiers'])} fragments par {options['shard_by']} créés "
+                f"en {time.monotonic() - debut:.1f} s"
+            )
+        )
+        for fichier in manifeste['fichiers']:
+            self.stdout.write(
+                f"   • {fichier['fichier']} ({fichier[options['shard_by']]}): "
+                f"{fichier['conducteurs']} conducteurs, sha256 {fichier['sha256'][:12]}…"
             )
+        self.stdout.write(f"📋 Manifeste: {chemin_manifeste(options['output'])}")
+        self.stdout.write(f"📦 {manifeste['conducteurs']} conducteurs exportés")
     
-    def afficher_statistiques(self, queryset):
+    def afficher_statistiques(self, stats):
         """Affiche des statistiques détaillées"""
         self.stdout.write("\n📈 Statistiques détaillées:")
         self.stdout.write("=" * 40)
         
         # Par service
-        services_stats = {}
-        for conducteur in queryset:
-            service = conducteur.service.nom if conducteur.service else 'Sans service'
-            services_stats[service] = services_stats.get(service, 0) + 1
-        
         self.stdout.write("🏢 Répartition par service:")
-        for service, count in sorted(services_stats.items()):
-            self.stdout.write(f"   • {service}: {count}")
+        for groupe in stats['par_service']:
+            self.stdout.write(
+                f"   • {groupe['service'] or 'Sans service'}: {groupe['nombre']} "
+                f"(intérim {groupe['taux_interim']:.0%})"
+            )
         
         # Par site
-        sites_stats = {}
-        for conducteur in queryset:
-            site = f"{conducteur.site.nom} ({conducteur.site.code_postal})" if conducteur.site else 'Sans site'
-            sites_stats[site] = sites_stats.get(site, 0) + 1
-        
         self.stdout.write("\n📍 Répartition par site:")
-        for site, count in sorted(sites_stats.items()):
-            self.stdout.write(f"   • {site}: {count}")
+        for groupe in stats['par_site']:
+            site = f"{groupe['site']} ({groupe['code_postal']})" if groupe['site'] else 'Sans site'
+            self.stdout.write(f"   • {site}: {groupe['nombre']}")
         
-        # Intérimaires
-        interim_count = queryset.filter(interim_p=True).count()
-        permanent_count = queryset.filter(interim_p=False).count()
+        # Par société
+        self.stdout.write("\n🏛️ Répartition par société:")
+        for groupe in stats['par_societe']:
+            self.stdout.write(f"   • {groupe['societe'] or 'Sans société'}: {groupe['nombre']}")
+        
+        # Croisement service × site × société
+        self.stdout.write("\n🔀 Service × site × société:")
+        for groupe in stats['croisement']:
+            self.stdout.write(
+                f"   • {groupe['service'] or '-'} / {groupe['site'] or '-'} / {groupe['societe'] or '-'}: "
+                f"{groupe['nombre']} dont {groupe['interimaires']} intérimaire(s)"
+            )
         
+        # Intérimaires
+        contrats = stats['contrats']
         self.stdout.write(f"\n👥 Types de contrat:")
-        self.stdout.write(f"   • Permanents: {permanent_count}")
-        self.stdout.write(f"   • Intérimaires: {interim_count}")
+        self.stdout.write(f"   • Permanents: {contrats['permanents']}")
+        self.stdout.write(f"   • Intérimaires: {contrats['interimaires']} ({contrats['taux_interim']:.0%})")
         
-        # Ancienneté moyenne
-        try:
-            today = date.today()
-            anciennetes = [(today - c.date_entree).days for c in queryset if c.date_entree]
-            if anciennetes:
-                anciennete_moyenne = sum(anciennetes) / len(anciennetes)
-                self.stdout.write(f"\n⏰ Ancienneté moyenne: {anciennete_moyenne:.0f} jours ({anciennete_moyenne/365:.1f} ans)")
-        except Exception:
-            pass
+        # Ancienneté
+        anciennete = stats['anciennete']
+        if anciennete['moyenne_jours'] is not None:
+            moyenne = anciennete['moyenne_jours']
+            self.stdout.write(f"\n⏰ Ancienneté moyenne: {moyenne:.0f} jours ({moyenne/365:.1f} ans)")
+        for tranche, nombre in anciennete['tranches'].items():
+            self.stdout.write(f"   • {tranche}: {nombre}")
         
         self.stdout.write("=" * 40)
+    
+    def ecrire_statistiques(self, stats, chemin):
+        """Écrit les statistiques en JSON"""
+        with open(chemin, 'w', encoding='utf-8') as f:
+            json.dump(stats, f, ensure_ascii=False, indent=2)
+        self.stdout.write(f"📈 Statistiques JSON écrites dans {chemin}")
@@ -0,0 +1,92 @@
+# configurations/management/commands/exporter_notations.py
+from django.core.management.base import BaseCommand, CommandError
+from configurations.exports import FORMATS, flux_export
+from datetime import date
+from pathlib import Path
+import sys
+import time
+
+
+class Command(BaseCommand):
+    help = 'Exporte en flux les notations (CSV ou NDJSON) avec les noms des conducteurs, notateurs, critères et affectations'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fichier',
+            type=str,
+            help="Fichier de sortie (.csv, .ndjson, suffixe .gz pour compresser), ou - pour la sortie standard"
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=list(FORMATS),
+            help="Format de sortie (défaut: déduit de l'extension, sinon csv)"
+        )
+        parser.add_argument(
+            '--gzip',
+            action='store_true',
+            help='Compresser la sortie (implicite pour un fichier .gz)'
+        )
+        parser.add_argument(
+            '--delimiteur',
+            type=str,
+            default=';',
+            help='Séparateur CSV (défaut: ;)'
+        )
+        parser.add_argument('--du', type=str, help='Date de début incluse (AAAA-MM-JJ)')
+        parser.add_argument('--au', type=str, help='Date de fin incluse (AAAA-MM-JJ)')
+        parser.add_argument(
+            '--archives',
+            action='store_true',
+            help='Inclure les notations archivées'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            du = date.fromisoformat(options['du']) if options['du'] else None
+            au = date.fromisoformat(options['au']) if options['au'] else None
+        except ValueError:
+            raise CommandError("Les dates doivent être au format AAAA-MM-JJ.")
+
+        vers_sortie = options['fichier'] == '-'
+        chemin = Path(options['fichier'])
+        compresser = options['gzip'] or (not vers_sortie and chemin.suffix.lower() == '.gz')
+        format_export = options['format'] or self.deduire_format(chemin)
+
+        def filtrer(requete):
+            if du:
+                requete = requete.filter(date_notation__gte=du)
+            if au:
+                requete = requete.filter(date_notation__lte=au)
+            return requete
+
+        flux = flux_export(
+            format_export,
+            compresser=compresser,
+            delimiteur=options['delimiteur'],
+            filtrer=filtrer,
+            avec_archives=options['archives'],
+        )
+
+        debut = time.monotonic()
+        taille = 0
+        sortie = sys.stdout.buffer if vers_sortie else open(chemin, 'wb')
+        try:
+            for morceau in flux:
+                sortie.write(morceau)
+                taille += len(morceau)
+        finally:
+            if not vers_sortie:
+                sortie.close()
+
+        if not vers_sortie:
+            self.stdout.write(self.style.SUCCESS(
+                f"✅ Export {format_export}{' compressé' if compresser else ''} écrit dans {chemin} "
+                f"({taille / 1024:.0f} Ko en {time.monotonic() - debut:.1f} s)"
+            ))
+
+    def deduire_format(self, chemin):
+        suffixes = [s.lower() for s in chemin.suffixes if s.lower() != '.gz']
+        if suffixes and suffixes[-1] in ('.ndjson', '.jsonl'):
+            return 'ndjson'
+        return 'csv'
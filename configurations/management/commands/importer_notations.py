@@ -0,0 +1,213 @@
+# configurations/management/commands/importer_notations.py
+from django.core.management.base import BaseCommand, CommandError
+from configurations.models import Conducteur, Notateur, CriteresNotation, Notation
+from configurations.notations import ecrire_notations
+from itertools import islice
+from datetime import date
+from pathlib import Path
+import csv
+import gzip
+import json
+import time
+
+class Command(BaseCommand):
+    help = (
+        'Import en flux de fichiers de notations (CSV ou NDJSON) par lots, avec reprise sur incident. '
+        'Colonnes attendues: erp_id, notateur_nom, notateur_prenom (ou notateur_id), critere, date_notation, valeur'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fichier',
+            type=str,
+            help='Fichier à importer (.csv, .ndjson, éventuellement compressé en .gz)'
+        )
+        parser.add_argument(
+            '--format',
+            type=str,
+            choices=['csv', 'ndjson'],
+            help="Format du fichier (défaut: déduit de l'extension)"
+        )
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=5000,
+            help='Nombre de lignes par lot (défaut: 5000)'
+        )
+        parser.add_argument(
+            '--delimiteur',
+            type=str,
+            default=';',
+            help='Séparateur CSV (défaut: ;)'
+        )
+        parser.add_argument(
+            '--checkpoint',
+            type=str,
+            help='Fichier de reprise (défaut: <fichier>.checkpoint)'
+        )
+        parser.add_argument(
+            '--reprendre',
+            action='store_true',
+            help='Reprendre après la dernière ligne validée du checkpoint'
+        )
+
+    def handle(self, *args, **options):
+        chemin = Path(options['fichier'])
+        if not chemin.exists():
+            raise CommandError(f"Fichier introuvable: {chemin}")
+        if options['taille_lot'] < 1:
+            raise CommandError("La taille de lot doit être positive.")
+
+        self.verbosite = options['verbosity']
+        format_fichier = options['format'] or self.deduire_format(chemin)
+        chemin_checkpoint = Path(options['checkpoint'] or f"{chemin}.checkpoint")
+
+        deja_traitees = 0
+        if options['reprendre'] and chemin_checkpoint.exists():
+            deja_traitees = json.loads(chemin_checkpoint.read_text(encoding='utf-8'))['lignes']
+            self.stdout.write(f"↩️  Reprise après {deja_traitees} lignes")
+
+        # Tables de correspondance chargées une fois pour toutes
+        self.conducteurs = dict(Conducteur.objects.values_list('erp_id', 'pk'))
+        # Les homonymes ne peuvent être désignés que par la colonne notateur_id
+        self.ids_notateurs = set()
+        self.notateurs = {}
+        self.homonymes = set()
+        for pk, nom, prenom in Notateur.objects.values_list('pk', 'nom', 'prenom'):
+            cle = (nom.strip().lower(), prenom.strip().lower())
+            self.ids_notateurs.add(pk)
+            if cle in self.notateurs:
+                self.homonymes.add(cle)
+            self.notateurs[cle] = pk
+        for cle in self.homonymes:
+            del self.notateurs[cle]
+        self.criteres = {
+            nom.strip().lower(): (pk, mini, maxi)
+            for pk, nom, mini, maxi in CriteresNotation.objects.values_list('pk', 'nom', 'valeur_mini', 'valeur_maxi')
+        }
+        self.stdout.write(
+            f"📚 Référentiels: {len(self.conducteurs)} conducteurs, "
+            f"{len(self.ids_notateurs)} notateurs, {len(self.criteres)} critères"
+        )
+        if self.homonymes:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️  Notateurs homonymes ({', '.join(' '.join(cle) for cle in sorted(self.homonymes))}) : "
+                "leurs lignes sans notateur_id seront rejetées"
+            ))
+
+        totaux = {'creees': 0, 'modifiees': 0, 'inchangees': 0, 'archivees': 0, 'rejetees': 0}
+        self.ambigues = 0
+        lignes_traitees = deja_traitees
+        debut = time.monotonic()
+
+        with self.ouvrir(chemin) as flux:
+            lignes = self.lire_lignes(flux, format_fichier, options['delimiteur'])
+            lignes = islice(lignes, deja_traitees, None)
+
+            while True:
+                lot = list(islice(lignes, options['taille_lot']))
+                if not lot:
+                    break
+
+                notations = []
+                for numero, ligne in enumerate(lot, start=lignes_traitees + 1):
+                    notation = self.resoudre(ligne, numero)
+                    if notation is None:
+                        totaux['rejetees'] += 1
+                    else:
+                        notations.append(notation)
+
+                compteurs = ecrire_notations(notations)
+                for cle, valeur in compteurs.items():
+                    totaux[cle] += valeur
+
+                lignes_traitees += len(lot)
+                chemin_checkpoint.write_text(
+                    json.dumps({'fichier': str(chemin), 'lignes': lignes_traitees}),
+                    encoding='utf-8'
+                )
+
+                duree = time.monotonic() - debut
+                debit = (lignes_traitees - deja_traitees) / duree if duree else 0
+                self.stdout.write(f"⏳ {lignes_traitees} lignes traitées ({debit:.0f} lignes/s)")
+
+        duree = time.monotonic() - debut
+        self.stdout.write(self.style.SUCCESS(f"✅ Import terminé en {duree:.1f} s"))
+        self.stdout.write(f"   • Créées: {totaux['creees']}")
+        self.stdout.write(f"   • Modifiées: {totaux['modifiees']}")
+        self.stdout.write(f"   • Inchangées: {totaux['inchangees']}")
+        self.stdout.write(f"   • Rejetées: {totaux['rejetees']}")
+        if totaux['archivees']:
+            self.stdout.write(self.style.WARNING(f"   • Déjà archivées, non écrites: {totaux['archivees']}"))
+        if self.ambigues:
+            self.stdout.write(self.style.WARNING(f"   • dont notateur homonyme sans notateur_id: {self.ambigues}"))
+
+        chemin_checkpoint.unlink(missing_ok=True)
+
+    def deduire_format(self, chemin):
+        suffixes = [s.lower() for s in chemin.suffixes if s.lower() != '.gz']
+        if suffixes and suffixes[-1] in ('.ndjson', '.jsonl'):
+            return 'ndjson'
+        if suffixes and suffixes[-1] == '.csv':
+            return 'csv'
+        raise CommandError("Format indéterminé, utilisez --format.")
+
+    def ouvrir(self, chemin):
+        if chemin.suffix.lower() == '.gz':
+            return gzip.open(chemin, 'rt', encoding='utf-8', newline='')
+        return open(chemin, 'r', encoding='utf-8', newline='')
+
+    def lire_lignes(self, flux, format_fichier, delimiteur):
+        """Générateur de lignes, une à la fois : dictionnaires pour le CSV, texte
+        brut pour le NDJSON (décodé dans resoudre, qui rejette une ligne mal formée)"""
+        if format_fichier == 'csv':
+            yield from csv.DictReader(flux, delimiter=delimiteur)
+        else:
+            for ligne in flux:
+                if ligne.strip():
+                    yield ligne
+
+    def resoudre(self, ligne, numero):
+        """Transforme une ligne brute en Notation non sauvegardée, ou None si invalide"""
+        try:
+            if isinstance(ligne, str):
+                ligne = json.loads(ligne)
+            conducteur_id = self.conducteurs.get(int(ligne['erp_id']))
+            if ligne.get('notateur_id') not in (None, ''):
+                notateur_id = int(ligne['notateur_id'])
+                notateur_id = notateur_id if notateur_id in self.ids_notateurs else None
+            else:
+                cle = (str(ligne['notateur_nom']).strip().lower(), str(ligne['notateur_prenom']).strip().lower())
+                if cle in self.homonymes:
+                    self.ambigues += 1
+                    self.signaler(numero, f"notateur homonyme « {' '.join(cle)} », précisez notateur_id")
+                    return None
+                notateur_id = self.notateurs.get(cle)
+            critere = self.criteres.get(str(ligne['critere']).strip().lower())
+            date_notation = date.fromisoformat(str(ligne['date_notation']).strip())
+            valeur = ligne.get('valeur')
+            valeur = None if valeur in (None, '') else int(valeur)
+        except (KeyError, ValueError, TypeError) as e:
+            self.signaler(numero, f"ligne illisible ({e})")
+            return None
+
+        if conducteur_id is None or notateur_id is None or critere is None:
+            self.signaler(numero, "conducteur, notateur ou critère inconnu")
+            return None
+
+        critere_id, mini, maxi = critere
+        if valeur is not None and not mini <= valeur <= maxi:
+            self.signaler(numero, f"valeur {valeur} hors plage ({mini} à {maxi})")
+            return None
+
+        return Notation(
+            conducteur_id=conducteur_id,
+            notateur_id=notateur_id,
+            critere_id=critere_id,
+            date_notation=date_notation,
+            valeur=valeur,
+        )
+
+    def signaler(self, numero, message):
+        if self.verbosite > 1:
+            self.stderr.write(f"⚠️  Ligne {numero}: {message}")
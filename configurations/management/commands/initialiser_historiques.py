@@ -0,0 +1,13 @@
+# configurations/management/commands/initialiser_historiques.py
+from django.core.management.base import BaseCommand
+from configurations.affectations import initialiser
+
+
+class Command(BaseCommand):
+    help = "Crée la période d'affectation en cours (site, service, société) des conducteurs qui n'en ont pas"
+
+    def handle(self, *args, **options):
+        crees = initialiser()
+        self.stdout.write(self.style.SUCCESS("✅ Historiques d'affectation initialisés"))
+        for champ, nombre in crees.items():
+            self.stdout.write(f"   • {champ}: {nombre} période(s) créée(s)")
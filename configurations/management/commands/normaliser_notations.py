@@ -0,0 +1,47 @@
+# configurations/management/commands/normaliser_notations.py
+from django.core.management.base import BaseCommand
+from configurations.normalisation import calculer_biais
+from configurations.models import Notateur, CriteresNotation
+import time
+
+
+class Command(BaseCommand):
+    help = 'Calcule le biais de chaque notateur par critère et normalise les notations (traitement nocturne)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--minimum',
+            type=int,
+            default=5,
+            help='Nombre minimal de notations pour évaluer un notateur sur un critère (défaut: 5)'
+        )
+        parser.add_argument(
+            '--seuil',
+            type=float,
+            default=0.5,
+            help='Biais (en écarts-types) à partir duquel un notateur est signalé (défaut: 0.5)'
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        biais = calculer_biais(minimum=options['minimum'])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {len(biais)} couples notateur × critère analysés en {time.monotonic() - debut:.1f} s")
+        )
+
+        signales = sorted(
+            (b for b in biais if b.biais is not None and abs(b.biais) >= options['seuil']),
+            key=lambda b: -abs(b.biais)
+        )
+        if not signales:
+            return
+
+        notateurs = Notateur.objects.in_bulk({b.notateur_id for b in signales})
+        criteres = CriteresNotation.objects.in_bulk({b.critere_id for b in signales})
+        self.stdout.write(f"\n⚖️  Notateurs s'écartant de leurs pairs (seuil {options['seuil']}):")
+        for b in signales:
+            sens = 'indulgent' if b.biais > 0 else 'sévère'
+            self.stdout.write(
+                f"   • {notateurs[b.notateur_id]} / {criteres[b.critere_id].nom}: "
+                f"{b.biais:+.2f} ({sens}, moyenne {b.moyenne:.2f} contre {b.moyenne_pairs:.2f})"
+            )
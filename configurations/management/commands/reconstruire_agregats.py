@@ -0,0 +1,23 @@
+# configurations/management/commands/reconstruire_agregats.py
+from django.core.management.base import BaseCommand
+from configurations.agregats import reconstruire
+import time
+
+
+class Command(BaseCommand):
+    help = 'Reconstruit entièrement les agrégats mensuels de notation'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--taille-lot',
+            type=int,
+            default=5000,
+            help='Nombre de lignes lues et écrites par lot (défaut: 5000)'
+        )
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        total = reconstruire(taille_lot=options['taille_lot'])
+        self.stdout.write(
+            self.style.SUCCESS(f"✅ {total} agrégats reconstruits en {time.monotonic() - debut:.1f} s")
+        )
@@ -0,0 +1,17 @@
+# configurations/management/commands/reconstruire_recherche.py
+from django.core.management.base import BaseCommand
+from configurations.recherche import fts_disponible, reconstruire
+import time
+
+
+class Command(BaseCommand):
+    help = "Reconstruit l'index de recherche des conducteurs et des notateurs"
+
+    def handle(self, *args, **options):
+        debut = time.monotonic()
+        totaux = reconstruire()
+        moteur = 'FTS5' if fts_disponible() else 'texte normalisé'
+        self.stdout.write(self.style.SUCCESS(
+            f"✅ Index de recherche ({moteur}) reconstruit en {time.monotonic() - debut:.1f} s: "
+            f"{totaux['conducteur']} conducteurs, {totaux['notateur']} notateurs"
+        ))
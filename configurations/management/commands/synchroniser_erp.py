@@ -0,0 +1,85 @@
+# configurations/management/commands/synchroniser_erp.py
+from django.core.management.base import BaseCommand, CommandError
+from configurations.erp import synchroniser
+from pathlib import Path
+import csv
+import gzip
+import json
+import time
+
+
+class Command(BaseCommand):
+    help = (
+        "Synchronise les conducteurs avec un extrait de l'ERP : seuls les conducteurs nouveaux, "
+        "modifiés ou disparus de l'extrait sont écrits. Colonnes attendues: erp_id, nom, prenom, "
+        "date_naissance, date_entree, date_sortie, service, site, societe, interim_p"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'fichier',
+            type=str,
+            help="Extrait ERP complet (.csv, .ndjson ou .json, éventuellement compressé en .gz)"
+        )
+        parser.add_argument(
+            '--delimiteur',
+            type=str,
+            default=';',
+            help='Séparateur CSV (défaut: ;)'
+        )
+        parser.add_argument(
+            '--sans-desactivation',
+            action='store_true',
+            help="Ne pas désactiver les conducteurs absents de l'extrait (extrait partiel)"
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Afficher les écarts sans rien écrire'
+        )
+
+    def handle(self, *args, **options):
+        chemin = Path(options['fichier'])
+        if not chemin.exists():
+            raise CommandError(f"Fichier introuvable: {chemin}")
+
+        debut = time.monotonic()
+        with self.ouvrir(chemin) as flux:
+            compteurs, erreurs = synchroniser(
+                self.lire_enregistrements(flux, chemin, options['delimiteur']),
+                desactiver=not options['sans_desactivation'],
+                appliquer=not options['dry_run'],
+            )
+
+        if options['verbosity'] > 1:
+            for numero, message in erreurs:
+                self.stderr.write(f"⚠️  Enregistrement {numero}: {message}")
+
+        titre = "🔍 Écarts détectés (aucune écriture)" if options['dry_run'] else "✅ Synchronisation terminée"
+        self.stdout.write(self.style.SUCCESS(f"{titre} en {time.monotonic() - debut:.1f} s"))
+        self.stdout.write(f"   • Créés: {compteurs['creees']}")
+        self.stdout.write(f"   • Modifiés: {compteurs['modifiees']}")
+        self.stdout.write(f"   • Désactivés: {compteurs['desactivees']}")
+        self.stdout.write(f"   • Inchangés: {compteurs['inchangees']}")
+        self.stdout.write(f"   • Rejetés: {compteurs['rejetees']}")
+
+    def ouvrir(self, chemin):
+        if chemin.suffix.lower() == '.gz':
+            return gzip.open(chemin, 'rt', encoding='utf-8', newline='')
+        return open(chemin, 'r', encoding='utf-8', newline='')
+
+    def lire_enregistrements(self, flux, chemin, delimiteur):
+        """Générateur de dictionnaires ; accepte aussi le format des fixtures Django"""
+        suffixes = [s.lower() for s in chemin.suffixes if s.lower() != '.gz']
+        extension = suffixes[-1] if suffixes else ''
+        if extension == '.csv':
+            yield from csv.DictReader(flux, delimiter=delimiteur)
+        elif extension in ('.ndjson', '.jsonl'):
+            for ligne in flux:
+                if ligne.strip():
+                    yield json.loads(ligne)
+        elif extension == '.json':
+            for enregistrement in json.load(flux):
+                yield enregistrement.get('fields', enregistrement)
+        else:
+            raise CommandError("Format indéterminé : extension .csv, .ndjson ou .json attendue.")
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:39
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0007_conducteur_nom_slug_conducteur_prenom_slug'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AgregatNotation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('mois', models.DateField(help_text='Premier jour du mois')),
+                ('nombre', models.PositiveIntegerField(default=0)),
+                ('somme', models.BigIntegerField(default=0)),
+                ('somme_carres', models.BigIntegerField(default=0)),
+                ('mini', models.IntegerField(blank=True, null=True)),
+                ('maxi', models.IntegerField(blank=True, null=True)),
+                ('derniere_valeur', models.IntegerField(blank=True, null=True)),
+                ('derniere_date', models.DateField(blank=True, null=True)),
+                ('conducteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.conducteur')),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.criteresnotation')),
+            ],
+            options={
+                'verbose_name': 'Agrégat de notation',
+                'verbose_name_plural': 'Agrégats de notation',
+                'indexes': [models.Index(fields=['critere', 'mois'], name='configurati_critere_41aa3f_idx')],
+                'unique_together': {('conducteur', 'critere', 'mois')},
+            },
+        ),
+    ]
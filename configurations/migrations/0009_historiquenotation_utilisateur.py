@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:41
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0008_agregatnotation'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='historiquenotation',
+            name='utilisateur',
+            field=models.ForeignKey(blank=True, help_text='Auteur de la modification', null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AlterField(
+            model_name='historiquenotation',
+            name='nouvelle_valeur',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='historiquenotation',
+            index=models.Index(fields=['notation', 'date_changement'], name='configurati_notatio_6d745b_idx'),
+        ),
+    ]
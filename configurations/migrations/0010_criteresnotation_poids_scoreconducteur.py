@@ -0,0 +1,35 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:42
+
+import django.core.validators
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0009_historiquenotation_utilisateur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='criteresnotation',
+            name='poids',
+            field=models.FloatField(default=1.0, help_text='Poids du critère dans le score global', validators=[django.core.validators.MinValueValidator(0)]),
+        ),
+        migrations.CreateModel(
+            name='ScoreConducteur',
+            fields=[
+                ('conducteur', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='score', serialize=False, to='configurations.conducteur')),
+                ('score', models.FloatField()),
+                ('nb_notations', models.PositiveIntegerField(default=0)),
+                ('calcule_le', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'verbose_name': 'Score conducteur',
+                'verbose_name_plural': 'Scores conducteurs',
+                'indexes': [models.Index(fields=['score'], name='configurati_score_ebc90b_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:44
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0010_criteresnotation_poids_scoreconducteur'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='notation',
+            name='valeur_normalisee',
+            field=models.FloatField(blank=True, editable=False, help_text='Score z de la valeur par rapport aux notations du même notateur sur ce critère', null=True),
+        ),
+        migrations.CreateModel(
+            name='BiaisNotateur',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('nombre', models.PositiveIntegerField()),
+                ('moyenne', models.FloatField()),
+                ('ecart_type', models.FloatField(blank=True, help_text='Vide si moins de deux notations ou valeurs toutes identiques', null=True)),
+                ('moyenne_pairs', models.FloatField(blank=True, help_text='Moyenne des autres notateurs sur ce critère', null=True)),
+                ('biais', models.FloatField(blank=True, help_text='Écart à la moyenne des pairs, en écarts-types du critère', null=True)),
+                ('calcule_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.criteresnotation')),
+                ('notateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.notateur')),
+            ],
+            options={
+                'verbose_name': 'Biais de notateur',
+                'verbose_name_plural': 'Biais de notateurs',
+                'unique_together': {('notateur', 'critere')},
+            },
+        ),
+    ]
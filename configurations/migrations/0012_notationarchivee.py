@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:46
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0011_biaisnotateur_notation_valeur_normalisee'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotationArchivee',
+            fields=[
+                ('id', models.BigIntegerField(help_text="Identifiant de la notation d'origine", primary_key=True, serialize=False)),
+                ('annee', models.PositiveSmallIntegerField(help_text='Année de la notation (clé de partition)')),
+                ('date_notation', models.DateField()),
+                ('valeur', models.IntegerField(blank=True, null=True)),
+                ('valeur_normalisee', models.FloatField(blank=True, null=True)),
+                ('archivee_le', models.DateTimeField(default=django.utils.timezone.now)),
+                ('conducteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.conducteur')),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.criteresnotation')),
+                ('notateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.notateur')),
+            ],
+            options={
+                'verbose_name': 'Notation archivée',
+                'verbose_name_plural': 'Notations archivées',
+            },
+        ),
+        migrations.CreateModel(
+            name='HistoriqueNotationArchivee',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('ancienne_valeur', models.IntegerField(blank=True, null=True)),
+                ('nouvelle_valeur', models.IntegerField(blank=True, null=True)),
+                ('date_changement', models.DateTimeField()),
+                ('conducteur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.conducteur')),
+                ('critere', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.criteresnotation')),
+                ('notateur', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.notateur')),
+                ('utilisateur', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL)),
+                ('notation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.notationarchivee')),
+            ],
+            options={
+                'verbose_name': 'Historique de notation archivée',
+                'verbose_name_plural': 'Historiques de notations archivées',
+            },
+        ),
+        migrations.AddIndex(
+            model_name='notationarchivee',
+            index=models.Index(fields=['annee', 'conducteur'], name='configurati_annee_8c456b_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notationarchivee',
+            index=models.Index(fields=['conducteur', 'critere', 'date_notation'], name='configurati_conduct_b73717_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notationarchivee',
+            index=models.Index(fields=['date_notation'], name='configurati_date_no_7678e5_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquenotationarchivee',
+            index=models.Index(fields=['notation', 'date_changement'], name='configurati_notatio_bf635b_idx'),
+        ),
+    ]
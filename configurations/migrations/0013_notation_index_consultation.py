@@ -0,0 +1,29 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0012_notationarchivee'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='notation',
+            index=models.Index(fields=['date_notation', 'id'], name='configurati_date_no_621ce8_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notation',
+            index=models.Index(fields=['conducteur', 'date_notation', 'id'], name='configurati_conduct_4772a2_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notation',
+            index=models.Index(fields=['notateur', 'date_notation', 'id'], name='configurati_notateu_2dbffa_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='notation',
+            index=models.Index(fields=['critere', 'date_notation', 'id'], name='configurati_critere_9ddd04_idx'),
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:50
+
+import hashlib
+import json
+from datetime import date
+
+from django.db import migrations, models
+
+# Copie figée de configurations.empreintes à la date de la migration : le
+# résultat ne doit pas dépendre des évolutions ultérieures du module
+CHAMPS_ERP_CONDUCTEUR = (
+    'erp_id', 'nom', 'prenom', 'date_naissance', 'date_entree', 'date_sortie',
+    'service_id', 'site_id', 'societe_id', 'interim_p',
+)
+
+
+def normaliser(valeur):
+    if isinstance(valeur, date):
+        return valeur.isoformat()
+    if isinstance(valeur, str):
+        return valeur.strip()
+    return valeur
+
+
+def empreinte_conducteur(donnees):
+    texte = json.dumps(
+        [normaliser(donnees.get(champ)) for champ in CHAMPS_ERP_CONDUCTEUR], separators=(',', ':'), ensure_ascii=False
+    )
+    return hashlib.blake2b(texte.encode('utf-8'), digest_size=20).hexdigest()
+
+
+def calculer_empreintes(apps, schema_editor):
+    """Empreintes des conducteurs déjà chargés, pour que la première synchronisation ne réécrive pas tout"""
+    Conducteur = apps.get_model('configurations', 'Conducteur')
+    champs = [champ for champ in CHAMPS_ERP_CONDUCTEUR if champ not in ('nom', 'prenom')]
+    conducteurs = []
+    for ligne in Conducteur.objects.values('pk', 'nom', 'nom_slug', 'prenom', 'prenom_slug', *champs).iterator():
+        ligne['nom'] = ligne['nom_slug'] or ligne['nom']
+        ligne['prenom'] = ligne['prenom_slug'] or ligne['prenom']
+        conducteurs.append(Conducteur(pk=ligne['pk'], empreinte_erp=empreinte_conducteur(ligne)))
+    Conducteur.objects.bulk_update(conducteurs, ['empreinte_erp'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0013_notation_index_consultation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='conducteur',
+            name='empreinte_erp',
+            field=models.CharField(blank=True, editable=False, help_text="Empreinte des champs issus de l'ERP lors de la dernière synchronisation", max_length=40),
+        ),
+        migrations.RunPython(calculer_empreintes, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,107 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:51
+
+import re
+import unicodedata
+
+from django.db import migrations, models
+
+TABLE_FTS = 'configurations_recherche_fts'
+
+CREATION_FTS = [
+    f"""CREATE VIRTUAL TABLE {TABLE_FTS} USING fts5(
+        texte,
+        content='configurations_entreerecherche',
+        content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2',
+        prefix='2 3'
+    )""",
+    f"""CREATE TRIGGER configurations_recherche_ai AFTER INSERT ON configurations_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS}(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+    f"""CREATE TRIGGER configurations_recherche_ad AFTER DELETE ON configurations_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, texte) VALUES ('delete', old.id, old.texte);
+    END""",
+    f"""CREATE TRIGGER configurations_recherche_au AFTER UPDATE ON configurations_entreerecherche BEGIN
+        INSERT INTO {TABLE_FTS}({TABLE_FTS}, rowid, texte) VALUES ('delete', old.id, old.texte);
+        INSERT INTO {TABLE_FTS}(rowid, texte) VALUES (new.id, new.texte);
+    END""",
+]
+
+SUPPRESSION_FTS = [
+    "DROP TRIGGER IF EXISTS configurations_recherche_ai",
+    "DROP TRIGGER IF EXISTS configurations_recherche_ad",
+    "DROP TRIGGER IF EXISTS configurations_recherche_au",
+    f"DROP TABLE IF EXISTS {TABLE_FTS}",
+]
+
+
+def normaliser_texte(texte):
+    """Copie figée de configurations.recherche.normaliser_texte à la date de la migration"""
+    decompose = unicodedata.normalize('NFKD', str(texte or ''))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', sans_accents.lower()))
+
+
+def creer_fts(apps, schema_editor):
+    """Table FTS5 et déclencheurs, uniquement sur SQLite compilé avec FTS5"""
+    connexion = schema_editor.connection
+    if connexion.vendor != 'sqlite':
+        return
+    with connexion.cursor() as curseur:
+        curseur.execute("SELECT sqlite_compileoption_used('ENABLE_FTS5')")
+        if not curseur.fetchone()[0]:
+            return
+        for instruction in CREATION_FTS:
+            curseur.execute(instruction)
+
+
+def supprimer_fts(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    with schema_editor.connection.cursor() as curseur:
+        for instruction in SUPPRESSION_FTS:
+            curseur.execute(instruction)
+
+
+def indexer_existants(apps, schema_editor):
+    Conducteur = apps.get_model('configurations', 'Conducteur')
+    Notateur = apps.get_model('configurations', 'Notateur')
+    EntreeRecherche = apps.get_model('configurations', 'EntreeRecherche')
+    entrees = [
+        EntreeRecherche(type_objet='conducteur', objet_id=c.pk, texte=normaliser_texte(
+            f"{c.nom_slug or c.nom} {c.prenom_slug or c.prenom} {c.erp_id} {c.site.nom} {c.service.nom}"
+        ))
+        for c in Conducteur.objects.select_related('site', 'service').iterator(chunk_size=2000)
+    ] + [
+        EntreeRecherche(type_objet='notateur', objet_id=n.pk, texte=normaliser_texte(
+            f"{n.nom_slug or n.nom} {n.prenom_slug or n.prenom} {n.service.nom}"
+        ))
+        for n in Notateur.objects.select_related('service').iterator(chunk_size=2000)
+    ]
+    EntreeRecherche.objects.bulk_create(entrees, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0014_conducteur_empreinte_erp'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EntreeRecherche',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('type_objet', models.CharField(choices=[('conducteur', 'Conducteur'), ('notateur', 'Notateur')], max_length=20)),
+                ('objet_id', models.PositiveIntegerField()),
+                ('texte', models.TextField()),
+            ],
+            options={
+                'verbose_name': 'Entrée de recherche',
+                'verbose_name_plural': 'Entrées de recherche',
+                'unique_together': {('type_objet', 'objet_id')},
+            },
+        ),
+        migrations.RunPython(creer_fts, supprimer_fts),
+        migrations.RunPython(indexer_existants, migrations.RunPython.noop),
+    ]
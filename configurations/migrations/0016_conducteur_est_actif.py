@@ -0,0 +1,43 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:53
+
+from datetime import date
+
+from django.db import migrations, models
+
+
+def initialiser_statuts(apps, schema_editor):
+    Conducteur = apps.get_model('configurations', 'Conducteur')
+    actif = models.Q(actif_p=True) & (models.Q(date_sortie__isnull=True) | models.Q(date_sortie__gt=date.today()))
+    Conducteur.objects.exclude(actif).update(est_actif=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0015_entreerecherche'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='conducteur',
+            name='configurati_actif_p_92d8a5_idx',
+        ),
+        migrations.AddField(
+            model_name='conducteur',
+            name='est_actif',
+            field=models.BooleanField(default=True, editable=False, help_text='Actif et sans date de sortie passée (recalculé chaque jour)', verbose_name='En activité'),
+        ),
+        migrations.RunPython(initialiser_statuts, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(condition=models.Q(('est_actif', True)), fields=['nom', 'prenom'], name='conducteur_actif_nom_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(condition=models.Q(('est_actif', True)), fields=['service', 'site'], name='conducteur_actif_service_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='conducteur',
+            index=models.Index(condition=models.Q(('est_actif', True)), fields=['date_sortie'], name='conducteur_actif_sortie_idx'),
+        ),
+    ]
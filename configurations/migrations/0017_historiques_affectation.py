@@ -0,0 +1,100 @@
+# Generated by Django 5.2.18 on 2026-10-16 23:54
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def initialiser_historiques(apps, schema_editor):
+    """Période en cours des conducteurs sans historique, depuis leur date d'entrée"""
+    Conducteur = apps.get_model('configurations', 'Conducteur')
+    for champ, nom_modele in (('site', 'HistoriqueSite'), ('service', 'HistoriqueService'), ('societe', 'HistoriqueSociete')):
+        modele = apps.get_model('configurations', nom_modele)
+        manquants = Conducteur.objects.exclude(pk__in=modele.objects.values('conducteur_id'))
+        modele.objects.bulk_create(
+            [
+                modele(conducteur_id=pk, date_entree=date_entree, **{f"{champ}_id": groupe_id})
+                for pk, date_entree, groupe_id in manquants.values_list('pk', 'date_entree', f"{champ}_id").iterator()
+            ],
+            batch_size=500,
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('configurations', '0016_conducteur_est_actif'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HistoriqueService',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_entree', models.DateField()),
+                ('date_sortie', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Historique de service',
+                'verbose_name_plural': 'Historiques de service',
+                'abstract': False,
+            },
+        ),
+        migrations.CreateModel(
+            name='HistoriqueSociete',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_entree', models.DateField()),
+                ('date_sortie', models.DateField(blank=True, null=True)),
+            ],
+            options={
+                'verbose_name': 'Historique de société',
+                'verbose_name_plural': 'Historiques de société',
+                'abstract': False,
+            },
+        ),
+        migrations.AddIndex(
+            model_name='historiquesite',
+            index=models.Index(fields=['conducteur', 'date_entree', 'date_sortie'], name='historiquesite_cond_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquesite',
+            index=models.Index(fields=['site', 'date_entree', 'date_sortie'], name='historiquesite_periode_idx'),
+        ),
+        migrations.AddField(
+            model_name='historiqueservice',
+            name='conducteur',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.conducteur'),
+        ),
+        migrations.AddField(
+            model_name='historiqueservice',
+            name='service',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.service'),
+        ),
+        migrations.AddField(
+            model_name='historiquesociete',
+            name='conducteur',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.conducteur'),
+        ),
+        migrations.AddField(
+            model_name='historiquesociete',
+            name='societe',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='configurations.societe'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueservice',
+            index=models.Index(fields=['conducteur', 'date_entree', 'date_sortie'], name='historiqueservice_cond_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiqueservice',
+            index=models.Index(fields=['service', 'date_entree', 'date_sortie'], name='historiqueservice_periode_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquesociete',
+            index=models.Index(fields=['conducteur', 'date_entree', 'date_sortie'], name='historiquesociete_cond_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='historiquesociete',
+            index=models.Index(fields=['societe', 'date_entree', 'date_sortie'], name='historiquesociete_periode_idx'),
+        ),
+        migrations.RunPython(initialiser_historiques, migrations.RunPython.noop),
+    ]
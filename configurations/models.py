@@ -1,11 +1,13 @@
 from django.db import models
-from django.core.validators import RegexValidator
+from django.core.validators import RegexValidator, MinValueValidator
 from django.utils import timezone
 from django.contrib.auth.models import Group, User
 from django.urls import reverse
 from django.core.exceptions import ValidationError
-from datetime import date
+from datetime import date, timedelta
 from django.db.models import Q
+from django.db.models.functions import Coalesce, ExtractYear
+from django.db.models.lookups import LessThan
 
 # Gestion des groupes
 class GroupePage(models.Model):
@@ -106,10 +108,14 @@ class CustomGroup(models.Model):
             user=user,
             defaults={'added_by': added_by}
         )
+        from .permissions import oublier
+        oublier(user)
         return created
     
     def remove_user(self, user):
         """Supprimer un utilisateur du groupe"""
+        from .permissions import oublier
+        oublier(user)
         try:
             membership = GroupMembership.objects.get(group=self, user=user)
             membership.delete()
@@ -119,7 +125,8 @@ class CustomGroup(models.Model):
     
     def is_member(self, user):
         """Vérifier si un utilisateur est membre du groupe"""
-        return self.members.filter(id=user.id).exists()
+        from .permissions import permissions_utilisateur
+        return permissions_utilisateur(user).membre(self.pk)
     
     def get_members_count(self):
         """Obtenir le nombre de membres"""
@@ -162,16 +169,78 @@ class GroupMembership(models.Model):
 #             Q(date_sortie__isnull=True) | Q(date_sortie__gt=hoy)
 #         )
 
-class ConducteurActiveManager(models.Manager):
+def normaliser_nom_prenom(objet, creation=True):
+    """Conserve la graphie d'origine dans nom_slug/prenom_slug et passe nom/prenom en minuscules.
+
+    Utilisée par Conducteur.save(), Notateur.save() et les chargements en masse.
+    """
+    for champ in ('nom', 'prenom'):
+        valeur = getattr(objet, champ)
+        if valeur:
+            if creation or not getattr(objet, f"{champ}_slug"):
+                setattr(objet, f"{champ}_slug", valeur)
+            setattr(objet, champ, valeur.lower())
+
+# Tranches d'ancienneté : (borne supérieure exclue en jours, libellé) ; la dernière n'a pas de borne
+TRANCHES_ANCIENNETE = [
+    (365, "Moins d'un an"),
+    (3 * 365, "1 à 3 ans"),
+    (5 * 365, "3 à 5 ans"),
+    (10 * 365, "5 à 10 ans"),
+    (None, "10 ans et plus"),
+]
+
+def expression_age(reference=None, prefixe=''):
+    """Âge en années révolues calculé par la base (NULL sans date de naissance).
+
+    `prefixe` permet de l'utiliser depuis un modèle lié, par exemple 'conducteur__'.
+    """
+    reference = reference or date.today()
+    naissance = f"{prefixe}date_naissance"
+    anniversaire_a_venir = Q(**{f"{naissance}__month__gt": reference.month}) | Q(
+        **{f"{naissance}__month": reference.month, f"{naissance}__day__gt": reference.day}
+    )
+    return models.ExpressionWrapper(
+        models.Value(reference.year) - ExtractYear(naissance)
+        - models.Case(models.When(anniversaire_a_venir, then=models.Value(1)), default=models.Value(0)),
+        output_field=models.IntegerField(),
+    )
+
+def expression_anciennete(reference=None, prefixe=''):
+    """Ancienneté (durée) entre la date d'entrée et la date de sortie, ou la date de référence"""
+    reference = reference or date.today()
+    fin = Coalesce(f"{prefixe}date_sortie", models.Value(reference, output_field=models.DateField()))
+    return models.ExpressionWrapper(fin - models.F(f"{prefixe}date_entree"), output_field=models.DurationField())
+
+def expression_tranche_anciennete(reference=None, prefixe=''):
+    """Libellé de la tranche d'ancienneté (TRANCHES_ANCIENNETE)"""
+    anciennete = expression_anciennete(reference, prefixe)
+    return models.Case(
+        *[
+            models.When(LessThan(anciennete, timedelta(days=jours)), then=models.Value(libelle))
+            for jours, libelle in TRANCHES_ANCIENNETE if jours is not None
+        ],
+        default=models.Value(TRANCHES_ANCIENNETE[-1][1]),
+        output_field=models.CharField(),
+    )
+
+class ConducteurQuerySet(models.QuerySet):
+    def avec_age(self, reference=None):
+        """Annote age_annote, l'âge calculé par la base (triable et filtrable)"""
+        return self.annotate(age_annote=expression_age(reference))
+
+    def avec_anciennete(self, reference=None):
+        """Annote anciennete_annotee (durée) et tranche_anciennete"""
+        return self.annotate(
+            anciennete_annotee=expression_anciennete(reference),
+            tranche_anciennete=expression_tranche_anciennete(reference),
+        )
+
+class ConducteurActiveManager(models.Manager.from_queryset(ConducteurQuerySet)):
     """Manager pour récupérer uniquement les conducteurs actifs"""
     def get_queryset(self):
-        aujourd_hui = date.today()
-        # Conducteurs sans date de sortie OU avec date de sortie future
-        condition_date = Q(date_sortie__isnull=True) | Q(date_sortie__gt=aujourd_hui)
-        
-        return super().get_queryset().filter(
-            actif_p=True
-        ).filter(condition_date)
+        # Statut matérialisé, tenu à jour par save() et par le basculement quotidien
+        return super().get_queryset().filter(est_actif=True)
 
 class NotationRecentManager(models.Manager):
     """Manager pour les notations récentes (6 derniers mois)"""
@@ -263,13 +332,27 @@ class Conducteur(models.Model):
     societe = models.ForeignKey(Societe, on_delete=models.CASCADE, help_text="Nom de la société d'affectation.")
     actif_p = models.BooleanField(default=True, verbose_name="Actif", help_text="Conducteur actif ?")
     interim_p = models.BooleanField(default=False, verbose_name="Intérim", help_text="Conducteur intérimaire ?")
+    est_actif = models.BooleanField(default=True, editable=False, verbose_name="En activité", help_text="Actif et sans date de sortie passée (recalculé chaque jour)")
+    empreinte_erp = models.CharField(max_length=40, blank=True, editable=False, help_text="Empreinte des champs issus de l'ERP lors de la dernière synchronisation")
 
-    objects = models.Manager()
+    objects = ConducteurQuerySet.as_manager()
     actifs = ConducteurActiveManager()
 
     def __str__(self):
         return f"{self.prenom_affichage} {self.nom_affichage}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.memoriser_affectation()
+        return instance
+
+    def memoriser_affectation(self):
+        """Conserve l'affectation chargée depuis la base pour historiser ses changements"""
+        self._affectation_initiale = {
+            champ: self.__dict__.get(f"{champ}_id") for champ in ('site', 'service', 'societe')
+        }
+
     @property
     def nom_complet(self):
         return f"{self.prenom_affichage} {self.nom_affichage}"
@@ -277,19 +360,20 @@ class Conducteur(models.Model):
 
     def save(self, *args, **kwargs):
         # Si c'est une création (pas d'ID) ou si les champs slug sont vides
-        is_new = self.pk is None
-        
-        if self.nom:
-            if is_new or not self.nom_slug:
-                self.nom_slug = self.nom
-            self.nom = self.nom.lower()
-            
-        if self.prenom:
-            if is_new or not self.prenom_slug:
-                self.prenom_slug = self.prenom
-            self.prenom = self.prenom.lower()
+        normaliser_nom_prenom(self, creation=self.pk is None)
+
+        self.est_actif = self.statut_actif(self.actif_p, self.date_sortie)
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and {'actif_p', 'date_sortie'} & set(update_fields):
+            kwargs['update_fields'] = {*update_fields, 'est_actif'}
         
         super().save(*args, **kwargs)
+
+    @staticmethod
+    def statut_actif(actif_p, date_sortie, reference=None):
+        """Règle unique d'activité : actif et sans date de sortie atteinte"""
+        reference = reference or date.today()
+        return bool(actif_p) and (date_sortie is None or date_sortie > reference)
     
     @property
     def nom_affichage(self):
@@ -301,9 +385,7 @@ class Conducteur(models.Model):
 
     @property
     def est_actuellement_actif(self):
-        if self.actif_p:
-            return True
-        return False
+        return self.statut_actif(self.actif_p, self.date_sortie)
 
     @property
     def age(self):
@@ -365,8 +447,11 @@ class Conducteur(models.Model):
         indexes = [
             models.Index(fields=['nom', 'prenom']),
             models.Index(fields=['erp_id']),
-            models.Index(fields=['actif_p', 'date_sortie']),
             models.Index(fields=['service', 'site']),
+            # Index partiels : seuls les conducteurs en activité y figurent
+            models.Index(fields=['nom', 'prenom'], condition=Q(est_actif=True), name='conducteur_actif_nom_idx'),
+            models.Index(fields=['service', 'site'], condition=Q(est_actif=True), name='conducteur_actif_service_idx'),
+            models.Index(fields=['date_sortie'], condition=Q(est_actif=True), name='conducteur_actif_sortie_idx'),
         ]
 
 class Notateur(models.Model):
@@ -380,17 +465,7 @@ class Notateur(models.Model):
 
     def save(self, *args, **kwargs):
         # Si c'est une création (pas d'ID) ou si les champs slug sont vides
-        is_new = self.pk is None
-        
-        if self.nom:
-            if is_new or not self.nom_slug:
-                self.nom_slug = self.nom
-            self.nom = self.nom.lower()
-            
-        if self.prenom:
-            if is_new or not self.prenom_slug:
-                self.prenom_slug = self.prenom
-            self.prenom = self.prenom.lower()
+        normaliser_nom_prenom(self, creation=self.pk is None)
         
         super().save(*args, **kwargs)
 
@@ -458,6 +533,7 @@ class CriteresNotation(models.Model):
     valeur_mini = models.IntegerField(help_text="Valeur plancher")
     valeur_maxi = models.IntegerField(help_text="Valeur plafond")
     actif = models.BooleanField(default=True, help_text="Critère actuellement utilisé")    
+    poids = models.FloatField(default=1.0, validators=[MinValueValidator(0)], help_text="Poids du critère dans le score global")
     created_at = models.DateTimeField(auto_now_add=True, null=True)
 
     def __str__(self):
@@ -482,6 +558,9 @@ class CriteresNotation(models.Model):
         if self.valeur_mini < 0:
             erreurs['valeur_mini'] = 'La valeur minimale ne peut pas être négative.'
 
+        if self.poids is not None and self.poids < 0:
+            erreurs['poids'] = 'Le poids ne peut pas être négatif.'
+
         if erreurs:
             raise ValidationError(erreurs)
 
@@ -501,14 +580,138 @@ class Notation(models.Model):
     conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE, help_text="")
     critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE, help_text="")
     valeur = models.IntegerField(null=True, blank=True, help_text="")
+    valeur_normalisee = models.FloatField(null=True, blank=True, editable=False, help_text="Score z de la valeur par rapport aux notations du même notateur sur ce critère")
+
+    objects = models.Manager()
+    recentes = NotationRecentManager()
 
     def __str__(self):
         return f"{self.conducteur} - {self.critere} : {self.valeur}"
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance.memoriser_etat()
+        return instance
+
+    def memoriser_etat(self):
+        """Conserve l'état chargé depuis la base pour détecter les modifications"""
+        self._etat_initial = {
+            champ: self.__dict__.get(champ)
+            for champ in ('conducteur_id', 'critere_id', 'notateur_id', 'date_notation', 'valeur')
+        }
+
+    def cle_archivee(self):
+        """Vrai si (conducteur, critère, date, notateur) existe déjà dans les archives"""
+        return NotationArchivee.objects.filter(
+            conducteur_id=self.conducteur_id, critere_id=self.critere_id,
+            date_notation=self.date_notation, notateur_id=self.notateur_id,
+        ).exists()
+
+    def cle_modifiee(self):
+        """Vrai pour une création ou si la clé unique a changé depuis le chargement"""
+        initial = getattr(self, '_etat_initial', None)
+        if initial is None:
+            return True
+        return any(
+            initial[champ] != getattr(self, champ)
+            for champ in ('conducteur_id', 'critere_id', 'notateur_id', 'date_notation')
+        )
+
+    def clean(self):
+        """Validation métier : une notation déjà archivée ne peut pas être recréée"""
+        if None not in (self.conducteur_id, self.critere_id, self.notateur_id, self.date_notation) and self.cle_archivee():
+            raise ValidationError({'date_notation': "Une notation archivée existe déjà pour ce conducteur, ce critère, ce notateur et cette date."})
+
+    def save(self, *args, **kwargs):
+        # Comme clean(), pour les enregistrements qui ne passent pas par un formulaire :
+        # la clé serait sinon comptée deux fois par les lectures sur les deux tables
+        if self.cle_modifiee() and self.cle_archivee():
+            raise ValidationError("Une notation archivée existe déjà pour ce conducteur, ce critère, ce notateur et cette date.")
+        super().save(*args, **kwargs)
+
     class Meta:
         verbose_name = "Notation"
         verbose_name_plural = "Notations"
         unique_together = ['conducteur', 'critere', 'date_notation', 'notateur']
+        indexes = [
+            # Pagination par curseur et filtres de l'API de consultation
+            models.Index(fields=['date_notation', 'id']),
+            models.Index(fields=['conducteur', 'date_notation', 'id']),
+            models.Index(fields=['notateur', 'date_notation', 'id']),
+            models.Index(fields=['critere', 'date_notation', 'id']),
+        ]
+
+class AgregatNotation(models.Model):
+    """Agrégats mensuels par conducteur et critère, maintenus au fil des écritures"""
+    conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE)
+    critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE)
+    mois = models.DateField(help_text="Premier jour du mois")
+    nombre = models.PositiveIntegerField(default=0)
+    somme = models.BigIntegerField(default=0)
+    somme_carres = models.BigIntegerField(default=0)
+    mini = models.IntegerField(null=True, blank=True)
+    maxi = models.IntegerField(null=True, blank=True)
+    derniere_valeur = models.IntegerField(null=True, blank=True)
+    derniere_date = models.DateField(null=True, blank=True)
+
+    def __str__(self):
+        return f"{self.conducteur} - {self.critere} - {self.mois:%m/%Y}"
+
+    @property
+    def moyenne(self):
+        return self.somme / self.nombre if self.nombre else None
+
+    @property
+    def variance(self):
+        if not self.nombre:
+            return None
+        moyenne = self.somme / self.nombre
+        return max(self.somme_carres / self.nombre - moyenne * moyenne, 0)
+
+    class Meta:
+        verbose_name = "Agrégat de notation"
+        verbose_name_plural = "Agrégats de notation"
+        unique_together = ['conducteur', 'critere', 'mois']
+        indexes = [
+            models.Index(fields=['critere', 'mois']),
+        ]
+
+class BiaisNotateur(models.Model):
+    """Statistiques d'un notateur sur un critère comparées à celles de ses pairs"""
+    notateur = models.ForeignKey(Notateur, on_delete=models.CASCADE)
+    critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE)
+    nombre = models.PositiveIntegerField()
+    moyenne = models.FloatField()
+    ecart_type = models.FloatField(null=True, blank=True, help_text="Vide si moins de deux notations ou valeurs toutes identiques")
+    moyenne_pairs = models.FloatField(null=True, blank=True, help_text="Moyenne des autres notateurs sur ce critère")
+    biais = models.FloatField(null=True, blank=True, help_text="Écart à la moyenne des pairs, en écarts-types du critère")
+    calcule_le = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.notateur} - {self.critere.nom}"
+
+    class Meta:
+        verbose_name = "Biais de notateur"
+        verbose_name_plural = "Biais de notateurs"
+        unique_together = ['notateur', 'critere']
+
+class ScoreConducteur(models.Model):
+    """Score global pondéré d'un conducteur (0 à 100), recalculé par le moteur de scores"""
+    conducteur = models.OneToOneField(Conducteur, on_delete=models.CASCADE, primary_key=True, related_name='score')
+    score = models.FloatField()
+    nb_notations = models.PositiveIntegerField(default=0)
+    calcule_le = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.conducteur} : {self.score:.1f}"
+
+    class Meta:
+        verbose_name = "Score conducteur"
+        verbose_name_plural = "Scores conducteurs"
+        indexes = [
+            models.Index(fields=['score']),
+        ]
 
 class HistoriqueNotation(models.Model):
     notation = models.ForeignKey(Notation, on_delete=models.CASCADE)
@@ -516,23 +719,148 @@ class HistoriqueNotation(models.Model):
     conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE)
     critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE)
     ancienne_valeur = models.IntegerField(null=True, blank=True)
-    nouvelle_valeur = models.IntegerField()
+    nouvelle_valeur = models.IntegerField(null=True, blank=True)
     date_changement = models.DateTimeField(default=timezone.now)
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, help_text="Auteur de la modification")
 
     class Meta:
         verbose_name = "Historique de notation"
         verbose_name_plural = "Historiques de notation"
+        indexes = [
+            models.Index(fields=['notation', 'date_changement']),
+        ]
+
+class NotationArchivee(models.Model):
+    """Notation sortie de la table principale par l'archivage, partitionnée par année"""
+    id = models.BigIntegerField(primary_key=True, help_text="Identifiant de la notation d'origine")
+    annee = models.PositiveSmallIntegerField(help_text="Année de la notation (clé de partition)")
+    date_notation = models.DateField()
+    notateur = models.ForeignKey(Notateur, on_delete=models.CASCADE)
+    conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE)
+    critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE)
+    valeur = models.IntegerField(null=True, blank=True)
+    valeur_normalisee = models.FloatField(null=True, blank=True)
+    archivee_le = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return f"{self.conducteur} - {self.critere} : {self.valeur} ({self.date_notation})"
+
+    class Meta:
+        verbose_name = "Notation archivée"
+        verbose_name_plural = "Notations archivées"
+        indexes = [
+            models.Index(fields=['annee', 'conducteur']),
+            models.Index(fields=['conducteur', 'critere', 'date_notation']),
+            models.Index(fields=['date_notation']),
+        ]
+
+class HistoriqueNotationArchivee(models.Model):
+    """Historique d'une notation archivée"""
+    id = models.BigIntegerField(primary_key=True)
+    notation = models.ForeignKey(NotationArchivee, on_delete=models.CASCADE)
+    notateur = models.ForeignKey(Notateur, on_delete=models.CASCADE)
+    conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE)
+    critere = models.ForeignKey(CriteresNotation, on_delete=models.CASCADE)
+    ancienne_valeur = models.IntegerField(null=True, blank=True)
+    nouvelle_valeur = models.IntegerField(null=True, blank=True)
+    date_changement = models.DateTimeField()
+    utilisateur = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+
+    class Meta:
+        verbose_name = "Historique de notation archivée"
+        verbose_name_plural = "Historiques de notations archivées"
+        indexes = [
+            models.Index(fields=['notation', 'date_changement']),
+        ]
+
+class HistoriqueAffectationQuerySet(models.QuerySet):
+    def a_la_date(self, jour):
+        """Affectations en cours le jour donné (intervalle [date_entree, date_sortie[)"""
+        return self.filter(
+            Q(date_entree__lte=jour),
+            Q(date_sortie__isnull=True) | Q(date_sortie__gt=jour),
+        )
+
+    def en_cours(self):
+        return self.filter(date_sortie__isnull=True)
+
+class HistoriqueAffectation(models.Model):
+    """Période d'affectation d'un conducteur, de date_entree incluse à date_sortie exclue.
+
+    Les sous-classes ajoutent la clé étrangère suivie ; son nom est donné par
+    `champ_affectation` et correspond au champ du même nom sur Conducteur.
+    """
+    champ_affectation = None
 
-class HistoriqueSite(models.Model):
     conducteur = models.ForeignKey(Conducteur, on_delete=models.CASCADE)
-    site = models.ForeignKey(Site, on_delete=models.CASCADE)
     date_entree = models.DateField()
     date_sortie = models.DateField(null=True, blank=True)
 
+    objects = HistoriqueAffectationQuerySet.as_manager()
+
     class Meta:
+        abstract = True
+        indexes = [
+            models.Index(fields=['conducteur', 'date_entree', 'date_sortie'], name='%(class)s_cond_idx'),
+        ]
+
+class HistoriqueSite(HistoriqueAffectation):
+    champ_affectation = 'site'
+
+    site = models.ForeignKey(Site, on_delete=models.CASCADE)
+
+    class Meta(HistoriqueAffectation.Meta):
         verbose_name = "Historique de site"
         verbose_name_plural = "Historiques de site"
+        indexes = HistoriqueAffectation.Meta.indexes + [
+            models.Index(fields=['site', 'date_entree', 'date_sortie'], name='historiquesite_periode_idx'),
+        ]
 
+class HistoriqueService(HistoriqueAffectation):
+    champ_affectation = 'service'
 
+    service = models.ForeignKey(Service, on_delete=models.CASCADE)
+
+    class Meta(HistoriqueAffectation.Meta):
+        verbose_name = "Historique de service"
+        verbose_name_plural = "Historiques de service"
+        indexes = HistoriqueAffectation.Meta.indexes + [
+            models.Index(fields=['service', 'date_entree', 'date_sortie'], name='historiqueservice_periode_idx'),
+        ]
+
+class HistoriqueSociete(HistoriqueAffectation):
+    champ_affectation = 'societe'
+
+    societe = models.ForeignKey(Societe, on_delete=models.CASCADE)
+
+    class Meta(HistoriqueAffectation.Meta):
+        verbose_name = "Historique de société"
+        verbose_name_plural = "Historiques de société"
+        indexes = HistoriqueAffectation.Meta.indexes + [
+            models.Index(fields=['societe', 'date_entree', 'date_sortie'], name='historiquesociete_periode_idx'),
+        ]
+
+
+class EntreeRecherche(models.Model):
+    """Texte normalisé (minuscules, sans accents) indexé pour la recherche de conducteurs et de notateurs.
+
+    Sur SQLite, la table virtuelle FTS5 configurations_recherche_fts est
+    alimentée par déclencheurs à partir de cette table.
+    """
+    TYPES = [
+        ('conducteur', 'Conducteur'),
+        ('notateur', 'Notateur'),
+    ]
+
+    type_objet = models.CharField(max_length=20, choices=TYPES)
+    objet_id = models.PositiveIntegerField()
+    texte = models.TextField()
+
+    def __str__(self):
+        return f"{self.type_objet} {self.objet_id} : {self.texte}"
+
+    class Meta:
+        verbose_name = "Entrée de recherche"
+        verbose_name_plural = "Entrées de recherche"
+        unique_together = ['type_objet', 'objet_id']
 
-        
@@ -0,0 +1,65 @@
+# configurations/navigation.py
+# Barre de navigation par utilisateur (groupes de pages -> pages actives) mise en cache
+import time
+
+from django.core.cache import cache
+
+from .models import Page
+from .versions import cache_versions
+
+DUREE_CACHE = 24 * 60 * 60
+
+CLE_VERSION = "navigation:version"
+
+
+def cle_cache(user_id):
+    # La version globale couvre les pages et les groupes de pages, communs à tous ;
+    # évincée, elle repart d'une valeur jamais servie
+    version = cache_versions.get_or_set(CLE_VERSION, time.time_ns, None)
+    return f"navigation:{user_id}:v{version}"
+
+
+def construire_navigation(user):
+    """Groupes de l'utilisateur et leurs pages actives, URL résolues, en une requête.
+
+    Retourne [{'nom', 'libelle', 'pages': [{'nom', 'libelle', 'url'}]}] dans
+    l'ordre d'affichage ; un groupe sans page active n'apparaît pas.
+    """
+    pages = (
+        Page.objects.filter(is_active=True, groupe__associationutilisateurgroupe__user=user)
+        .select_related('groupe')
+        .order_by('groupe__ordre', 'groupe__nom', 'ordre', 'nom')
+    )
+    groupes = {}
+    for page in pages:
+        groupe = groupes.setdefault(page.groupe_id, {
+            'nom': page.groupe.nom,
+            'libelle': page.groupe.libelle,
+            'pages': [],
+        })
+        groupe['pages'].append({'nom': page.nom, 'libelle': page.libelle, 'url': page.get_url()})
+    return list(groupes.values())
+
+
+def navigation_utilisateur(user):
+    """Barre de navigation d'un utilisateur connecté, servie depuis le cache quand elle y est"""
+    if not user.is_authenticated:
+        return []
+    cle = cle_cache(user.pk)
+    navigation = cache.get(cle)
+    if navigation is None:
+        navigation = construire_navigation(user)
+        cache.set(cle, navigation, DUREE_CACHE)
+    return navigation
+
+
+def invalider(user_ids):
+    cache.delete_many([cle_cache(user_id) for user_id in user_ids])
+
+
+def invalider_toutes():
+    """Invalide la navigation de tous les utilisateurs (page ou groupe de pages modifié)"""
+    try:
+        cache_versions.incr(CLE_VERSION)
+    except ValueError:
+        cache_versions.set(CLE_VERSION, time.time_ns(), None)
@@ -0,0 +1,92 @@
+# configurations/normalisation.py
+# Détection des biais de notateurs et normalisation des notations (scores z)
+import numpy as np
+from django.db import transaction
+from django.db.models import F, OuterRef, Subquery
+from django.utils import timezone
+
+from . import archives
+from .models import BiaisNotateur, Notation, NotationArchivee
+from .scores import vers_tableau
+
+
+def statistiques(notateurs, criteres, valeurs, minimum=5):
+    """Statistiques groupées par (notateur, critère) et par critère, sans boucle Python.
+
+    Retourne la liste des tuples (notateur, critère, nombre, moyenne,
+    écart-type, moyenne des pairs, biais) ; l'écart-type n'est fourni qu'à
+    partir de `minimum` notations.
+    """
+    if len(valeurs) == 0:
+        return []
+
+    paires, index = np.unique(np.stack([notateurs, criteres], axis=1), axis=0, return_inverse=True)
+    index = index.ravel()
+    nombre = np.bincount(index)
+    somme = np.bincount(index, weights=valeurs)
+    somme_carres = np.bincount(index, weights=valeurs * valeurs)
+
+    # Totaux par critère, ramenés sur chaque paire (notateur, critère)
+    ids_criteres, index_critere = np.unique(paires[:, 1], return_inverse=True)
+    nombre_critere = np.bincount(index_critere, weights=nombre)[index_critere]
+    somme_critere = np.bincount(index_critere, weights=somme)[index_critere]
+    carres_critere = np.bincount(index_critere, weights=somme_carres)[index_critere]
+
+    moyenne = somme / nombre
+    variance = np.maximum(somme_carres / nombre - moyenne ** 2, 0)
+    ecart_type = np.where((nombre >= minimum) & (variance > 0), np.sqrt(variance), np.nan)
+
+    # Les pairs sont tous les autres notateurs du critère
+    nombre_pairs = nombre_critere - nombre
+    moyenne_pairs = np.divide(
+        somme_critere - somme, nombre_pairs, out=np.full(len(paires), np.nan), where=nombre_pairs > 0
+    )
+    moyenne_critere = somme_critere / nombre_critere
+    ecart_critere = np.sqrt(np.maximum(carres_critere / nombre_critere - moyenne_critere ** 2, 0))
+    biais = np.divide(
+        moyenne - moyenne_pairs, ecart_critere, out=np.full(len(paires), np.nan),
+        where=(ecart_critere > 0) & (nombre >= minimum) & (nombre_pairs > 0),
+    )
+
+    def ou_rien(x):
+        return None if np.isnan(x) else float(x)
+
+    return [
+        (int(paires[i, 0]), int(paires[i, 1]), int(nombre[i]), float(moyenne[i]),
+         ou_rien(ecart_type[i]), ou_rien(moyenne_pairs[i]), ou_rien(biais[i]))
+        for i in range(len(paires))
+    ]
+
+
+def calculer_biais(minimum=5):
+    """Recalcule BiaisNotateur sur tout l'historique puis les valeurs normalisées.
+
+    Les statistiques sont calculées en mémoire sur tableaux NumPy, sur les
+    notations courantes et archivées ; les scores z sont ensuite écrits par
+    une requête UPDATE par table, qui lit la moyenne et l'écart-type de
+    chaque (notateur, critère) dans BiaisNotateur.
+    """
+    tableau = vers_tableau(archives.notations('notateur_id', 'critere_id', 'valeur', valeur__isnull=False), 3)
+    lignes = statistiques(
+        tableau[:, 0].astype(np.int64), tableau[:, 1].astype(np.int64), tableau[:, 2], minimum
+    )
+
+    maintenant = timezone.now()
+    biais = [
+        BiaisNotateur(
+            notateur_id=notateur_id, critere_id=critere_id, nombre=nombre, moyenne=moyenne,
+            ecart_type=ecart_type, moyenne_pairs=moyenne_pairs, biais=ecart, calcule_le=maintenant,
+        )
+        for notateur_id, critere_id, nombre, moyenne, ecart_type, moyenne_pairs, ecart in lignes
+    ]
+
+    stats = BiaisNotateur.objects.filter(notateur_id=OuterRef('notateur_id'), critere_id=OuterRef('critere_id'))
+    with transaction.atomic():
+        BiaisNotateur.objects.all().delete()
+        BiaisNotateur.objects.bulk_create(biais, batch_size=500)
+        for modele in (Notation, NotationArchivee):
+            modele.objects.update(
+                valeur_normalisee=(F('valeur') - Subquery(stats.values('moyenne')[:1]))
+                / Subquery(stats.values('ecart_type')[:1])
+            )
+    return biais
@@ -0,0 +1,179 @@
+# configurations/notations.py
+# Écriture en masse des notations (grilles de saisie, imports)
+from datetime import date
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+
+from .models import Conducteur, CriteresNotation, Notation, NotationArchivee
+from .signals import ChangementNotation, notations_modifiees
+
+# Nombre de lignes par requête INSERT ... ON CONFLICT
+TAILLE_LOT = 500
+
+CHAMPS_UNIQUES = ['conducteur', 'critere', 'date_notation', 'notateur']
+
+
+def cle_notation(conducteur_id, critere_id, date_notation, notateur_id):
+    """Clé correspondant au unique_together de Notation"""
+    return (conducteur_id, critere_id, date_notation, notateur_id)
+
+
+def cles_archivees(notations):
+    """Clés des notations (non sauvegardées) déjà présentes dans les archives, en une requête"""
+    requete = NotationArchivee.objects.filter(
+        conducteur_id__in={n.conducteur_id for n in notations},
+        critere_id__in={n.critere_id for n in notations},
+        notateur_id__in={n.notateur_id for n in notations},
+        date_notation__in={n.date_notation for n in notations},
+    ).values_list('conducteur_id', 'critere_id', 'date_notation', 'notateur_id')
+    return {cle_notation(*ligne) for ligne in requete}
+
+
+def valider_valeurs(notes, criteres):
+    """Vérifie en une passe que chaque valeur respecte la plage de son critère.
+
+    `notes` est une liste de dictionnaires {'conducteur', 'critere', 'valeur'},
+    `criteres` un dictionnaire {id: CriteresNotation}.
+    Retourne la liste des messages d'erreur (vide si tout est valide).
+    """
+    erreurs = []
+    for index, note in enumerate(notes):
+        critere = criteres.get(note['critere'])
+        if critere is None:
+            erreurs.append(f"Ligne {index} : critère {note['critere']} inconnu ou inactif.")
+            continue
+        valeur = note.get('valeur')
+        if valeur is None:
+            continue
+        if not critere.valeur_mini <= valeur <= critere.valeur_maxi:
+            erreurs.append(f"Ligne {index} : {critere.nom} = {valeur} hors plage ({critere.plage_valeurs}).")
+    return erreurs
+
+
+def ecrire_notations(notations, utilisateur=None):
+    """Insère ou met à jour une liste de Notation (non sauvegardées) en masse.
+
+    L'écriture se fait par lots de INSERT ... ON CONFLICT DO UPDATE sur la clé
+    unique (conducteur, critère, date, notateur). Les lignes dont la valeur
+    n'a pas changé ne sont pas réécrites. Une clé déjà archivée n'est pas
+    écrite (elle serait comptée deux fois par les lectures sur les deux
+    tables) : elle est comptée dans 'archivees'. `utilisateur` est transmis
+    à l'historique des notations.
+    Retourne un dictionnaire de compteurs.
+    """
+    if not notations:
+        return {'creees': 0, 'modifiees': 0, 'inchangees': 0, 'archivees': 0}
+
+    # Valeurs déjà en base, récupérées en une requête
+    existantes = {}
+    requete = Notation.objects.filter(
+        conducteur_id__in={n.conducteur_id for n in notations},
+        critere_id__in={n.critere_id for n in notations},
+        notateur_id__in={n.notateur_id for n in notations},
+        date_notation__in={n.date_notation for n in notations},
+    ).values_list('pk', 'conducteur_id', 'critere_id', 'date_notation', 'notateur_id', 'valeur')
+    for pk, conducteur_id, critere_id, date_notation, notateur_id, valeur in requete:
+        existantes[cle_notation(conducteur_id, critere_id, date_notation, notateur_id)] = (pk, valeur)
+
+    # En cas de doublon dans l'entrée, la dernière valeur l'emporte
+    uniques = {}
+    for notation in notations:
+        cle = cle_notation(notation.conducteur_id, notation.critere_id, notation.date_notation, notation.notateur_id)
+        uniques[cle] = notation
+
+    archivees = cles_archivees(notations)
+
+    a_ecrire = []
+    anciennes = {}
+    creees = modifiees = inchangees = 0
+    for cle, notation in uniques.items():
+        if cle in archivees:
+            continue
+        if cle in existantes:
+            pk, ancienne_valeur = existantes[cle]
+            if ancienne_valeur == notation.valeur:
+                inchangees += 1
+                continue
+            notation.pk = pk
+            anciennes[cle] = ancienne_valeur
+            modifiees += 1
+        else:
+            creees += 1
+        a_ecrire.append(notation)
+
+    with transaction.atomic():
+        Notation.objects.bulk_create(
+            a_ecrire,
+            batch_size=TAILLE_LOT,
+            update_conflicts=True,
+            unique_fields=CHAMPS_UNIQUES,
+            update_fields=['valeur'],
+        )
+        changements = []
+        for notation in a_ecrire:
+            cle = cle_notation(notation.conducteur_id, notation.critere_id, notation.date_notation, notation.notateur_id)
+            changements.append(ChangementNotation(
+                notation.pk, notation.conducteur_id, notation.critere_id, notation.notateur_id,
+                notation.date_notation, anciennes.get(cle), notation.valeur,
+                'modification' if cle in anciennes else 'creation',
+            ))
+        if changements:
+            notations_modifiees.send(sender=Notation, changements=changements, utilisateur=utilisateur)
+
+    return {'creees': creees, 'modifiees': modifiees, 'inchangees': inchangees, 'archivees': len(archivees)}
+
+
+def enregistrer_grille(notateur, date_notation, notes, utilisateur=None):
+    """Enregistre une grille complète (conducteurs × critères actifs) d'un notateur.
+
+    Toutes les valeurs sont validées avant la moindre écriture : la grille est
+    enregistrée entièrement ou pas du tout.
+    """
+    if date_notation > date.today():
+        raise ValidationError({'date_notation': 'La date de notation ne peut pas être dans le futur.'})
+
+    criteres = {c.pk: c for c in CriteresNotation.objects.filter(actif=True)}
+    erreurs = valider_valeurs(notes, criteres)
+
+    conducteurs_demandes = {note['conducteur'] for note in notes}
+    conducteurs_connus = set(
+        Conducteur.objects.filter(pk__in=conducteurs_demandes).values_list('pk', flat=True)
+    )
+    for conducteur_id in sorted(conducteurs_demandes - conducteurs_connus):
+        erreurs.append(f"Conducteur {conducteur_id} inconnu.")
+
+    if erreurs:
+        raise ValidationError({'notes': erreurs})
+
+    notations = [
+        Notation(
+            date_notation=date_notation,
+            notateur_id=notateur.pk,
+            conducteur_id=note['conducteur'],
+            critere_id=note['critere'],
+            valeur=note.get('valeur'),
+        )
+        for note in notes
+    ]
+    archivees = cles_archivees(notations)
+    if archivees:
+        raise ValidationError({'date_notation': (
+            f"{len(archivees)} notation(s) de cette date sont déjà archivées et ne peuvent plus être modifiées."
+        )})
+    return ecrire_notations(notations, utilisateur=utilisateur)
+
+
+def grille_vierge(notateur, conducteurs=None):
+    """Structure de la grille à saisir : critères actifs et conducteurs à noter"""
+    if conducteurs is None:
+        conducteurs = Conducteur.actifs.filter(service_id=notateur.service_id)
+    criteres = CriteresNotation.objects.filter(actif=True).values('id', 'nom', 'valeur_mini', 'valeur_maxi')
+    return {
+        'notateur': {'id': notateur.pk, 'nom': notateur.nom_complet},
+        'criteres': list(criteres),
+        'conducteurs': [
+            {'id': c.pk, 'erp_id': c.erp_id, 'nom': c.nom_complet}
+            for c in conducteurs.only('pk', 'erp_id', 'nom', 'prenom', 'nom_slug', 'prenom_slug')
+        ],
+    }
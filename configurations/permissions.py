@@ -0,0 +1,123 @@
+# configurations/permissions.py
+# Droits d'un utilisateur (groupes de pages, groupes Django, groupes personnalisés) chargés une fois
+import time
+
+from django.core.cache import cache
+
+from .models import AssociationUtilisateurGroupe, GroupMembership
+from .versions import cache_versions
+
+DUREE_CACHE = 60 * 60
+
+CLE_VERSION = "permissions:version"
+
+GROUPE_GESTIONNAIRES = 'gestionnaire_groupes'
+
+# Groupe de pages (GroupePage.nom) donnant accès à la saisie des notations
+GROUPE_PAGES_NOTATION = 'notation'
+
+# Groupe de pages donnant accès à la consultation et à l'export des notations
+GROUPE_PAGES_CONSULTATION = 'consultation'
+
+
+class Permissions:
+    """Instantané des droits d'un utilisateur, sans accès à la base"""
+
+    def __init__(self, superutilisateur=False, staff=False, groupes_pages=(), groupes=(), groupes_personnalises=()):
+        self.superutilisateur = superutilisateur
+        self.staff = staff
+        self.groupes_pages = frozenset(groupes_pages)
+        self.groupes = frozenset(groupes)
+        self.groupes_personnalises = frozenset(groupes_personnalises)
+
+    def vers_cache(self):
+        return {
+            'superutilisateur': self.superutilisateur,
+            'staff': self.staff,
+            'groupes_pages': sorted(self.groupes_pages),
+            'groupes': sorted(self.groupes),
+            'groupes_personnalises': sorted(self.groupes_personnalises),
+        }
+
+    def acces_groupe_page(self, nom):
+        """Accès à un groupe de pages (par son nom) ; toujours vrai pour un superutilisateur"""
+        return self.superutilisateur or nom in self.groupes_pages
+
+    @property
+    def gestionnaire(self):
+        return self.superutilisateur or GROUPE_GESTIONNAIRES in self.groupes
+
+    @property
+    def saisie_notation(self):
+        return self.staff or self.acces_groupe_page(GROUPE_PAGES_NOTATION)
+
+    @property
+    def consultation_notations(self):
+        return self.staff or self.acces_groupe_page(GROUPE_PAGES_CONSULTATION)
+
+    def membre(self, groupe_id):
+        """Appartenance à un groupe personnalisé (CustomGroup)"""
+        return groupe_id in self.groupes_personnalises
+
+
+AUCUNE = Permissions()
+
+
+def cle_cache(user_id):
+    # La version globale couvre les renommages et suppressions de groupes, communs à tous ;
+    # évincée, elle repart d'une valeur jamais servie
+    version = cache_versions.get_or_set(CLE_VERSION, time.time_ns, None)
+    return f"permissions:{user_id}:v{version}"
+
+
+def construire_permissions(user):
+    """Droits d'un utilisateur lus en base (trois requêtes)"""
+    return Permissions(
+        superutilisateur=user.is_superuser,
+        staff=user.is_staff,
+        groupes_pages=AssociationUtilisateurGroupe.objects.filter(user=user).values_list('page_group__nom', flat=True),
+        groupes=user.groups.values_list('name', flat=True),
+        groupes_personnalises=GroupMembership.objects.filter(user=user).values_list('group_id', flat=True),
+    )
+
+
+def permissions_utilisateur(user):
+    """Droits d'un utilisateur : mémorisés sur l'objet user (donc sur request.user le temps
+    de la requête), et en cache entre les requêtes"""
+    if not user.is_authenticated:
+        return AUCUNE
+    permissions = getattr(user, '_permissions', None)
+    if permissions is None:
+        cle = cle_cache(user.pk)
+        donnees = cache.get(cle)
+        if donnees is None:
+            permissions = construire_permissions(user)
+            cache.set(cle, permissions.vers_cache(), DUREE_CACHE)
+        else:
+            permissions = Permissions(**donnees)
+        user._permissions = permissions
+    return permissions
+
+
+def oublier(user):
+    """Retire les droits mémorisés sur l'objet user, relus au prochain appel.
+
+    Passe par del plutôt que par __dict__ : request.user est un SimpleLazyObject
+    qui ne relaie vers l'utilisateur que les accès aux attributs.
+    """
+    try:
+        del user._permissions
+    except AttributeError:
+        pass
+
+
+def invalider(user_ids):
+    cache.delete_many([cle_cache(user_id) for user_id in user_ids])
+
+
+def invalider_toutes():
+    """Invalide les droits de tous les utilisateurs (groupe renommé ou supprimé)"""
+    try:
+        cache_versions.incr(CLE_VERSION)
+    except ValueError:
+        cache_versions.set(CLE_VERSION, time.time_ns(), None)
@@ -0,0 +1,137 @@
+# configurations/recherche.py
+# Recherche par préfixe, insensible aux accents, sur les conducteurs et les notateurs
+import re
+import unicodedata
+from functools import reduce
+from operator import and_
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Conducteur, EntreeRecherche, Notateur
+
+TABLE_FTS = 'configurations_recherche_fts'
+
+TAILLE_LOT = 500
+
+LIMITE_DEFAUT = 20
+
+
+def normaliser_texte(texte):
+    """Minuscules sans accents ni ponctuation, mots séparés par une espace : « Hélène-Marie » -> « helene marie »"""
+    decompose = unicodedata.normalize('NFKD', str(texte or ''))
+    sans_accents = ''.join(c for c in decompose if not unicodedata.combining(c))
+    return ' '.join(re.findall(r'\w+', sans_accents.lower()))
+
+
+def texte_index(nom_slug, nom, prenom_slug, prenom, *autres):
+    """Texte indexé : nom et prénom d'affichage suivis des autres valeurs (erp_id, site, service)"""
+    return normaliser_texte(' '.join(str(valeur) for valeur in (nom_slug or nom, prenom_slug or prenom, *autres)))
+
+
+# Type d'objet -> (modèle, colonnes passées à texte_index)
+SOURCES = {
+    'conducteur': (Conducteur, ('nom_slug', 'nom', 'prenom_slug', 'prenom', 'erp_id', 'site__nom', 'service__nom')),
+    'notateur': (Notateur, ('nom_slug', 'nom', 'prenom_slug', 'prenom', 'service__nom')),
+}
+
+
+# Base (settings NAME) -> présence de la table FTS5, lue une fois par processus
+_fts_par_base = {}
+
+
+def fts_disponible():
+    """Vrai si la table FTS5 a été créée par la migration (SQLite compilé avec FTS5)"""
+    if connection.vendor != 'sqlite':
+        return False
+    base = str(connection.settings_dict['NAME'])
+    if base not in _fts_par_base:
+        _fts_par_base[base] = TABLE_FTS in connection.introspection.table_names(include_views=True)
+    return _fts_par_base[base]
+
+
+def indexer(type_objet, ids=None):
+    """Met à jour les entrées de recherche de quelques objets (ou de tous si ids vaut None)"""
+    modele, colonnes = SOURCES[type_objet]
+    objets = modele.objects.all()
+    if ids is not None:
+        ids = list(ids)
+        objets = objets.filter(pk__in=ids)
+    entrees = [
+        EntreeRecherche(type_objet=type_objet, objet_id=pk, texte=texte_index(*valeurs))
+        for pk, *valeurs in objets.values_list('pk', *colonnes).iterator(chunk_size=2000)
+    ]
+    with transaction.atomic():
+        if ids is not None:
+            # Objets supprimés entre-temps
+            trouves = {entree.objet_id for entree in entrees}
+            retirer(type_objet, [pk for pk in ids if pk not in trouves])
+        EntreeRecherche.objects.bulk_create(
+            entrees,
+            batch_size=TAILLE_LOT,
+            update_conflicts=True,
+            unique_fields=['type_objet', 'objet_id'],
+            update_fields=['texte'],
+        )
+    return len(entrees)
+
+
+def retirer(type_objet, ids):
+    ids = list(ids)
+    for i in range(0, len(ids), TAILLE_LOT):
+        EntreeRecherche.objects.filter(type_objet=type_objet, objet_id__in=ids[i:i + TAILLE_LOT]).delete()
+
+
+def reconstruire():
+    """Recrée toutes les entrées de recherche"""
+    with transaction.atomic():
+        EntreeRecherche.objects.all().delete()
+        return {type_objet: indexer(type_objet) for type_objet in SOURCES}
+
+
+def requete_fts(mots):
+    """Requête MATCH : chaque mot est un préfixe"""
+    return ' '.join(f'"{mot}"*' for mot in mots)
+
+
+def objets_trouves(terme, type_objet):
+    """Sous-requête (non évaluée, sans limite) des objet_id correspondant au terme, pour un filtre pk__in"""
+    mots = normaliser_texte(terme).split()
+    entrees = EntreeRecherche.objects.filter(type_objet=type_objet)
+    if not mots:
+        return entrees.none().values('objet_id')
+    if fts_disponible():
+        return entrees.filter(
+            id__in=RawSQL(f"SELECT rowid FROM {TABLE_FTS} WHERE {TABLE_FTS} MATCH %s", [requete_fts(mots)])
+        ).values('objet_id')
+    condition = reduce(and_, (Q(texte__startswith=mot) | Q(texte__contains=f" {mot}") for mot in mots))
+    return entrees.filter(condition).values('objet_id')
+
+
+def rechercher(terme, type_objet, limite=LIMITE_DEFAUT):
+    """Identifiants des objets dont chaque mot du terme préfixe un mot indexé.
+
+    « hel dur » trouve « Hélène Durand ». Les résultats sont triés par
+    pertinence avec FTS5, par texte sinon.
+    """
+    mots = normaliser_texte(terme).split()
+    if not mots:
+        return []
+
+    if fts_disponible():
+        with connection.cursor() as curseur:
+            curseur.execute(
+                f"SELECT e.objet_id FROM {TABLE_FTS} f "
+                f"JOIN {EntreeRecherche._meta.db_table} e ON e.id = f.rowid "
+                f"WHERE {TABLE_FTS} MATCH %s AND e.type_objet = %s ORDER BY f.rank LIMIT %s",
+                [requete_fts(mots), type_objet, limite],
+            )
+            return [ligne[0] for ligne in curseur.fetchall()]
+
+    # Autres bases : préfixe de mot sur le texte normalisé
+    condition = reduce(and_, (Q(texte__startswith=mot) | Q(texte__contains=f" {mot}") for mot in mots))
+    return list(
+        EntreeRecherche.objects.filter(condition, type_objet=type_objet)
+        .order_by('texte').values_list('objet_id', flat=True)[:limite]
+    )
@@ -0,0 +1,133 @@
+# configurations/scores.py
+# Moteur de scores composites pondérés, calculé sur tableaux NumPy
+from itertools import chain
+
+import numpy as np
+from django.db import transaction
+from django.utils import timezone
+
+from . import archives
+from .agregats import debut_mois
+from .models import AgregatNotation, CriteresNotation, ScoreConducteur
+
+TAILLE_LOT = 5000
+
+
+def charger_criteres():
+    """Critères actifs sous forme de tableaux triés par identifiant"""
+    lignes = list(
+        CriteresNotation.objects.filter(actif=True).order_by('pk')
+        .values_list('pk', 'valeur_mini', 'valeur_maxi', 'poids')
+    )
+    if not lignes:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0), np.empty(0)
+    tableau = np.array(lignes, dtype=np.float64)
+    return tableau[:, 0].astype(np.int64), tableau[:, 1], tableau[:, 2], tableau[:, 3]
+
+
+def vers_tableau(requete, colonnes):
+    """Matérialise un values_list en tableau (n, colonnes) sans passer par des objets Python intermédiaires"""
+    valeurs = np.fromiter(
+        chain.from_iterable(requete.iterator(chunk_size=TAILLE_LOT)), dtype=np.float64
+    )
+    return valeurs.reshape(-1, colonnes)
+
+
+def charger_sommes(source='agregats', depuis=None, conducteur_ids=None):
+    """Sommes et effectifs par (conducteur, critère).
+
+    Depuis les agrégats mensuels (par défaut, une ligne par mois) ou depuis les
+    notations brutes, courantes et archivées (une ligne par notation, date de
+    début exacte).
+    Retourne quatre tableaux : conducteur, critère, somme, nombre.
+    """
+    filtres = {} if conducteur_ids is None else {'conducteur_id__in': conducteur_ids}
+    if source == 'agregats':
+        requete = AgregatNotation.objects.filter(critere__actif=True, **filtres)
+        if depuis is not None:
+            requete = requete.filter(mois__gte=debut_mois(depuis))
+        colonnes = ('conducteur_id', 'critere_id', 'somme', 'nombre')
+        requete = requete.order_by().values_list(*colonnes)
+    else:
+        colonnes = ('conducteur_id', 'critere_id', 'valeur')
+        requete = archives.notations(
+            *colonnes, debut=depuis, critere__actif=True, valeur__isnull=False, **filtres
+        )
+
+    tableau = vers_tableau(requete, len(colonnes))
+    nombres = tableau[:, 3] if source == 'agregats' else np.ones(len(tableau))
+    return tableau[:, 0].astype(np.int64), tableau[:, 1].astype(np.int64), tableau[:, 2], nombres
+
+
+def calculer(conducteurs, criteres, sommes, nombres, criteres_ids, mini, maxi, poids):
+    """Scores composites en une passe vectorisée.
+
+    Chaque moyenne (conducteur, critère) est ramenée sur [0, 1] selon la plage
+    du critère, puis pondérée par son poids. Les critères sans notation pour un
+    conducteur sont ignorés et les poids renormalisés.
+    Retourne (identifiants conducteurs, scores sur 100, nombre de notations).
+    """
+    if len(conducteurs) == 0 or len(criteres_ids) == 0:
+        return np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype=np.int64)
+
+    identifiants, index_conducteur = np.unique(conducteurs, return_inverse=True)
+    index_critere = np.searchsorted(criteres_ids, criteres)
+    nb_criteres = len(criteres_ids)
+
+    cellules = index_conducteur * nb_criteres + index_critere
+    taille = len(identifiants) * nb_criteres
+    cumul = np.bincount(cellules, weights=sommes, minlength=taille).reshape(-1, nb_criteres)
+    effectif = np.bincount(cellules, weights=nombres, minlength=taille).reshape(-1, nb_criteres)
+
+    presents = effectif > 0
+    moyennes = np.divide(cumul, effectif, out=np.zeros_like(cumul), where=presents)
+    etendue = np.where(maxi > mini, maxi - mini, 1.0)
+    normalisees = np.clip((moyennes - mini) / etendue, 0.0, 1.0)
+
+    poids_presents = np.where(presents, poids, 0.0)
+    total_poids = poids_presents.sum(axis=1)
+    scores = np.divide(
+        (normalisees * poids_presents).sum(axis=1), total_poids,
+        out=np.full(len(identifiants), np.nan), where=total_poids > 0,
+    ) * 100
+
+    return identifiants, scores, effectif.sum(axis=1).astype(np.int64)
+
+
+def scores_conducteurs(source='agregats', depuis=None, conducteur_ids=None):
+    """Scores composites de tous les conducteurs notés : {conducteur_id: (score, nb_notations)}"""
+    criteres_ids, mini, maxi, poids = charger_criteres()
+    conducteurs, criteres, sommes, nombres = charger_sommes(source, depuis, conducteur_ids)
+    identifiants, scores, effectifs = calculer(
+        conducteurs, criteres, sommes, nombres, criteres_ids, mini, maxi, poids
+    )
+    return {
+        int(conducteur_id): (float(score), int(effectif))
+        for conducteur_id, score, effectif in zip(identifiants, scores, effectifs)
+        if not np.isnan(score)
+    }
+
+
+def enregistrer_scores(scores, conducteur_ids=None):
+    """Enregistre les scores calculés ; les conducteurs recalculés sans score sont retirés"""
+    maintenant = timezone.now()
+    objets = [
+        ScoreConducteur(conducteur_id=conducteur_id, score=score, nb_notations=effectif, calcule_le=maintenant)
+        for conducteur_id, (score, effectif) in scores.items()
+    ]
+    existants = ScoreConducteur.objects.all()
+    if conducteur_ids is not None:
+        existants = existants.filter(conducteur_id__in=conducteur_ids)
+    obsoletes = sorted(set(existants.values_list('conducteur_id', flat=True)) - set(scores))
+
+    with transaction.atomic():
+        for i in range(0, len(obsoletes), 500):
+            ScoreConducteur.objects.filter(conducteur_id__in=obsoletes[i:i + 500]).delete()
+        ScoreConducteur.objects.bulk_create(
+            objets,
+            batch_size=500,
+            update_conflicts=True,
+            unique_fields=['conducteur'],
+            update_fields=['score', 'nb_notations', 'calcule_le'],
+        )
+    return len(objets)
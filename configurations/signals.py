@@ -0,0 +1,327 @@
+# configurations/signals.py
+# Signaux métier et récepteurs associés
+import threading
+from collections import namedtuple
+from contextlib import contextmanager
+
+from django.db import transaction
+from django.contrib.auth.models import Group, User
+from django.db.models.signals import m2m_changed, post_save, post_delete, pre_save
+from django.dispatch import Signal, receiver
+
+from .models import AssociationUtilisateurGroupe, Conducteur, CriteresNotation, GroupMembership, GroupePage, HistoriqueSite, Notateur, Notation, Page, Service, Site, Societe
+
+# Une écriture sur Notation : action vaut 'creation', 'modification' ou 'suppression'
+ChangementNotation = namedtuple('ChangementNotation', [
+    'notation_id', 'conducteur_id', 'critere_id', 'notateur_id', 'date_notation',
+    'ancienne_valeur', 'nouvelle_valeur', 'action',
+])
+
+# Envoyé pour toute écriture sur Notation, unitaire (save/delete) ou en masse
+# (ecrire_notations). Arguments : changements, liste de ChangementNotation, et
+# utilisateur, l'auteur de l'écriture s'il est connu.
+# Les QuerySet.update() sur Notation ne passent pas par ce signal.
+notations_modifiees = Signal()
+
+# Envoyé après une écriture en masse sur Conducteur (synchronisation ERP).
+# Argument : conducteur_ids, identifiants des conducteurs créés, modifiés ou désactivés.
+conducteurs_modifies = Signal()
+
+
+_etat = threading.local()
+
+
+@contextmanager
+def suivi_suspendu():
+    """Désactive la traduction des save()/delete() de Notation en notations_modifiees.
+
+    Pour les déplacements de données (archivage) qui ne changent pas les notes.
+    """
+    precedent = getattr(_etat, 'suspendu', False)
+    _etat.suspendu = True
+    try:
+        yield
+    finally:
+        _etat.suspendu = precedent
+
+
+def suivi_actif():
+    return not getattr(_etat, 'suspendu', False)
+
+
+def changement_depuis_etat(notation_id, etat, ancienne_valeur, nouvelle_valeur, action):
+    return ChangementNotation(
+        notation_id, etat['conducteur_id'], etat['critere_id'], etat['notateur_id'],
+        etat['date_notation'], ancienne_valeur, nouvelle_valeur, action,
+    )
+
+
+@receiver(post_save, sender=Notation)
+def notation_enregistree(sender, instance, created, raw=False, **kwargs):
+    """Traduit un save() unitaire en ChangementNotation"""
+    if raw or not suivi_actif():
+        return
+    instance_etat = {
+        'conducteur_id': instance.conducteur_id,
+        'critere_id': instance.critere_id,
+        'notateur_id': instance.notateur_id,
+        'date_notation': instance.date_notation,
+    }
+    initial = getattr(instance, '_etat_initial', None)
+    changements = []
+
+    if created or initial is None:
+        changements.append(changement_depuis_etat(instance.pk, instance_etat, None, instance.valeur, 'creation'))
+    elif any(initial[champ] != valeur for champ, valeur in instance_etat.items()):
+        # La clé de la notation a changé : retrait de l'ancienne, ajout de la nouvelle
+        changements.append(changement_depuis_etat(instance.pk, initial, initial['valeur'], None, 'suppression'))
+        changements.append(changement_depuis_etat(instance.pk, instance_etat, None, instance.valeur, 'creation'))
+    elif initial['valeur'] != instance.valeur:
+        changements.append(changement_depuis_etat(
+            instance.pk, instance_etat, initial['valeur'], instance.valeur, 'modification'
+        ))
+
+    instance.memoriser_etat()
+    if changements:
+        notations_modifiees.send(
+            sender=Notation, changements=changements, utilisateur=getattr(instance, '_utilisateur', None)
+        )
+
+
+@receiver(post_delete, sender=Notation)
+def notation_supprimee(sender, instance, **kwargs):
+    if not suivi_actif():
+        return
+    etat = getattr(instance, '_etat_initial', None) or {
+        'conducteur_id': instance.conducteur_id,
+        'critere_id': instance.critere_id,
+        'notateur_id': instance.notateur_id,
+        'date_notation': instance.date_notation,
+        'valeur': instance.valeur,
+    }
+    notations_modifiees.send(sender=Notation, utilisateur=None, changements=[
+        changement_depuis_etat(instance.pk, etat, etat['valeur'], None, 'suppression')
+    ])
+
+
+@receiver(notations_modifiees)
+def mettre_a_jour_agregats(sender, changements, **kwargs):
+    from .agregats import appliquer_changements
+    appliquer_changements(changements)
+
+
+@receiver(notations_modifiees)
+def historiser_notations(sender, changements, utilisateur=None, **kwargs):
+    from .audit import ecrivain, entrees_historique
+    entrees = entrees_historique(changements, utilisateur)
+    if entrees:
+        transaction.on_commit(lambda: ecrivain.ajouter(entrees))
+
+
+@receiver(notations_modifiees)
+def rafraichir_classements(sender, changements, **kwargs):
+    from .classements import rafraichir
+    conducteur_ids = {changement.conducteur_id for changement in changements}
+    transaction.on_commit(lambda: rafraichir(conducteur_ids))
+
+
+@receiver(notations_modifiees)
+def invalider_tendances(sender, changements, **kwargs):
+    from .tendances import invalider
+    conducteur_ids = {changement.conducteur_id for changement in changements}
+    transaction.on_commit(lambda: invalider(conducteur_ids))
+
+
+@receiver(notations_modifiees)
+def invalider_fiches_notations(sender, changements, **kwargs):
+    from .fiches import invalider
+    conducteur_ids = {changement.conducteur_id for changement in changements}
+    transaction.on_commit(lambda: invalider(conducteur_ids))
+
+
+@receiver(post_save, sender=Conducteur)
+@receiver(post_delete, sender=Conducteur)
+def invalider_fiche_conducteur(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .fiches import invalider
+    transaction.on_commit(lambda: invalider([instance.pk]))
+
+
+@receiver(post_save, sender=Conducteur)
+def historiser_affectation(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    from .affectations import enregistrer_changements, ouvrir
+    if created:
+        ouvrir([instance])
+    else:
+        initiale = getattr(instance, '_affectation_initiale', {})
+        enregistrer_changements([
+            (instance.pk, champ, initiale[champ], getattr(instance, f"{champ}_id"))
+            for champ in ('site', 'service', 'societe')
+            if champ in initiale and initiale[champ] != getattr(instance, f"{champ}_id")
+        ])
+    instance.memoriser_affectation()
+
+
+@receiver(post_save, sender=HistoriqueSite)
+@receiver(post_delete, sender=HistoriqueSite)
+def invalider_fiche_historique_site(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .fiches import invalider
+    transaction.on_commit(lambda: invalider([instance.conducteur_id]))
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Site)
+@receiver(post_save, sender=Societe)
+def invalider_fiches_affectation(sender, instance, created, raw=False, **kwargs):
+    # Un renommage touche les fiches de tous les conducteurs affectés
+    if raw or created:
+        return
+    from .fiches import invalider
+    champ = sender._meta.model_name
+    conducteur_ids = list(Conducteur.objects.filter(**{champ: instance}).values_list('pk', flat=True))
+    transaction.on_commit(lambda: invalider(conducteur_ids))
+
+
+@receiver(post_save, sender=CriteresNotation)
+@receiver(post_delete, sender=CriteresNotation)
+def invalider_fiches_criteres(sender, raw=False, **kwargs):
+    if raw:
+        return
+    from .fiches import invalider_toutes
+    transaction.on_commit(invalider_toutes)
+
+
+@receiver(conducteurs_modifies)
+def invalider_caches_conducteurs(sender, conducteur_ids, **kwargs):
+    from .classements import invalider_groupes
+    from .fiches import invalider
+    conducteur_ids = list(conducteur_ids)
+
+    def invalider_tout():
+        invalider(conducteur_ids)
+        invalider_groupes(conducteur_ids)
+    transaction.on_commit(invalider_tout)
+
+
+@receiver(conducteurs_modifies)
+def reindexer_conducteurs_modifies(sender, conducteur_ids, **kwargs):
+    from .recherche import indexer
+    indexer('conducteur', conducteur_ids)
+
+
+@receiver(post_save, sender=Conducteur)
+@receiver(post_save, sender=Notateur)
+def indexer_recherche(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .recherche import indexer
+    indexer(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_delete, sender=Conducteur)
+@receiver(post_delete, sender=Notateur)
+def retirer_recherche(sender, instance, **kwargs):
+    from .recherche import retirer
+    retirer(sender._meta.model_name, [instance.pk])
+
+
+@receiver(post_save, sender=Service)
+@receiver(post_save, sender=Site)
+def reindexer_affectation(sender, instance, created, raw=False, **kwargs):
+    # Les noms de site et de service font partie du texte indexé
+    if raw or created:
+        return
+    from .recherche import indexer
+    champ = sender._meta.model_name
+    indexer('conducteur', Conducteur.objects.filter(**{champ: instance}).values_list('pk', flat=True))
+    if sender is Service:
+        indexer('notateur', Notateur.objects.filter(service=instance).values_list('pk', flat=True))
+
+
+@receiver(post_save, sender=Page)
+@receiver(post_delete, sender=Page)
+@receiver(post_save, sender=GroupePage)
+@receiver(post_delete, sender=GroupePage)
+def invalider_navigation(sender, raw=False, **kwargs):
+    if raw:
+        return
+    from .navigation import invalider_toutes
+    transaction.on_commit(invalider_toutes)
+
+
+@receiver(pre_save, sender=AssociationUtilisateurGroupe)
+@receiver(pre_save, sender=GroupMembership)
+def memoriser_utilisateur_precedent(sender, instance, raw=False, **kwargs):
+    """Utilisateur auquel l'association (ou l'appartenance) était liée avant ce save : elle peut changer de main"""
+    if raw or instance.pk is None:
+        return
+    instance._user_id_precedent = sender.objects.filter(pk=instance.pk).values_list('user_id', flat=True).first()
+
+
+def utilisateurs_concernes(instance):
+    """Utilisateur actuel et, si l'association a changé de main, précédent"""
+    return list({instance.user_id, getattr(instance, '_user_id_precedent', None)} - {None})
+
+
+@receiver(post_save, sender=AssociationUtilisateurGroupe)
+@receiver(post_delete, sender=AssociationUtilisateurGroupe)
+def invalider_navigation_utilisateur(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .navigation import invalider
+    user_ids = utilisateurs_concernes(instance)
+    transaction.on_commit(lambda: invalider(user_ids))
+
+
+@receiver(post_save, sender=AssociationUtilisateurGroupe)
+@receiver(post_delete, sender=AssociationUtilisateurGroupe)
+@receiver(post_save, sender=GroupMembership)
+@receiver(post_delete, sender=GroupMembership)
+def invalider_permissions_membre(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    from .permissions import invalider
+    user_ids = utilisateurs_concernes(instance)
+    transaction.on_commit(lambda: invalider(user_ids))
+
+
+@receiver(post_save, sender=User)
+def invalider_permissions_utilisateur(sender, instance, created, raw=False, **kwargs):
+    # is_superuser fait partie des droits mémorisés
+    if raw or created:
+        return
+    from .permissions import invalider
+    transaction.on_commit(lambda: invalider([instance.pk]))
+
+
+@receiver(m2m_changed, sender=User.groups.through)
+def invalider_permissions_groupes(sender, instance, action, reverse, pk_set, **kwargs):
+    if not action.startswith('post_'):
+        return
+    from .permissions import invalider, invalider_toutes
+    if not reverse:
+        user_ids = [instance.pk]
+    elif pk_set is not None:
+        user_ids = list(pk_set)
+    else:
+        # group.user_set.clear() : membres retirés inconnus
+        transaction.on_commit(invalider_toutes)
+        return
+    transaction.on_commit(lambda: invalider(user_ids))
+
+
+@receiver(post_save, sender=Group)
+@receiver(post_delete, sender=Group)
+@receiver(post_save, sender=GroupePage)
+@receiver(post_delete, sender=GroupePage)
+def invalider_permissions_groupe(sender, raw=False, **kwargs):
+    # Les droits mémorisent les noms de groupes
+    if raw:
+        return
+    from .permissions import invalider_toutes
+    transaction.on_commit(invalider_toutes)
@@ -0,0 +1,76 @@
+# configurations/statistiques.py
+# Statistiques de flotte calculées par la base : regroupements, croisements, ancienneté
+from datetime import date
+
+from django.db.models import Avg, Count, Q
+
+from .models import TRANCHES_ANCIENNETE, expression_anciennete, expression_tranche_anciennete
+
+
+def taux(partie, total):
+    return round(partie / total, 3) if total else 0.0
+
+
+def regrouper(croisement, *cles):
+    """Totaux du croisement regroupés sur une partie de ses clés"""
+    groupes = {}
+    for ligne in croisement:
+        cle = tuple(ligne[c] for c in cles)
+        groupe = groupes.setdefault(cle, {**{c: ligne[c] for c in cles}, 'nombre': 0, 'interimaires': 0})
+        groupe['nombre'] += ligne['nombre']
+        groupe['interimaires'] += ligne['interimaires']
+    for groupe in groupes.values():
+        groupe['taux_interim'] = taux(groupe['interimaires'], groupe['nombre'])
+    return sorted(groupes.values(), key=lambda g: tuple(str(g[c] or '') for c in cles))
+
+
+def statistiques(requete, reference=None):
+    """Statistiques d'un ensemble de conducteurs, en trois requêtes.
+
+    Le croisement service × site × société (effectifs et intérimaires) est
+    calculé par un seul GROUP BY ; les répartitions par service, site et
+    société en sont déduites. L'ancienneté moyenne et la répartition par
+    tranche d'ancienneté sont calculées par la base. Le résultat est
+    sérialisable en JSON.
+    """
+    reference = reference or date.today()
+    requete = requete.order_by()
+
+    croisement = [
+        {
+            'service': ligne['service__nom'],
+            'site': ligne['site__nom'],
+            'code_postal': ligne['site__code_postal'],
+            'societe': ligne['societe__nom'],
+            'nombre': ligne['nombre'],
+            'interimaires': ligne['interimaires'],
+        }
+        for ligne in requete.values('service__nom', 'site__nom', 'site__code_postal', 'societe__nom').annotate(
+            nombre=Count('pk'), interimaires=Count('pk', filter=Q(interim_p=True))
+        )
+    ]
+    total = sum(ligne['nombre'] for ligne in croisement)
+    interimaires = sum(ligne['interimaires'] for ligne in croisement)
+
+    moyenne = requete.aggregate(moyenne=Avg(expression_anciennete(reference)))['moyenne']
+    tranches = dict.fromkeys((libelle for _, libelle in TRANCHES_ANCIENNETE), 0)
+    for ligne in requete.values(tranche=expression_tranche_anciennete(reference)).annotate(nombre=Count('pk')):
+        tranches[ligne['tranche']] = ligne['nombre']
+
+    return {
+        'reference': reference.isoformat(),
+        'total': total,
+        'contrats': {
+            'permanents': total - interimaires,
+            'interimaires': interimaires,
+            'taux_interim': taux(interimaires, total),
+        },
+        'par_service': regrouper(croisement, 'service'),
+        'par_site': regrouper(croisement, 'site', 'code_postal'),
+        'par_societe': regrouper(croisement, 'societe'),
+        'croisement': regrouper(croisement, 'service', 'site', 'code_postal', 'societe'),
+        'anciennete': {
+            'moyenne_jours': round(moyenne.total_seconds() / 86400, 1) if moyenne is not None else None,
+            'tranches': tranches,
+        },
+    }
@@ -0,0 +1,34 @@
+# configurations/statuts.py
+# Recalcul en masse du statut d'activité matérialisé des conducteurs
+from datetime import date
+
+from django.db import transaction
+from django.db.models import Q
+
+from .models import Conducteur
+from .signals import conducteurs_modifies
+
+TAILLE_LOT = 500
+
+
+def recalculer_statuts(requete=None, reference=None):
+    """Aligne est_actif sur la règle Conducteur.statut_actif pour les conducteurs qui s'en écartent.
+
+    Sert au basculement quotidien (dates de sortie atteintes) et après les
+    QuerySet.update() sur actif_p ou date_sortie, qui ne passent pas par save().
+    Retourne (nombre activés, nombre désactivés).
+    """
+    reference = reference or date.today()
+    requete = Conducteur.objects.all() if requete is None else requete
+    actif = Q(actif_p=True) & (Q(date_sortie__isnull=True) | Q(date_sortie__gt=reference))
+
+    a_desactiver = list(requete.filter(~actif, est_actif=True).values_list('pk', flat=True))
+    a_activer = list(requete.filter(actif, est_actif=False).values_list('pk', flat=True))
+
+    with transaction.atomic():
+        for ids, statut in ((a_desactiver, False), (a_activer, True)):
+            for i in range(0, len(ids), TAILLE_LOT):
+                Conducteur.objects.filter(pk__in=ids[i:i + TAILLE_LOT]).update(est_actif=statut)
+        if a_desactiver or a_activer:
+            conducteurs_modifies.send(sender=Conducteur, conducteur_ids=a_desactiver + a_activer)
+    return len(a_activer), len(a_desactiver)
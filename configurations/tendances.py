@@ -0,0 +1,97 @@
+# configurations/tendances.py
+# Séries temporelles par conducteur : moyennes glissantes et évolution mensuelle
+from datetime import date, timedelta
+
+from django.core.cache import cache
+from django.db.models import Count, Q, Sum
+
+from . import archives
+from .agregats import debut_mois
+from .models import AgregatNotation
+
+FENETRES = (30, 90, 180)
+
+DUREE_CACHE = 60 * 60
+
+
+def moyennes_glissantes(conducteur_id, fenetres=FENETRES, reference=None):
+    """Moyennes sur les 30/90/180 derniers jours par critère, en une requête par table.
+
+    Chaque fenêtre est une agrégation conditionnelle (somme et nombre) sur la
+    plus large ; les notations archivées ne sont interrogées que si la
+    fenêtre les atteint, et leurs sommes s'ajoutent à celles des courantes :
+    {critere_id: {30: {'moyenne', 'nombre'}, 90: {...}, 180: {...}}}.
+    """
+    reference = reference or date.today()
+    debut = reference - timedelta(days=max(fenetres) - 1)
+    agregations = {}
+    for jours in fenetres:
+        condition = Q(date_notation__gt=reference - timedelta(days=jours))
+        agregations[f"somme_{jours}"] = Sum('valeur', filter=condition)
+        agregations[f"nombre_{jours}"] = Count('valeur', filter=condition)
+
+    cumuls = {}
+    for modele in archives.modeles_notations(debut):
+        lignes = modele.objects.filter(
+            conducteur_id=conducteur_id, date_notation__gte=debut, date_notation__lte=reference
+        ).values('critere_id').annotate(**agregations).order_by()
+        for ligne in lignes:
+            cumul = cumuls.setdefault(ligne['critere_id'], {jours: [0, 0] for jours in fenetres})
+            for jours in fenetres:
+                cumul[jours][0] += ligne[f"somme_{jours}"] or 0
+                cumul[jours][1] += ligne[f"nombre_{jours}"]
+
+    return {
+        critere_id: {
+            jours: {'moyenne': somme / nombre if nombre else None, 'nombre': nombre}
+            for jours, (somme, nombre) in cumuls[critere_id].items()
+        }
+        for critere_id in sorted(cumuls)
+    }
+
+
+def serie_mensuelle(conducteur_id, nb_mois=24, reference=None):
+    """Moyenne mois par mois et par critère, lue dans les agrégats mensuels.
+
+    Retourne {critere_id: [{'mois', 'moyenne', 'nombre'}, ...]} par ordre chronologique.
+    """
+    reference = reference or date.today()
+    premier = debut_mois(reference)
+    for _ in range(nb_mois - 1):
+        premier = debut_mois(premier - timedelta(days=1))
+
+    agregats = AgregatNotation.objects.filter(
+        conducteur_id=conducteur_id, mois__gte=premier, mois__lte=reference
+    ).order_by('critere_id', 'mois').values_list('critere_id', 'mois', 'somme', 'nombre')
+
+    series = {}
+    for critere_id, mois, somme, nombre in agregats:
+        series.setdefault(critere_id, []).append({
+            'mois': mois,
+            'moyenne': somme / nombre if nombre else None,
+            'nombre': nombre,
+        })
+    return series
+
+
+def cle_cache(conducteur_id, reference):
+    # La date fait partie de la clé : les fenêtres glissent chaque jour
+    return f"tendances:{conducteur_id}:{reference.isoformat()}"
+
+
+def tendances_conducteur(conducteur_id):
+    """Moyennes glissantes et série mensuelle d'un conducteur, mises en cache"""
+    reference = date.today()
+    cle = cle_cache(conducteur_id, reference)
+    resultat = cache.get(cle)
+    if resultat is None:
+        resultat = {
+            'glissantes': moyennes_glissantes(conducteur_id, reference=reference),
+            'mensuelles': serie_mensuelle(conducteur_id, reference=reference),
+        }
+        cache.set(cle, resultat, DUREE_CACHE)
+    return resultat
+
+
+def invalider(conducteur_ids):
+    cache.delete_many([cle_cache(conducteur_id, date.today()) for conducteur_id in conducteur_ids])
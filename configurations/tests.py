@@ -1,3 +1,313 @@
-from django.test import TestCase
+import tempfile
+from datetime import date, timedelta
+from pathlib import Path
 
-# Create your tests here.
+import numpy as np
+from django.test import TestCase, override_settings
+
+from .accord import IndexAppariement, accord_par_critere, accord_par_paire
+from .agregats import reconstruire
+from .archives import archiver
+from .classements import REGROUPEMENTS, classer, classer_numpy, rang_conducteur
+from .consultation import page_notations
+from .erp import synchroniser
+from .instantanes import ajouter_maillon, comparer, compacter, etat, lire_chaine
+from .models import (
+    AgregatNotation, Conducteur, CriteresNotation, Notateur, Notation, NotationArchivee,
+    ScoreConducteur, Service, Site, Societe,
+)
+from .notations import ecrire_notations
+
+# Le cache du projet est partagé entre processus : les tests utilisent le leur
+CACHE_TESTS = {
+    'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests'},
+    'versions': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': 'tests-versions'},
+}
+
+
+def creer_referentiels(nb_conducteurs=6):
+    """Deux services, deux sites, une société, des conducteurs répartis, deux notateurs et deux critères"""
+    societe = Societe.objects.create(nom='Société')
+    services = [Service.objects.create(nom=f'Service {i}') for i in range(2)]
+    sites = [Site.objects.create(nom=f'Site {i}', code_postal=f'7500{i}') for i in range(2)]
+    conducteurs = [
+        Conducteur.objects.create(
+            erp_id=1000 + i, nom=f'Nom{i}', prenom=f'Prenom{i}', date_entree=date(2020, 1, 1),
+            service=services[i % 2], site=sites[(i // 2) % 2], societe=societe,
+        )
+        for i in range(nb_conducteurs)
+    ]
+    notateurs = [Notateur.objects.create(nom=f'Notateur{i}', prenom='N', service=services[0]) for i in range(2)]
+    criteres = [
+        CriteresNotation.objects.create(nom=f'Critère {i}', valeur_mini=0, valeur_maxi=10) for i in range(2)
+    ]
+    return conducteurs, notateurs, criteres
+
+
+def etat_agregats():
+    return sorted(AgregatNotation.objects.values_list(
+        'conducteur_id', 'critere_id', 'mois', 'nombre', 'somme', 'somme_carres',
+        'mini', 'maxi', 'derniere_valeur', 'derniere_date',
+    ))
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class AgregatsTests(TestCase):
+    """Les agrégats tenus au fil des écritures égalent une reconstruction complète"""
+
+    def setUp(self):
+        self.conducteurs, self.notateurs, self.criteres = creer_referentiels(3)
+
+    def test_maintenance_incrementale_egale_reconstruction(self):
+        debut = date(2025, 1, 10)
+        notations = [
+            Notation(
+                conducteur=conducteur, notateur=notateur, critere=critere,
+                date_notation=debut + timedelta(days=17 * i), valeur=(3 * i + j) % 11,
+            )
+            for i in range(6)
+            for j, (conducteur, notateur, critere) in enumerate(
+                (c, n, k) for c in self.conducteurs for n in self.notateurs for k in self.criteres
+            )
+        ]
+        ecrire_notations(notations)
+
+        # Modifications unitaires : valeur, clé (changement de mois) et suppression
+        notation = Notation.objects.order_by('id').first()
+        notation.valeur = 10
+        notation.save()
+        notation = Notation.objects.order_by('id')[1]
+        notation.date_notation = date(2025, 12, 1)
+        notation.save()
+        Notation.objects.order_by('id')[2].delete()
+        # Réécriture en masse : valeurs modifiées et inchangées
+        ecrire_notations([
+            Notation(conducteur_id=n.conducteur_id, notateur_id=n.notateur_id, critere_id=n.critere_id,
+                     date_notation=n.date_notation, valeur=(n.valeur + 1) % 11 if n.pk % 2 else n.valeur)
+            for n in Notation.objects.all()[:20]
+        ])
+
+        incremental = etat_agregats()
+        self.assertTrue(incremental)
+        reconstruire()
+        self.assertEqual(incremental, etat_agregats())
+
+    def test_reconstruction_inclut_les_archives(self):
+        ancienne = date.today() - timedelta(days=1000)
+        conducteur, notateur, critere = self.conducteurs[0], self.notateurs[0], self.criteres[0]
+        Notation.objects.create(conducteur=conducteur, notateur=notateur, critere=critere, date_notation=ancienne, valeur=4)
+        Notation.objects.create(conducteur=conducteur, notateur=notateur, critere=critere, date_notation=date.today(), valeur=6)
+        avant = etat_agregats()
+
+        self.assertEqual(archiver(date.today() - timedelta(days=730)), 1)
+        reconstruire()
+        self.assertEqual(avant, etat_agregats())
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class ClassementsTests(TestCase):
+    """Rangs denses et percentiles : fenêtres SQL, repli NumPy et rang individuel concordent"""
+
+    def setUp(self):
+        self.conducteurs, _, _ = creer_referentiels(9)
+        # Ex aequo volontaires
+        for conducteur, score in zip(self.conducteurs, (50, 70, 70, 20, 90, 50, 50, 10, 30)):
+            ScoreConducteur.objects.create(conducteur=conducteur, score=score, nb_notations=1)
+
+    def test_sql_et_numpy_identiques(self):
+        for regroupement, champ in REGROUPEMENTS.items():
+            sql = classer(regroupement)
+            numpy = classer_numpy(
+                ScoreConducteur.objects.filter(conducteur__est_actif=True).values_list('conducteur_id', champ, 'score')
+            )
+            cle = lambda ligne: (ligne['groupe_id'], ligne['conducteur_id'])
+            sql, numpy = sorted(sql, key=cle), sorted(numpy, key=cle)
+            self.assertEqual([(l['conducteur_id'], l['rang']) for l in sql], [(l['conducteur_id'], l['rang']) for l in numpy])
+            for a, b in zip(sql, numpy):
+                self.assertAlmostEqual(a['percentile'], b['percentile'])
+
+    def test_rang_dense_et_percentile(self):
+        lignes = {ligne['conducteur_id']: ligne for ligne in classer('societe')}
+        # Une seule société : 90 > 70 = 70 > 50 = 50 = 50 > 30 > 20 > 10
+        self.assertEqual(lignes[self.conducteurs[4].pk]['rang'], 1)
+        self.assertEqual(lignes[self.conducteurs[1].pk]['rang'], 2)
+        self.assertEqual(lignes[self.conducteurs[2].pk]['rang'], 2)
+        self.assertEqual(lignes[self.conducteurs[0].pk]['rang'], 3)
+        self.assertEqual(lignes[self.conducteurs[7].pk]['rang'], 6)
+        self.assertEqual(lignes[self.conducteurs[4].pk]['percentile'], 1.0)
+        self.assertEqual(lignes[self.conducteurs[7].pk]['percentile'], 0.0)
+
+    def test_rang_conducteur_egal_classement(self):
+        classements = {
+            regroupement: {ligne['conducteur_id']: ligne for ligne in classer(regroupement)}
+            for regroupement in REGROUPEMENTS
+        }
+        for conducteur in self.conducteurs:
+            position = rang_conducteur(conducteur.pk)
+            for regroupement in REGROUPEMENTS:
+                ligne = classements[regroupement][conducteur.pk]
+                taille = sum(1 for l in classements[regroupement].values() if l['groupe_id'] == ligne['groupe_id'])
+                self.assertEqual(position[regroupement]['rang'], ligne['rang'])
+                self.assertEqual(position[regroupement]['taille'], taille)
+                self.assertAlmostEqual(position[regroupement]['percentile'], ligne['percentile'])
+
+
+def alpha_reference(unites):
+    """Alpha de Krippendorff (intervalle) calculé naïvement : unites = [[valeurs], ...]"""
+    unites = [u for u in unites if len(u) >= 2]
+    valeurs = [v for u in unites for v in u]
+    n = len(valeurs)
+    observe = sum(
+        sum((a - b) ** 2 for i, a in enumerate(u) for j, b in enumerate(u) if i != j) / (len(u) - 1)
+        for u in unites
+    ) / n
+    attendu = sum((a - b) ** 2 for i, a in enumerate(valeurs) for j, b in enumerate(valeurs) if i != j) / (n * (n - 1))
+    return 1 - observe / attendu
+
+
+def index_depuis(unites):
+    """IndexAppariement d'un critère unique : chaque unité est un conducteur, chaque valeur un notateur"""
+    colonnes = [
+        (conducteur, 1, 0, notateur, valeur)
+        for conducteur, valeurs in enumerate(unites)
+        for notateur, valeur in enumerate(valeurs)
+    ]
+    tableau = np.array(colonnes, dtype=np.float64)
+    return IndexAppariement(*(tableau[:, i].astype(np.int64) for i in range(4)), tableau[:, 4])
+
+
+class AccordTests(TestCase):
+    """Invariants de l'alpha de Krippendorff, de l'ICC et du désaccord moyen"""
+
+    def test_accord_parfait(self):
+        stats = accord_par_critere(index_depuis([[2, 2, 2], [5, 5], [8, 8, 8]]))[1]
+        self.assertAlmostEqual(stats['alpha'], 1.0)
+        self.assertAlmostEqual(stats['icc'], 1.0)
+        self.assertEqual(stats['desaccord_moyen'], 0.0)
+        self.assertEqual(stats['unites'], 3)
+
+    def test_alpha_egal_calcul_naif(self):
+        unites = [[1, 2, 2], [4, 5], [7, 9, 8], [3, 3], [6, 2, 5]]
+        stats = accord_par_critere(index_depuis(unites))[1]
+        self.assertAlmostEqual(stats['alpha'], alpha_reference(unites))
+        self.assertEqual(stats['paires'], sum(len(u) * (len(u) - 1) // 2 for u in unites))
+
+    def test_unites_a_un_seul_notateur_ignorees(self):
+        avec = accord_par_critere(index_depuis([[1, 2], [4, 5], [9]]))[1]
+        sans = accord_par_critere(index_depuis([[1, 2], [4, 5]]))[1]
+        self.assertEqual(avec['unites'], 2)
+        self.assertAlmostEqual(avec['alpha'], sans['alpha'])
+
+    def test_desaccord_par_paire_oriente(self):
+        paires = accord_par_paire(index_depuis([[2, 5], [4, 6]]))
+        self.assertEqual(paires[(0, 1)]['comparaisons'], 2)
+        self.assertAlmostEqual(paires[(0, 1)]['desaccord_moyen'], 2.5)
+        self.assertAlmostEqual(paires[(0, 1)]['ecart_moyen'], -2.5)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class ConsultationTests(TestCase):
+    """Pagination par curseur sur les notations courantes et archivées"""
+
+    def setUp(self):
+        conducteurs, notateurs, criteres = creer_referentiels(2)
+        jours = [date.today() - timedelta(days=n) for n in (1200, 1000, 900, 10, 5, 5, 1)]
+        for i, jour in enumerate(jours):
+            Notation.objects.create(
+                conducteur=conducteurs[i % 2], notateur=notateurs[0], critere=criteres[i % 2], date_notation=jour, valeur=i
+            )
+        archiver(date.today() - timedelta(days=730))
+
+    def parcourir(self, decroissant):
+        lignes, curseur = [], None
+        while True:
+            page, curseur = page_notations(
+                Notation.objects.all(), curseur=curseur, limite=2, decroissant=decroissant,
+                archivees=NotationArchivee.objects.all(),
+            )
+            lignes += page
+            if curseur is None:
+                return lignes
+
+    def test_parcours_complet_dans_les_deux_sens(self):
+        self.assertEqual(NotationArchivee.objects.count(), 3)
+        for decroissant in (False, True):
+            lignes = self.parcourir(decroissant)
+            cles = [(ligne['date_notation'], ligne['id']) for ligne in lignes]
+            self.assertEqual(len(set(cles)), 7)
+            self.assertEqual(cles, sorted(cles, reverse=decroissant))
+            self.assertEqual(sum(ligne['archivee'] for ligne in lignes), 3)
+
+    def test_sans_archives(self):
+        lignes, curseur = page_notations(Notation.objects.all(), limite=10)
+        self.assertEqual(len(lignes), 4)
+        self.assertIsNone(curseur)
+
+
+@override_settings(CACHES=CACHE_TESTS)
+class ErpTests(TestCase):
+    """Synchronisation ERP : seuls les écarts sont écrits"""
+
+    def setUp(self):
+        creer_referentiels(0)
+        self.extrait = [
+            {'erp_id': 1, 'nom': 'Durand', 'prenom': 'Hélène', 'date_entree': '2020-01-01',
+             'service': 'Service 0', 'site': 'Site 0', 'societe': 'Société'},
+            {'erp_id': 2, 'nom': 'Martin', 'prenom': 'Paul', 'date_entree': '2021-05-01',
+             'service': 'Service 1', 'site': 'Site 1', 'societe': 'Société'},
+        ]
+
+    def test_delta(self):
+        compteurs, erreurs = synchroniser(self.extrait)
+        self.assertEqual((compteurs['creees'], erreurs), (2, []))
+
+        compteurs, _ = synchroniser(self.extrait)
+        self.assertEqual((compteurs['creees'], compteurs['modifiees'], compteurs['inchangees']), (0, 0, 2))
+
+        self.extrait[1]['site'] = 'Site 0'
+        compteurs, _ = synchroniser(self.extrait[1:])
+        self.assertEqual((compteurs['modifiees'], compteurs['desactivees']), (1, 1))
+        self.assertEqual(Conducteur.objects.get(erp_id=2).site.nom, 'Site 0')
+        self.assertFalse(Conducteur.objects.get(erp_id=1).actif_p)
+
+    def test_actif_p_conserve(self):
+        synchroniser(self.extrait)
+        Conducteur.objects.filter(erp_id=2).update(actif_p=False, est_actif=False)
+        self.extrait[1]['nom'] = 'Martins'
+        compteurs, _ = synchroniser(self.extrait)
+        conducteur = Conducteur.objects.get(erp_id=2)
+        self.assertEqual(compteurs['modifiees'], 1)
+        self.assertEqual((conducteur.nom, conducteur.actif_p, conducteur.est_actif), ('martins', False, False))
+
+    def test_retour_apres_desactivation(self):
+        synchroniser(self.extrait)
+        synchroniser(self.extrait[1:])
+        self.extrait[0]['date_sortie'] = ''
+        synchroniser(self.extrait)
+        conducteur = Conducteur.objects.get(erp_id=1)
+        self.assertEqual((conducteur.actif_p, conducteur.est_actif, conducteur.date_sortie), (True, True, None))
+
+
+class InstantanesTests(TestCase):
+    """Chaîne d'instantanés : rejouer les maillons redonne l'état, compacter ne le change pas"""
+
+    def test_chaine_et_compaction(self):
+        with tempfile.TemporaryDirectory() as dossier:
+            chemin = Path(dossier) / 'chaine.ndjson.gz'
+            versions = [
+                {1: (10, 'a'), 2: (20, 'b'), 3: (30, 'c')},
+                {1: (10, 'a'), 2: (20, 'B'), 4: (40, 'd')},
+                {2: (20, 'B'), 4: (40, 'D'), 5: (50, 'e')},
+            ]
+            for actuelles in versions:
+                chaine = lire_chaine(chemin)
+                ajoutes, modifies, retires = comparer(etat(chaine), actuelles)
+                ajouter_maillon(chemin, chaine, actuelles, ajoutes, modifies, retires)
+                self.assertEqual(etat(lire_chaine(chemin)), {erp_id: v for erp_id, (_, v) in actuelles.items()})
+
+            self.assertEqual(comparer(etat(lire_chaine(chemin)), versions[-1]), ([], [], []))
+            attendu = etat(lire_chaine(chemin))
+            self.assertEqual(compacter(chemin), 3)
+            chaine = lire_chaine(chemin)
+            self.assertEqual((len(chaine), chaine[0]['numero'], chaine[0]['complet']), (1, 3, True))
+            self.assertEqual(etat(chaine), attendu)
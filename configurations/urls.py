@@ -17,7 +17,16 @@ urlpatterns = [
     path('<int:group_id>/', views.group_detail, name='group_detail'),
     path('<int:group_id>/add-user/', views.add_user_to_group, name='add_user_to_group'),
     path('<int:group_id>/remove-user/', views.remove_user_from_group, name='remove_user_from_group'),
+    path('notateurs/<int:notateur_id>/saisie/', views.SaisieNotationView.as_view(), name='saisie_notation'),
     # API endpoints
     path('api/<int:group_id>/add-user/', views.api_add_user, name='api_add_user'),
     path('api/<int:group_id>/remove-user/', views.api_remove_user, name='api_remove_user'),
+    path('api/notateurs/<int:notateur_id>/grille/', views.api_grille_notation, name='api_grille_notation'),
+    path('api/classements/<str:regroupement>/<int:groupe_id>/', views.api_classement, name='api_classement'),
+    path('api/conducteurs/<int:conducteur_id>/rang/', views.api_rang_conducteur, name='api_rang_conducteur'),
+    path('api/conducteurs/<int:conducteur_id>/tendances/', views.api_tendances_conducteur, name='api_tendances_conducteur'),
+    path('api/conducteurs/<int:conducteur_id>/fiche/', views.api_fiche_conducteur, name='api_fiche_conducteur'),
+    path('api/notations/', views.api_notations, name='api_notations'),
+    path('api/notations/export/', views.export_notations, name='export_notations'),
+    path('api/recherche/', views.api_recherche, name='api_recherche'),
 ]
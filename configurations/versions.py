@@ -0,0 +1,8 @@
+# configurations/versions.py
+# Cache des clés de version (navigation, droits, fiches, classements)
+from django.core.cache import caches
+from django.utils.connection import ConnectionProxy
+
+# Alias 'versions' : quelques dizaines de clés, jamais élaguées avec les
+# entrées qu'elles invalident. Résolu à chaque accès, comme django.core.cache.cache.
+cache_versions = ConnectionProxy(caches, 'versions')
@@ -1,21 +1,32 @@
 # Imports from Django
+import json
+from datetime import date
 from django.shortcuts import redirect, render, get_object_or_404
-from django.http import HttpResponse, JsonResponse
+from django.http import HttpResponse, JsonResponse, StreamingHttpResponse
 from django.contrib import messages
 from django.contrib.auth.views import LoginView
-from django.core.exceptions import PermissionDenied
+from django.core.exceptions import PermissionDenied, ValidationError
 from django.contrib.admin.views.decorators import staff_member_required
-from django.urls import reverse_lazy
+from django.urls import reverse, reverse_lazy
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.mixins import LoginRequiredMixin
 from django.views.generic import TemplateView
-from django.db.models import Prefetch
 from django.views.decorators.http import require_http_methods
 from django.contrib.auth.models import User
 
 # Imports from local models and forms
-from .models import Page, GroupePage, AssociationUtilisateurGroupe, CustomGroup, GroupMembership
+from .models import Page, CustomGroup, GroupMembership
+from .models import Notateur, Conducteur
 from .forms import GroupForm
+from .notations import enregistrer_grille, grille_vierge
+from .classements import REGROUPEMENTS, rang_conducteur, tableau
+from .tendances import tendances_conducteur
+from .fiches import fiche_conducteur
+from .consultation import LIMITE_DEFAUT, LIMITE_MAXI, filtrer_archivees, filtrer_notations, page_notations
+from .exports import FORMATS, flux_export
+from .recherche import SOURCES as TYPES_RECHERCHE, rechercher
+from .navigation import navigation_utilisateur
+from .permissions import permissions_utilisateur
 
 
 class GroupAccessMixin:
@@ -26,31 +37,17 @@ class GroupAccessMixin:
             return self.handle_no_permission()
 
         if self.required_group:
-            has_access = AssociationUtilisateurGroupe.objects.filter(
-                user = request.user,
-                page_group__name = self.required_group
-            ).exists()
-
-            if not has_access and not request.user.is_superuser:
+            if not permissions_utilisateur(request.user).acces_groupe_page(self.required_group):
                 raise PermissionDenied("Vous ne pouvez accéder à cette page.")
         return super().dispatch(request, *args, **kwargs)
 
 
     def redirect_to_user_page(self, request):
-        user_groups = AssociationUtilisateurGroupe.objects.filter(
-            user = request.user
-            ).select_related('page_group')
-
-        if user_groups.exists():
-            first_group = user_groups.first().page_group
-            first_page = Page.objects.filter(
-                group = first_group,
-                is_active = True
-            ).order_by('ordre').first()
-
-            if first_page:
-                messages.warning(request, f"Vous n'avez pas accès à cette page. Redirection vers {first_page.nom}")
-                return redirect('page_view', page_name=first_page.nom)
+        # Première page de la barre de navigation, déjà en cache
+        for groupe in navigation_utilisateur(request.user):
+            first_page = groupe['pages'][0]
+            messages.warning(request, f"Vous n'avez pas accès à cette page. Redirection vers {first_page['nom']}")
+            return redirect('page_view', page_name=first_page['nom'])
         messages.error(request, "Aucune page accessible trouvée.")
         return redirect("accueil")
     
@@ -64,36 +61,13 @@ class BasePageView(LoginRequiredMixin, GroupAccessMixin, TemplateView):
 
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
-
-        user_groups = AssociationUtilisateurGroupe.objects.filter(
-            user = self.request.user
-            ).select_related('page_group').prefetch_related(
-                Prefetch(
-                    'page_group__page_set',
-                    queryset = Page.objects.filter(is_active=True).order_by('ordre'),
-                    to_attr='active_pages'))
-        
-
-        navbar_data = {}
-
-        for association in user_groups:
-            group = association.page_group
-            pages = Page.objects.filter(
-                group = group,
-                is_active = True
-                ).order_by('ordre')
-
-            navbar_data[group] = pages
-            context['navbar_groups'] = navbar_data
-            context['current_page'] = getattr(self, 'page_name', '')
-
+        context['navbar_groups'] = navigation_utilisateur(self.request.user)
+        context['current_page'] = self.page_name
         return context
 
 def is_group_manager(user):
     """Vérifier si l'utilisateur est membre du groupe 'gestionnaire_groupes'"""
-    if not user.is_authenticated:
-        return False
-    return user.groups.filter(name='gestionnaire_groupes').exists() or user.is_superuser
+    return permissions_utilisateur(user).gestionnaire
 
 def group_manager_required(view_func):
     """Décorateur pour vérifier l'appartenance au groupe gestionnaire_groupes"""
@@ -103,6 +77,14 @@ def group_manager_required(view_func):
         return view_func(request, *args, **kwargs)
     return wrapper
 
+def consultation_requise(view_func):
+    """Décorateur des API de lecture des notations : réservées au staff et au groupe de pages de consultation"""
+    def wrapper(request, *args, **kwargs):
+        if not permissions_utilisateur(request.user).consultation_notations:
+            return JsonResponse({'success': False, 'message': 'Accès refusé'}, status=403)
+        return view_func(request, *args, **kwargs)
+    return wrapper
+
 @login_required
 @group_manager_required
 def group_list(request):
@@ -231,3 +213,188 @@ def api_remove_user(request, group_id):
             return JsonResponse({'success': False, 'message': 'Utilisateur introuvable'})
     
     return JsonResponse({'success': False, 'message': 'Méthode non autorisée'})
+
+# ==================== SAISIE DES NOTATIONS ====================
+
+class SaisieNotationView(BasePageView):
+    """Page de saisie de la grille d'un notateur ; la grille est chargée et enregistrée par api_grille_notation"""
+
+    template_name = 'configurations/pages/saisie_notation.html'
+    page_name = 'saisie_notation'
+
+    def dispatch(self, request, *args, **kwargs):
+        if request.user.is_authenticated and not permissions_utilisateur(request.user).saisie_notation:
+            raise PermissionDenied("Vous ne pouvez pas saisir de notations.")
+        return super().dispatch(request, *args, **kwargs)
+
+    def get_context_data(self, **kwargs):
+        context = super().get_context_data(**kwargs)
+        notateur = get_object_or_404(Notateur, id=self.kwargs['notateur_id'])
+        context['notateur'] = notateur
+        context['url_grille'] = reverse('configurations:api_grille_notation', args=[notateur.pk])
+        context['date_notation'] = date.today().isoformat()
+        return context
+
+@login_required
+@require_http_methods(["GET", "POST"])
+def api_grille_notation(request, notateur_id):
+    """API de saisie d'une grille de notation complète.
+
+    GET renvoie la grille à remplir (critères actifs et conducteurs du service
+    du notateur). POST enregistre en une transaction une grille de la forme
+    {"date_notation": "AAAA-MM-JJ", "notes": [{"conducteur": id, "critere": id, "valeur": n}, ...]}.
+    Réservée au staff et aux membres du groupe de pages de saisie des notations.
+    """
+    if not permissions_utilisateur(request.user).saisie_notation:
+        return JsonResponse({'success': False, 'message': 'Accès refusé'}, status=403)
+
+    notateur = get_object_or_404(Notateur, id=notateur_id)
+
+    if request.method == 'GET':
+        return JsonResponse(grille_vierge(notateur))
+
+    try:
+        donnees = json.loads(request.body)
+        date_notation = date.fromisoformat(donnees['date_notation'])
+        notes = [
+            {
+                'conducteur': int(note['conducteur']),
+                'critere': int(note['critere']),
+                'valeur': None if note.get('valeur') in (None, '') else int(note['valeur']),
+            }
+            for note in donnees['notes']
+        ]
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'success': False, 'message': 'Grille invalide'}, status=400)
+
+    try:
+        compteurs = enregistrer_grille(notateur, date_notation, notes, utilisateur=request.user)
+    except ValidationError as e:
+        return JsonResponse({'success': False, 'message': 'Grille refusée', 'erreurs': e.message_dict}, status=400)
+
+    return JsonResponse({'success': True, 'message': 'Grille enregistrée', **compteurs})
+
+# ==================== CLASSEMENTS ====================
+
+@login_required
+@consultation_requise
+def api_classement(request, regroupement, groupe_id):
+    """Meilleurs et derniers conducteurs d'un service, d'un site ou d'une société"""
+    if regroupement not in REGROUPEMENTS:
+        return JsonResponse({'success': False, 'message': 'Regroupement inconnu'}, status=404)
+    try:
+        k = min(max(int(request.GET.get('k', 10)), 1), 100)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Paramètre k invalide'}, status=400)
+    return JsonResponse({'success': True, 'regroupement': regroupement, 'groupe_id': groupe_id, **tableau(regroupement, groupe_id, k)})
+
+@login_required
+@consultation_requise
+def api_rang_conducteur(request, conducteur_id):
+    """Rang et percentile d'un conducteur dans son service, son site et sa société"""
+    position = rang_conducteur(conducteur_id)
+    if position is None:
+        return JsonResponse({'success': False, 'message': 'Conducteur sans score'}, status=404)
+    return JsonResponse({'success': True, 'conducteur_id': conducteur_id, **position})
+
+# ==================== TENDANCES ====================
+
+@login_required
+@consultation_requise
+def api_tendances_conducteur(request, conducteur_id):
+    """Moyennes glissantes (30, 90, 180 jours) et série mensuelle par critère"""
+    get_object_or_404(Conducteur, id=conducteur_id)
+    return JsonResponse({'success': True, 'conducteur_id': conducteur_id, **tendances_conducteur(conducteur_id)})
+
+# ==================== FICHES ====================
+
+@login_required
+@consultation_requise
+def api_fiche_conducteur(request, conducteur_id):
+    """Fiche d'un conducteur : identité, affectations et synthèse par critère"""
+    fiche = fiche_conducteur(conducteur_id)
+    if fiche is None:
+        return JsonResponse({'success': False, 'message': 'Conducteur introuvable'}, status=404)
+    return JsonResponse({'success': True, **fiche})
+
+# ==================== CONSULTATION ====================
+
+@login_required
+@consultation_requise
+def api_notations(request):
+    """Liste paginée des notations, filtrable par conducteur, notateur, critère, service et période.
+
+    La pagination se fait par curseur sur (date_notation, id) : la réponse
+    contient `suivant`, à repasser en paramètre `curseur` pour obtenir la page
+    d'après. `ordre=desc` parcourt les notations de la plus récente à la plus
+    ancienne, `archives=1` inclut les notations archivées. Réservée, comme
+    l'export et les API de classement, tendances et fiches, au staff et au
+    groupe de pages de consultation.
+    """
+    try:
+        requete = filtrer_notations(request.GET)
+        limite = min(max(int(request.GET.get('limite', LIMITE_DEFAUT)), 1), LIMITE_MAXI)
+        lignes, suivant = page_notations(
+            requete,
+            curseur=request.GET.get('curseur'),
+            limite=limite,
+            decroissant=request.GET.get('ordre') == 'desc',
+            archivees=filtrer_archivees(request.GET) if request.GET.get('archives') == '1' else None,
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Paramètres invalides'}, status=400)
+    return JsonResponse({'success': True, 'notations': lignes, 'suivant': suivant})
+
+@login_required
+@consultation_requise
+def export_notations(request):
+    """Export complet des notations en flux, avec les noms des référentiels.
+
+    Accepte les mêmes filtres que api_notations, plus `format` (csv ou ndjson),
+    `gzip=1` pour compresser à la volée et `archives=1` pour inclure les
+    notations archivées. Réservé au staff et au groupe de pages de consultation.
+    """
+    format_export = request.GET.get('format', 'csv')
+    if format_export not in FORMATS:
+        return JsonResponse({'success': False, 'message': 'Format inconnu'}, status=400)
+    compresser = request.GET.get('gzip') == '1'
+    try:
+        flux = flux_export(
+            format_export,
+            compresser=compresser,
+            filtrer=lambda requete: filtrer_notations(request.GET, requete),
+            avec_archives=request.GET.get('archives') == '1',
+        )
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Paramètres invalides'}, status=400)
+
+    nom_fichier = f"notations_{date.today():%Y%m%d}.{format_export}"
+    if compresser:
+        response = StreamingHttpResponse(flux, content_type='application/gzip')
+        nom_fichier += '.gz'
+    else:
+        response = StreamingHttpResponse(flux, content_type=f"{FORMATS[format_export]}; charset=utf-8")
+    response['Content-Disposition'] = f'attachment; filename="{nom_fichier}"'
+    return response
+
+# ==================== RECHERCHE ====================
+
+@login_required
+def api_recherche(request):
+    """Recherche par préfixe, insensible aux accents : ?q=hel dur&type=conducteur"""
+    type_objet = request.GET.get('type', 'conducteur')
+    if type_objet not in TYPES_RECHERCHE:
+        return JsonResponse({'success': False, 'message': 'Type inconnu'}, status=400)
+    try:
+        limite = min(max(int(request.GET.get('limite', 20)), 1), 100)
+    except ValueError:
+        return JsonResponse({'success': False, 'message': 'Paramètre limite invalide'}, status=400)
+
+    ids = rechercher(request.GET.get('q', ''), type_objet, limite=limite)
+    modele = Conducteur if type_objet == 'conducteur' else Notateur
+    objets = modele.objects.in_bulk(ids)
+    resultats = [
+        {'id': pk, 'nom': objets[pk].nom_complet, **({'erp_id': objets[pk].erp_id} if type_objet == 'conducteur' else {})}
+        for pk in ids if pk in objets
+    ]
+    return JsonResponse({'success': True, 'resultats': resultats})
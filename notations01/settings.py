@@ -82,6 +82,34 @@ DATABASES = {
 }
 
 
+# Cache
+# Partagé entre les processus (workers, commandes, shell) : une invalidation
+# faite par l'un est vue par tous, ce que le cache mémoire par défaut ne permet pas.
+# Le cache fichier convient au développement et aux petits déploiements : chaque
+# écriture parcourt son répertoire pour décider d'un élagage, d'où un plafond bas.
+# En production, préférer Redis pour les deux alias, 'versions' sur une base
+# sans éviction (maxmemory-policy noeviction) :
+#     'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+#     'LOCATION': 'redis://127.0.0.1:6379/1',
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'donnees',
+        'OPTIONS': {'MAX_ENTRIES': 2000},
+    },
+    # Clés de version (configurations/versions.py) : peu nombreuses, gardées
+    # hors du répertoire élagué pour ne jamais être évincées au hasard
+    'versions': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': BASE_DIR / 'cache' / 'versions',
+        'TIMEOUT': None,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
+}
+
+
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
 
@@ -127,3 +155,14 @@ LOGOUT_REDIRECT_URL = '/connexion/'  # Redirection après logout
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
+
+# Historisation des notations (configurations/audit.py)
+# Les entrées sont écrites par lots dans un thread dédié ; False pour écrire immédiatement
+NOTATIONS_AUDIT_ASYNCHRONE = True
+NOTATIONS_AUDIT_TAILLE_LOT = 500
+NOTATIONS_AUDIT_DELAI = 2.0  # secondes d'attente maximale avant écriture d'un lot incomplet
+NOTATIONS_AUDIT_CAPACITE = 10000  # entrées en attente au-delà desquelles le dépôt attend l'écriture
+
+# Archivage des notations (configurations/archives.py)
+# Les notations plus anciennes que cet horizon quittent la table principale
+NOTATIONS_ARCHIVE_HORIZON_JOURS = 730